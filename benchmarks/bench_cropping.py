@@ -0,0 +1,152 @@
+"""
+Vision tokens per page and end-to-end throughput with and without layout cropping.
+
+Generates synthetic document pages (margins, paragraphs, sparse pages),
+preprocesses them as OCRGPU does (resize to max_dim, optional
+preprocess.layout_crop, PNG encode) and sends them to an in-process mock
+vLLM server whose prefill time grows with the request's vision tokens
+(tools/mock_vllm.py --per-image-token).
+
+    python benchmarks/bench_cropping.py --pages 40 --concurrency 4
+    python benchmarks/bench_cropping.py --detector surya     # needs surya-ocr
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageDraw, ImageFont
+
+from preprocess.image_processor import ImageProcessor
+from preprocess.layout_crop import LayoutCropper, vision_tokens
+from tools.mock_vllm import make_server
+
+WORDS = (
+    "invoice total amount due date customer account number payment terms net "
+    "shipping address quantity description unit price tax subtotal balance order "
+    "reference contract section clause agreement party effective period schedule"
+).split()
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1: fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def build_page(rng: random.Random, width: int = 1240, height: int = 1754) -> Image.Image:
+    """A4 at 150 DPI: wide margins, a heading, a few paragraphs, and sometimes lots of empty space."""
+    page = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(page)
+    body, heading = _font(22), _font(34)
+    margin_x, y = rng.randint(100, 180), rng.randint(120, 200)
+    fill = rng.choice([0.3, 0.6, 0.9])  # share of the page with text
+
+    draw.text((margin_x, y), " ".join(rng.choice(WORDS) for _ in range(4)).title(), font=heading, fill="black")
+    y += 70
+    while y < height * fill:
+        for _ in range(rng.randint(3, 8)):
+            line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 12)))
+            draw.text((margin_x, y), line, font=body, fill="black")
+            y += 32
+        y += rng.choice([30, 30, 120, 300])  # paragraph gap, sometimes a large blank block
+    return page
+
+
+def encode(img: Image.Image) -> str:
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+def prepare(page: Image.Image, max_dim: int, cropper):
+    start = time.perf_counter()
+    img = ImageProcessor.process_image(page, max_dim=max_dim)
+    crop_start = time.perf_counter()
+    if cropper:
+        img = cropper.crop(img)
+    crop_s = time.perf_counter() - crop_start
+    b64 = encode(img)
+    return b64, vision_tokens(*img.size), crop_s, time.perf_counter() - start
+
+
+def send(url: str, b64: str):
+    body = json.dumps({
+        "model": "mock",
+        "max_tokens": 400,
+        "messages": [{"role": "user", "content": [
+            {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}},
+            {"type": "text", "text": "OCR the text in the image and output as markdown."},
+        ]}],
+    }).encode()
+    req = urllib.request.Request(f"{url}/chat/completions", data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=120) as r:
+        return json.loads(r.read())["usage"]["prompt_tokens"]
+
+
+def run(pages, max_dim: int, cropper, url: str, concurrency: int) -> dict:
+    def _page(page):
+        b64, tokens, crop_s, prep_s = prepare(page, max_dim, cropper)
+        send(url, b64)
+        return tokens, crop_s, prep_s, len(b64) * 3 // 4
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        rows = list(executor.map(_page, pages))
+    elapsed = time.perf_counter() - start
+
+    n = len(rows)
+    return {
+        "tokens": sum(r[0] for r in rows) / n,
+        "crop_ms": sum(r[1] for r in rows) / n * 1000,
+        "prep_ms": sum(r[2] for r in rows) / n * 1000,
+        "kb": sum(r[3] for r in rows) / n / 1024,
+        "pages_s": n / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--max-dim", type=int, default=1280)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--detector", default="ink", choices=["ink", "surya"])
+    parser.add_argument("--per-image-token", type=float, default=0.0002,
+                        help="Mock prefill seconds per vision token (0.2 ms ~ a small VLM on one GPU)")
+    parser.add_argument("--port", type=int, default=9107)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    pages = [build_page(rng) for _ in range(args.pages)]
+
+    server = make_server(args.port, "mock", latency=0.02, per_image_token=args.per_image_token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{args.port}/v1"
+
+    print(f"{args.pages} synthetic pages, max_dim={args.max_dim}, concurrency={args.concurrency}, "
+          f"prefill={args.per_image_token * 1000:.2f} ms/vision token\n")
+    print(f"{'mode':<14}{'tokens/page':>12}{'crop ms':>9}{'prep ms':>9}{'KB/page':>9}{'pages/s':>9}")
+    try:
+        baseline = None
+        for mode, cropper in (("full page", None), (f"crop ({args.detector})", LayoutCropper(args.detector))):
+            r = run(pages, args.max_dim, cropper, url, args.concurrency)
+            baseline = baseline or r
+            print(f"{mode:<14}{r['tokens']:>12.0f}{r['crop_ms']:>9.1f}{r['prep_ms']:>9.1f}{r['kb']:>9.0f}{r['pages_s']:>9.2f}")
+        print(f"\nvision tokens: {1 - r['tokens'] / baseline['tokens']:.0%} fewer, "
+              f"throughput: {r['pages_s'] / baseline['pages_s']:.2f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
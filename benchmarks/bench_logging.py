@@ -0,0 +1,93 @@
+"""
+Per-page logging cost on the render / inference threads.
+
+Emits the log calls a page goes through (image resize, render progress,
+inference) from several threads, for each logging mode in a fresh
+subprocess, and reports the time the calling threads spend logging per page
+plus the time the listener needs to drain the queue afterwards.
+
+    python benchmarks/bench_logging.py --pages 2000 --threads 4
+
+Modes:
+    sync        LOG_ASYNC=0: handlers write from the calling thread
+    queue       queued records, one listener thread (default)
+    queue+rate  queued, with the hot-path loggers rate limited
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    "sync": {"LOG_ASYNC": "0"},
+    "queue": {"LOG_ASYNC": "1"},
+    "queue+rate": {"LOG_ASYNC": "1", "BENCH_RATE_LIMIT": "1"},
+}
+
+
+def run_mode(pages: int, threads: int, log_dir: str) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+    from misc.logger import setup_logger, log_context, stop_logging
+
+    rate = 2.0 if os.getenv("BENCH_RATE_LIMIT") else None
+    image_log = setup_logger(name="bench_image", log_dir=log_dir, rate_limit=rate)
+    pdf_log = setup_logger(name="bench_pdf", log_dir=log_dir, rate_limit=rate)
+    ocr_log = setup_logger(name="bench_ocr", log_dir=log_dir, rate_limit=rate)
+
+    def page(i):
+        with log_context(request_id="bench", page=i):
+            image_log.info(f"Resizing image 2480x3508 → 724x1024 (scale={0.292:.3f})")
+            pdf_log.info(f"Progress: {i + 1}/{pages} pages rendered.")
+            ocr_log.info(f"Page {i} done: 812 tokens (budget=1400)")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(page, range(pages)))
+    emit = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stop_logging()
+    drain = time.perf_counter() - start
+
+    lines = 0
+    for name in ("bench_image", "bench_pdf", "bench_ocr"):
+        with open(os.path.join(log_dir, f"{name}.log"), encoding="utf-8") as f:
+            lines += sum(1 for _ in f)
+    return {"emit_s": emit, "drain_s": drain, "lines": lines}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Console output goes to /dev/null; the files are what we measure
+        sys.stdout = open(os.devnull, "w")
+        result = run_mode(args.pages, args.threads, args.child)
+        sys.stdout = sys.__stdout__
+        print(json.dumps(result))
+        return
+
+    print(f"{args.pages} pages x 3 log calls, {args.threads} threads\n")
+    print(f"{'mode':<12}{'us/page (caller)':>18}{'drain ms':>10}{'lines written':>15}")
+    for mode, env in MODES.items():
+        with tempfile.TemporaryDirectory() as log_dir:
+            out = subprocess.run(
+                [sys.executable, __file__, "--pages", str(args.pages), "--threads", str(args.threads), "--child", log_dir],
+                env={**os.environ, **env}, capture_output=True, text=True, check=True
+            ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<12}{r['emit_s'] / args.pages * 1e6:>18.1f}{r['drain_s'] * 1000:>10.1f}{r['lines']:>15,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Peak RSS while many large PDFs are rendered at once, with and without the
+process-wide render budget (core.memory_budget).
+
+Builds synthetic PDFs (A3 pages with text and a full-page vector drawing,
+so every pixmap is fully rasterized), then runs pdf_processor for all of
+them concurrently, as simultaneous /process requests would, each with its
+own 4 render threads. Every mode runs in a fresh subprocess, because peak
+RSS only ever grows.
+
+    python benchmarks/bench_render_memory.py --pdfs 20 --pages 8 --dpi 300
+    python benchmarks/bench_render_memory.py --budget-mb 256 512
+
+Modes:
+    unbounded    budget larger than any possible demand (the old behaviour)
+    budget=N     RENDER_MEMORY_BUDGET_MB=N
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+A3 = (842, 1191)  # points
+
+
+def build_pdfs(directory: str, count: int, pages: int) -> list:
+    import fitz
+
+    paths = []
+    for n in range(count):
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page(width=A3[0], height=A3[1])
+            for i in range(12):
+                page.draw_rect(fitz.Rect(20 + i * 8, 20 + i * 8, A3[0] - 20 - i * 8, A3[1] - 20 - i * 8),
+                               color=(i / 12, 0.2, 0.5), fill=(1 - i / 24, 0.95, 0.9))
+            page.insert_textbox(fitz.Rect(60, 60, A3[0] - 60, A3[1] - 60),
+                                f"Document {n} page {p}\n" + "Lorem ipsum dolor sit amet. " * 200, fontsize=11)
+        path = os.path.join(directory, f"doc{n}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def run_mode(pdf_dir: str, dpi: int, workers: int) -> dict:
+    import psutil
+    from preprocess.pdf_processor import pdf_processor
+    from core.memory_budget import get_render_budget, get_render_budget_stats
+
+    process = psutil.Process()
+    peak = {"rss": process.memory_info().rss}
+    baseline = peak["rss"]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak["rss"] = max(peak["rss"], process.memory_info().rss)
+            time.sleep(0.01)
+
+    pdfs = sorted(os.path.join(pdf_dir, f) for f in os.listdir(pdf_dir) if f.endswith(".pdf"))
+    get_render_budget()
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    def one(path):
+        out = tempfile.mkdtemp(dir=pdf_dir)
+        return len(pdf_processor(path, out, workers=workers, dpi=dpi, max_dim=1600, image_format="JPEG") or [])
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=one, args=(p,)) for p in pdfs]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    stats = get_render_budget_stats()
+    return {
+        "elapsed_s": elapsed,
+        "baseline_mb": baseline / 2**20,
+        "peak_mb": peak["rss"] / 2**20,
+        "budget_mb": stats["capacity_bytes"] / 2**20,
+        "reserved_peak_mb": stats["peak_bytes"] / 2**20,
+        "waits": stats["waits"],
+        "max_wait_s": stats["max_wait_seconds"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=4, help="Render threads per PDF")
+    parser.add_argument("--budget-mb", type=int, nargs="+", default=[256])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Render progress logs go to the console; keep stdout for the result
+        sys.stdout = open(os.devnull, "w")
+        result = run_mode(args.child, args.dpi, args.workers)
+        sys.stdout = sys.__stdout__
+        print(json.dumps(result))
+        return
+
+    modes = {"unbounded": 1 << 20}
+    modes.update({f"budget={mb}": mb for mb in args.budget_mb})
+
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        build_pdfs(pdf_dir, args.pdfs, args.pages)
+        print(f"{args.pdfs} PDFs x {args.pages} A3 pages at {args.dpi} DPI, rendered concurrently "
+              f"({args.workers} threads each)\n")
+        print(f"{'mode':<14}{'peak RSS MB':>12}{'over base':>10}{'reserved MB':>12}{'waits':>7}{'max wait s':>11}{'time s':>8}")
+        for mode, budget_mb in modes.items():
+            out = subprocess.run(
+                [sys.executable, __file__, "--dpi", str(args.dpi), "--workers", str(args.workers), "--child", pdf_dir],
+                env={**os.environ, "RENDER_MEMORY_BUDGET_MB": str(budget_mb)},
+                capture_output=True, text=True, check=True
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:<14}{r['peak_mb']:>12.0f}{r['peak_mb'] - r['baseline_mb']:>10.0f}"
+                  f"{r['reserved_peak_mb']:>12.0f}{r['waits']:>7}{r['max_wait_s']:>11.2f}{r['elapsed_s']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
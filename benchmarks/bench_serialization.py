@@ -0,0 +1,114 @@
+"""
+Serialization and wire-size benchmark for a large /process result.
+
+Builds a synthetic result shaped like the /process response (default: 300
+pages of ~3 KB markdown each) and reports encode time and bytes on the wire
+for stdlib json (FastAPI's default path, incl. jsonable_encoder when FastAPI
+is installed) vs. orjson, uncompressed and with each negotiated encoding.
+
+    python benchmarks/bench_serialization.py --pages 300
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+
+from core.compression import available_encodings, compress_bytes
+
+WORDS = (
+    "invoice total amount due date customer account number payment terms net "
+    "shipping address quantity description unit price tax subtotal balance order "
+    "reference contract section clause agreement party effective period schedule"
+).split()
+
+
+def build_page_text(rng: random.Random, size: int) -> str:
+    parts, length = [], 0
+    while length < size:
+        if rng.random() < 0.15:
+            row = f"| {rng.choice(WORDS)} | {rng.randint(1, 999)} | {rng.uniform(1, 9999):.2f} |\n"
+        else:
+            row = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + ".\n"
+        parts.append(row)
+        length += len(row)
+    return "".join(parts)[:size]
+
+
+def build_result(pages: int, page_bytes: int) -> dict:
+    rng = random.Random(42)
+    page_list = [
+        {
+            "page_no": i + 1,
+            "source_type": "pdf",
+            "source_file": "report.pdf",
+            "pdf_page_no": i + 1,
+            "text": f"# Page {i + 1}\n{build_page_text(rng, page_bytes)}",
+        } for i in range(pages)
+    ]
+    markdown = "\n\n".join(f"## Page {p['page_no']}\n{p['text']}" for p in page_list)
+    return {
+        "status": "success",
+        "request_id": "abcd1234",
+        "job_status": "completed",
+        "total_pages": pages,
+        "result": markdown,
+        "pages": page_list,
+        "metadata": {"id": "abcd1234", "filename": "report.pdf", "model": "XF3 (Neural v3.0)", "total_pages": pages},
+    }
+
+
+def timed(fn, repeat: int):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--page-bytes", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    result = build_result(args.pages, args.page_bytes)
+
+    encoders = {
+        "json (stdlib)": lambda: json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        "orjson": lambda: orjson.dumps(result),
+    }
+    try:
+        from fastapi.encoders import jsonable_encoder
+        encoders["fastapi default"] = lambda: json.dumps(
+            jsonable_encoder(result), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+    except ImportError:
+        pass
+
+    print(f"Synthetic /process result: {args.pages} pages x {args.page_bytes} B\n")
+    print(f"{'encoder':<18}{'encode ms':>11}{'bytes':>14}")
+    payload = None
+    for name, fn in encoders.items():
+        body, seconds = timed(fn, args.repeat)
+        print(f"{name:<18}{seconds * 1000:>11.1f}{len(body):>14,}")
+        if name == "orjson":
+            payload = body
+
+    print(f"\n{'encoding':<18}{'compress ms':>11}{'bytes':>14}{'ratio':>8}")
+    print(f"{'identity':<18}{0:>11.1f}{len(payload):>14,}{1:>8.1f}")
+    for encoding in available_encodings():
+        body, seconds = timed(lambda: compress_bytes(payload, encoding), args.repeat)
+        print(f"{encoding:<18}{seconds * 1000:>11.1f}{len(body):>14,}{len(payload) / len(body):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+API cold-start benchmark and budget check.
+
+Measures, each in a fresh interpreter:
+  - wall time of `import main`
+  - which heavy OCR dependencies (torch, PyMuPDF, PIL, openai) `import main`
+    pulls in; these should load on first use only
+  - time from spawning uvicorn to the first 200 from /health
+  - an `-X importtime` report of the slowest imports
+
+Exits non-zero when a budget is exceeded or a heavy module is imported
+eagerly, so it can gate a deploy or run in CI.
+
+    python benchmarks/bench_startup.py --import-budget 2 --health-budget 5
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("torch", "fitz", "PIL", "openai")
+
+
+def _python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def measure_import() -> dict:
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import main\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "print(json.dumps({'seconds': elapsed, 'heavy': heavy}))"
+    )
+    return json.loads(_python(code).stdout.strip().splitlines()[-1])
+
+
+def importtime_report(top: int) -> list:
+    """Slowest top-level imports of `import main` as (cumulative_us, self_us, module)."""
+    stderr = _python("import main", "-X", "importtime").stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented two spaces per level; keep main and what it imports directly
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        rows.append((int(cumulative_us), int(self_us), name, depth))
+    roots = sorted((r for r in rows if r[3] <= 1), reverse=True)
+    return [r[:3] for r in roots[:top]]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_first_health(timeout: float) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited during start-up:\n{proc.stderr.read()}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        raise TimeoutError(f"/health did not answer within {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--import-budget", type=float, default=2.0, help="Max seconds for `import main`")
+    parser.add_argument("--health-budget", type=float, default=5.0, help="Max seconds to first /health response")
+    parser.add_argument("--top", type=int, default=15, help="Rows in the -X importtime report")
+    parser.add_argument("--skip-server", action="store_true", help="Only measure imports")
+    args = parser.parse_args()
+
+    failures = []
+
+    result = measure_import()
+    print(f"import main: {result['seconds']:.2f}s (budget {args.import_budget:.2f}s)")
+    if result["seconds"] > args.import_budget:
+        failures.append("import main over budget")
+    if result["heavy"]:
+        print(f"  eagerly imported: {', '.join(result['heavy'])}")
+        failures.append("heavy modules imported at start-up")
+
+    if not args.skip_server:
+        try:
+            seconds = measure_first_health(timeout=max(30.0, args.health_budget * 3))
+            print(f"first /health: {seconds:.2f}s (budget {args.health_budget:.2f}s)")
+            if seconds > args.health_budget:
+                failures.append("first /health over budget")
+        except (RuntimeError, TimeoutError) as e:
+            print(f"first /health: failed ({e})")
+            failures.append("server did not start")
+
+    print(f"\n{'cumulative ms':>14}{'self ms':>10}  module (-X importtime)")
+    for cumulative_us, self_us, name in importtime_report(args.top):
+        print(f"{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {name}")
+
+    if failures:
+        print(f"\nFAIL: {'; '.join(failures)}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
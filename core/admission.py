@@ -0,0 +1,208 @@
+import asyncio
+import math
+import os
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import HTTPException
+
+from core.shared_state import get_store
+
+# Limits (0 = unlimited)
+USER_CONCURRENCY = int(os.getenv("ADMISSION_USER_CONCURRENCY", 2))           # OCR requests running per user
+PAGES_PER_MINUTE = float(os.getenv("ADMISSION_PAGES_PER_MINUTE", 60))        # token bucket refill, per user
+BURST_PAGES = float(os.getenv("ADMISSION_BURST_PAGES", 0)) or PAGES_PER_MINUTE  # bucket capacity
+MAX_QUEUED_PAGES = int(os.getenv("ADMISSION_MAX_QUEUED_PAGES", 400))         # pages admitted and not finished, all users
+RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", 10))                    # seconds, when busy (no exact estimate)
+
+# Admissions that are never released (e.g. a worker hung) stop counting after this long
+LEASE_SECONDS = 3600
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _process_start(pid: int) -> str:
+    """Start time of `pid` (Linux; "" elsewhere), telling a process apart from a later one reusing its pid."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return ""
+
+
+# Stored with each admission (the "run" column) next to the pid
+PROCESS_START = _process_start(os.getpid())
+
+
+class AdmissionController:
+    """
+    Decides whether an OCR request may start, before any page is rendered.
+
+    Three limits, checked in this order:
+      1. per-user concurrency: running requests per user (429),
+      2. global backlog: pages admitted but not yet finished (503),
+      3. per-user token bucket on pages per minute (429).
+    A rejected request consumes nothing. The daily quota (core.utils.check_usage_limit)
+    still applies on top.
+
+    State lives in the shared SQLite store, so the limits hold across all
+    uvicorn workers. Admissions of processes that are gone (dead pid, or
+    the pid now belongs to a process started later) are dropped on the
+    next check; those of other live workers are kept, whatever their run.
+    """
+
+    def __init__(self):
+        self._ready = False
+
+    def _setup(self, conn):
+        if self._ready:
+            return
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS admission_running "
+            "(id TEXT PRIMARY KEY, run TEXT, pid INTEGER, user TEXT, pages INTEGER, started REAL, model TEXT)"
+        )
+        # Stores created before admissions recorded their model
+        if "model" not in {row[1] for row in conn.execute("PRAGMA table_info(admission_running)")}:
+            conn.execute("ALTER TABLE admission_running ADD COLUMN model TEXT")
+        conn.execute("CREATE TABLE IF NOT EXISTS admission_buckets (user TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+        self._ready = True
+
+    @staticmethod
+    def _stale(run: str, pid: int, started: float, now: float) -> bool:
+        return now - started > LEASE_SECONDS or not _pid_alive(pid) or _process_start(pid) != run
+
+    def _prune(self, conn):
+        now = time.time()
+        rows = conn.execute("SELECT id, run, pid, started FROM admission_running").fetchall()
+        stale = [(rid,) for rid, run, pid, started in rows if self._stale(run, pid, started, now)]
+        if stale:
+            conn.executemany("DELETE FROM admission_running WHERE id = ?", stale)
+
+    def admit(self, user: str, pages: int, model: Optional[str] = None) -> str:
+        """
+        Admits a request of `pages` pages for `user` or raises HTTPException
+        (429 / 503 with Retry-After). `model` is recorded for the per-model
+        running counts (see stats()).
+
+        Returns:
+            A ticket to pass to release() once the request is done.
+        """
+        store = get_store()
+        now = time.time()
+        with store.transaction() as conn:
+            self._setup(conn)
+            self._prune(conn)
+
+            running = conn.execute(
+                "SELECT COUNT(*) FROM admission_running WHERE user = ?", (user,)
+            ).fetchone()[0]
+            if USER_CONCURRENCY and running >= USER_CONCURRENCY:
+                rejected = ("user_concurrency", 429, RETRY_AFTER,
+                            f"Too many requests in progress ({running}); wait for one to finish.")
+            else:
+                rejected = None
+
+            if rejected is None and MAX_QUEUED_PAGES:
+                queued = conn.execute("SELECT COALESCE(SUM(pages), 0) FROM admission_running").fetchone()[0]
+                # A request larger than the bound is still admitted when nothing else is queued
+                if queued and queued + pages > MAX_QUEUED_PAGES:
+                    rejected = ("queue_full", 503, RETRY_AFTER,
+                                f"Server is busy ({queued} pages queued); try again shortly.")
+
+            tokens = None
+            if rejected is None and PAGES_PER_MINUTE:
+                rate = PAGES_PER_MINUTE / 60
+                row = conn.execute("SELECT tokens, updated FROM admission_buckets WHERE user = ?", (user,)).fetchone()
+                tokens = BURST_PAGES if row is None else min(BURST_PAGES, row[0] + (now - row[1]) * rate)
+                # Requests larger than the burst wait for a full bucket and leave it in debt
+                needed = min(pages, BURST_PAGES)
+                if tokens < needed:
+                    rejected = ("rate_limited", 429, math.ceil((needed - tokens) / rate),
+                                f"Page rate limit of {PAGES_PER_MINUTE:g} pages/minute exceeded.")
+
+            if rejected is not None:
+                reason, status, retry_after, detail = rejected
+            else:
+                reason = "admitted"
+                ticket = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO admission_running (id, run, pid, user, pages, started, model) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (ticket, PROCESS_START, os.getpid(), user, pages, now, model)
+                )
+                if tokens is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO admission_buckets (user, tokens, updated) VALUES (?, ?, ?)",
+                        (user, tokens - pages, now)
+                    )
+
+        store.add_counters("admission", {reason: 1})
+        if rejected is not None:
+            raise HTTPException(status_code=status, detail=detail, headers={"Retry-After": str(max(1, retry_after))})
+        return ticket
+
+    def release(self, ticket: str):
+        with get_store().transaction() as conn:
+            conn.execute("DELETE FROM admission_running WHERE id = ?", (ticket,))
+
+    @asynccontextmanager
+    async def hold(self, user: str, pages: int, ticket: str = None, model: Optional[str] = None):
+        """
+        Admits the request for the duration of the block (store access runs
+        off the event loop). A `ticket` from an earlier admit() is held and
+        released instead of admitting again.
+        """
+        if ticket is None:
+            ticket = await asyncio.to_thread(self.admit, user, pages, model)
+        try:
+            yield ticket
+        finally:
+            await asyncio.to_thread(self.release, ticket)
+
+    def stats(self) -> dict:
+        """
+        Read-only (for /health and the warm-up policy): admissions a check
+        would prune are left in place but not counted. `by_model` counts the
+        running requests per model id.
+        """
+        store = get_store()
+        if not self._ready:
+            with store.transaction() as conn:
+                self._setup(conn)
+        now = time.time()
+        live = [
+            (pages, model)
+            for run, pid, pages, started, model in store.query(
+                "SELECT run, pid, pages, started, model FROM admission_running"
+            )
+            if not self._stale(run, pid, started, now)
+        ]
+        by_model = defaultdict(int)
+        for _, model in live:
+            by_model[model or "unknown"] += 1
+        return {
+            "running": len(live),
+            "by_model": dict(by_model),
+            "queued_pages": sum(pages for pages, _ in live),
+            "max_queued_pages": MAX_QUEUED_PAGES,
+            **dict.fromkeys(("admitted", "user_concurrency", "queue_full", "rate_limited"), 0),
+            **store.counters("admission"),
+        }
+
+
+admission = AdmissionController()
+
+
+def get_admission_stats() -> dict:
+    return admission.stats()
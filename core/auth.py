@@ -1,14 +1,18 @@
 import os
+import time
 from typing import Optional
 from fastapi import Header, HTTPException, Depends
 from google.oauth2 import id_token
 from google.auth.transport import requests
 from db.database import SessionLocal, User
+from core.metrics import record_latency
 from sqlalchemy.orm import Session
 
 from dotenv import load_dotenv
 load_dotenv()
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
+# Comma-separated emails allowed on /admin (profiling, stack dumps); empty = admin API off
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
 def verify_google_token(authorization: Optional[str] = Header(None), origin: Optional[str] = Header(None)):
     if not authorization or " " not in authorization:
@@ -17,12 +21,14 @@ def verify_google_token(authorization: Optional[str] = Header(None), origin: Opt
         
     try:
         token = authorization.split(" ")[1]
+        start = time.perf_counter()
         idinfo = id_token.verify_oauth2_token(
             token, 
             requests.Request(), 
             GOOGLE_CLIENT_ID, 
             clock_skew_in_seconds=60
         )
+        record_latency("auth", time.perf_counter() - start)
         
         email = idinfo.get("email")
         name = idinfo.get("name")
@@ -50,3 +56,10 @@ def verify_google_token(authorization: Optional[str] = Header(None), origin: Opt
     except Exception as e:
         print(f"DEBUG: Token verification failed: {e}")
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+
+def require_admin(authorization: Optional[str] = Header(None), user: dict = Depends(verify_google_token)):
+    # The test-user fallback (no Authorization header) never counts as an admin
+    if not authorization or (user.get("email") or "").lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
@@ -0,0 +1,121 @@
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Server-wide cap on a single OCR request (seconds, 0 = none); clients may ask for less
+MAX_REQUEST_SECONDS = float(os.getenv("PROCESS_MAX_SECONDS", 0))
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class RequestCancelled(Exception):
+    """Raised inside OCR work once its request was cancelled or ran out of time."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Cancellation state of one request, shared by the HTTP handler, the render
+    threads and the inference calls.
+
+    It is set when the client disconnects or when the request's deadline
+    passes. Workers poll it (check_cancelled) between pages and stream
+    chunks. Blocking calls can register a callback to be interrupted
+    right away.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self._reason: Optional[str] = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def reason(self) -> Optional[str]:
+        if self._reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+        return self._reason
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without one."""
+        return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "cancelled"):
+        with self._lock:
+            if self._reason is not None:
+                return
+            self._reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def raise_if_cancelled(self):
+        reason = self.reason
+        if reason is not None:
+            raise RequestCancelled(reason)
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """Runs `callback` if the token is cancelled while the block executes."""
+        with self._lock:
+            already = self._reason is not None
+            if not already:
+                self._callbacks.append(callback)
+        if already:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("cancel_token", default=None)
+
+
+@contextmanager
+def cancel_scope(token: CancelToken):
+    """
+    Makes `token` the current token for this context. asyncio.to_thread and
+    executor submissions made with contextvars.copy_context().run carry it
+    into worker threads.
+    """
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current.get()
+
+
+def check_cancelled():
+    """Raises RequestCancelled if the current request was cancelled; no-op outside a request."""
+    token = _current.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+async def watch_disconnect(request, token: CancelToken, interval: float = DISCONNECT_POLL_INTERVAL):
+    """Cancels `token` once the client goes away (or its deadline passes); run as a task."""
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel("client disconnected")
+            return
+        await asyncio.sleep(interval)
@@ -0,0 +1,153 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import AsyncSessionLocal, SessionLocal, OCRPage, OCRRequest
+from core.page_store import compress_text, page_text
+
+# A run refreshes its request's heartbeat this often. A "processing" request whose
+# heartbeat is older than STALE_SECONDS lost its run (worker crashed or restarted)
+# and may be taken over by a resume or an identical submission.
+HEARTBEAT_SECONDS = float(os.getenv("REQUEST_HEARTBEAT_SECONDS", 15))
+STALE_SECONDS = 4 * HEARTBEAT_SECONDS
+
+
+class PageCheckpointer:
+    """
+    Persists OCR pages as they complete so a crashed or interrupted request
+    can be resumed without redoing finished pages.
+
+    Pages arrive from the inference worker threads, so writes go through a
+    dedicated session guarded by a lock (one commit per page). A page that
+    already has a checkpoint (unique request_id, page_no) is kept as is.
+    """
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self._db = SessionLocal()
+        self._lock = Lock()
+        self.saved = 0
+        self.page_nos = set()
+
+    def save(self, page: dict, file_id: int = None):
+        text_z, codec = compress_text(page["text"])
+        with self._lock:
+            self._db.add(OCRPage(
+                request_id=self.request_id,
+                file_id=file_id,
+                page_no=page["page_no"],
+                source_type=page["source_type"],
+                source_file=page["source_file"],
+                pdf_page_no=page["pdf_page_no"],
+                text_z=text_z,
+                codec=codec
+            ))
+            try:
+                self._db.commit()
+            except IntegrityError:
+                self._db.rollback()
+            else:
+                self.saved += 1
+            self.page_nos.add(page["page_no"])
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _page_dicts(rows) -> list:
+    return [
+        {
+            "page_no": row.page_no,
+            "source_type": row.source_type,
+            "source_file": row.source_file,
+            "pdf_page_no": row.pdf_page_no,
+            "text": page_text(row)
+        } for row in rows
+    ]
+
+
+def get_saved_pages(db: Session, request_id: str) -> list:
+    """Returns the checkpointed pages of a request as dicts, ordered by page number."""
+    rows = db.query(OCRPage).filter(OCRPage.request_id == request_id).order_by(OCRPage.page_no).all()
+    return _page_dicts(rows)
+
+
+async def get_saved_pages_async(db: AsyncSession, request_id: str) -> list:
+    rows = (await db.scalars(
+        select(OCRPage).filter(OCRPage.request_id == request_id).order_by(OCRPage.page_no)
+    )).all()
+    return _page_dicts(rows)
+
+
+async def get_saved_page_nos(db: AsyncSession, request_id: str) -> set:
+    rows = await db.scalars(select(OCRPage.page_no).filter(OCRPage.request_id == request_id))
+    return set(rows.all())
+
+
+def is_running(status: Optional[str], heartbeat_at: Optional[datetime]) -> bool:
+    """Whether a live run is processing the request (its heartbeat is recent)."""
+    return status == "processing" and heartbeat_at is not None \
+        and datetime.utcnow() - heartbeat_at <= timedelta(seconds=STALE_SECONDS)
+
+
+async def claim_request(db: AsyncSession, request_id: str) -> bool:
+    """
+    Atomically moves a request to "processing" unless a live run has it, so
+    only one run (original, resume or duplicate submission) OCRs it at a
+    time. A "processing" request with a stale heartbeat is taken over.
+    """
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(OCRRequest)
+        .where(
+            OCRRequest.id == request_id,
+            or_(
+                OCRRequest.status != "processing",
+                OCRRequest.heartbeat_at.is_(None),
+                OCRRequest.heartbeat_at < now - timedelta(seconds=STALE_SECONDS),
+            ),
+        )
+        .values(status="processing", heartbeat_at=now)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def keep_alive(request_id: str):
+    """Refreshes the heartbeat of a running request until cancelled; run as a task next to the run."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(OCRRequest)
+                    .where(OCRRequest.id == request_id, OCRRequest.status == "processing")
+                    .values(heartbeat_at=datetime.utcnow())
+                )
+                await db.commit()
+        except Exception:
+            # A missed beat only brings the takeover closer; the next one may get through
+            pass
+
+
+async def release_request(request_id: str):
+    """Marks a request whose run failed as "partial" so it can be resumed without waiting for staleness."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(OCRRequest)
+            .where(OCRRequest.id == request_id, OCRRequest.status == "processing")
+            .values(status="partial")
+        )
+        await db.commit()
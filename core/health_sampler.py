@@ -0,0 +1,199 @@
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+import psutil
+from sqlalchemy import text
+
+from core.metrics import latency_p50_ms, flush_shared_metrics
+from core.shared_state import MULTI_WORKER, FileLock, get_store
+from core.status_manager import status_manager
+from misc.logger import setup_logger
+
+logger = setup_logger(name="health-sampler", log_dir="logs")
+
+SAMPLE_INTERVAL = float(os.getenv("HEALTH_SAMPLE_INTERVAL", 5))
+HISTORY_SIZE = int(os.getenv("HEALTH_HISTORY_SIZE", 120))   # 10 minutes at 5s
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+class HealthSampler:
+    """
+    Collects system, GPU, model and component health on a fixed interval in a
+    background thread, so /health serves the latest snapshot instead of
+    running nvidia-smi / psutil once per dashboard poll.
+
+    Snapshots are kept in a ring buffer for sparkline time series.
+
+    With several uvicorn workers only the one holding the "supervisor" lock
+    samples; it publishes snapshots to the shared store, which the other
+    workers serve from. Every worker flushes its metric counters each tick.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, history: int = HISTORY_SIZE):
+        self.interval = interval
+        self.samples = deque(maxlen=history)
+        self._gpu_available = True
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lease = FileLock("supervisor")
+        # Prime cpu_percent so the first sample reports usage since now, not 0.0
+        psutil.cpu_percent(interval=None)
+
+    # -------------------------
+    # PROBES
+    # -------------------------
+    def _gpu_info(self) -> list:
+        if not self._gpu_available:
+            return []
+        try:
+            output = subprocess.check_output(
+                ["nvidia-smi", "--query-gpu=utilization.gpu,memory.used,memory.total", "--format=csv,noheader,nounits"],
+                encoding="utf-8", timeout=5
+            )
+        except FileNotFoundError:
+            # No NVIDIA driver on this host: stop forking nvidia-smi every interval
+            self._gpu_available = False
+            return []
+        except Exception:
+            return []
+
+        gpus = []
+        for line in output.strip().split("\n"):
+            util, mem_used, mem_total = line.split(", ")
+            gpus.append({
+                "load": f"{util}%",
+                "memory": f"{mem_used}/{mem_total} MB"
+            })
+        return gpus
+
+    def _probe_storage(self) -> dict:
+        from db.database import engine
+        start = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return {"name": "Storage Cluster", "status": "operational", "latency": _ms(time.perf_counter() - start)}
+        except Exception as e:
+            logger.warning(f"Storage probe failed: {e}")
+            return {"name": "Storage Cluster", "status": "offline", "latency": None}
+
+    def _probe_inference(self) -> dict:
+        from core.http_client import get_http_client
+        from model.backends import get_backend_stats
+        from model.start_vllm import VLLM_HOST, VLLM_PORT
+
+        urls = [b["url"] for backends in get_backend_stats().values() for b in backends if b["healthy"]]
+        urls = urls or [f"http://{VLLM_HOST}:{VLLM_PORT}/v1"]
+        best = None
+        for url in urls:
+            start = time.perf_counter()
+            try:
+                if get_http_client().get(f"{url}/models", timeout=2).status_code == 200:
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+            except Exception:
+                continue
+
+        if best is None:
+            return {"name": "Neural Engine", "status": "offline", "latency": None}
+        return {"name": "Neural Engine", "status": "operational", "latency": _ms(best)}
+
+    def sample(self) -> dict:
+        start = time.perf_counter()
+        memory = psutil.virtual_memory()
+        components = [
+            {"name": "Core API", "status": "operational", "latency": latency_p50_ms("api")},
+            self._probe_inference(),
+            self._probe_storage(),
+            {"name": "Auth Gateway", "status": "operational", "latency": latency_p50_ms("auth")},
+        ]
+        snapshot = {
+            "ts": time.time(),
+            "timestamp": datetime.now().isoformat(),
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": memory.percent,
+            "memory_used": memory.used,
+            "memory_total": memory.total,
+            "gpu": self._gpu_info(),
+            "components": components,
+            "model_status": status_manager.get_status(),
+        }
+        snapshot["sample_ms"] = _ms(time.perf_counter() - start)
+        self.samples.append(snapshot)
+        if MULTI_WORKER and self._lease.held:
+            store = get_store()
+            store.put("health_latest", snapshot)
+            store.put("health_series", self._series(self.samples, self.samples.maxlen))
+        return snapshot
+
+    def is_supervisor(self) -> bool:
+        """True if this worker owns sampling (always, with a single worker)."""
+        if not MULTI_WORKER or self._lease.held:
+            return True
+        if self._lease.acquire(blocking=False):
+            logger.info(f"Worker {os.getpid()} is now the health supervisor")
+            return True
+        return False
+
+    # -------------------------
+    # ACCESS
+    # -------------------------
+    def latest(self) -> Optional[dict]:
+        if MULTI_WORKER and not self._lease.held:
+            return get_store().get("health_latest")
+        return self.samples[-1] if self.samples else None
+
+    def series(self, points: int) -> list:
+        """Compact time series of the last `points` samples (oldest first)."""
+        if MULTI_WORKER and not self._lease.held:
+            return get_store().get("health_series", [])[-points:]
+        return self._series(self.samples, points)
+
+    @staticmethod
+    def _series(samples, points: int) -> list:
+        recent = list(samples)[-points:]
+        return [
+            {
+                "ts": s["ts"],
+                "cpu": s["cpu_percent"],
+                "memory": s["memory_percent"],
+                "gpu": [float(g["load"].rstrip("%") or 0) for g in s["gpu"]],
+            } for s in recent
+        ]
+
+    # -------------------------
+    # LIFECYCLE
+    # -------------------------
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if MULTI_WORKER:
+                    flush_shared_metrics()
+                if self.is_supervisor():
+                    self.sample()
+            except Exception as e:
+                logger.error(f"Health sample failed: {e}", exc_info=True)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="health-sampler")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._lease.held:
+            self._lease.release()
+
+
+health_sampler = HealthSampler()
@@ -0,0 +1,118 @@
+import gzip
+import importlib.util
+import os
+import threading
+from typing import Optional
+
+import httpx
+
+from core.metrics import record_http_request
+from misc.logger import setup_logger
+
+logger = setup_logger(name="http-client", log_dir="logs")
+
+# ==========================
+# SETTINGS (env overridable)
+# ==========================
+
+CONNECT_TIMEOUT = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.getenv("INFERENCE_READ_TIMEOUT", 600))   # one page of generation
+WRITE_TIMEOUT = float(os.getenv("INFERENCE_WRITE_TIMEOUT", 60))  # multi-MB base64 payloads
+POOL_TIMEOUT = float(os.getenv("INFERENCE_POOL_TIMEOUT", 60))    # waiting for a free connection
+KEEPALIVE_EXPIRY = float(os.getenv("INFERENCE_KEEPALIVE_EXPIRY", 60))
+HTTP2 = os.getenv("INFERENCE_HTTP2", "1") == "1"
+# gzip request bodies above this size. Off by default: vLLM itself doesn't
+# decode Content-Encoding, only enable behind a gateway that does.
+COMPRESS_MIN_BYTES = int(os.getenv("INFERENCE_COMPRESS_MIN_BYTES", 0))
+
+
+def _default_pool_size() -> int:
+    """Enough connections for every model's inference concurrency, with headroom for health checks."""
+    from model.profiles import all_profiles
+    total = sum(max(1, p.concurrency) * max(1, len(p.backends)) for p in all_profiles().values())
+    return max(16, 2 * total)
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """
+    HTTP transport that counts new vs. reused connections and can gzip large
+    request bodies.
+    """
+
+    def __init__(self, *args, compress_min_bytes: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.compress_min_bytes = compress_min_bytes
+
+    def _open_connections(self) -> int:
+        try:
+            return len(self._pool.connections)
+        except AttributeError:
+            return 0
+
+    def _maybe_compress(self, request: httpx.Request) -> int:
+        if not self.compress_min_bytes or "content-encoding" in request.headers:
+            return 0
+        body = request.read()
+        if len(body) < self.compress_min_bytes:
+            return 0
+        compressed = gzip.compress(body, compresslevel=1)
+        request.stream = httpx.ByteStream(compressed)
+        request.headers["Content-Encoding"] = "gzip"
+        request.headers["Content-Length"] = str(len(compressed))
+        return len(body) - len(compressed)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        saved = self._maybe_compress(request)
+        before = self._open_connections()
+        response = super().handle_request(request)
+        new_connection = self._open_connections() > before
+        record_http_request(
+            new_connection=new_connection,
+            bytes_sent=int(request.headers.get("Content-Length", 0)),
+            bytes_saved=saved,
+        )
+        return response
+
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """
+    Process-wide HTTP client for inference and vLLM control calls.
+
+    Connections are kept alive and shared by every backend, with separate
+    connect/read/write/pool timeouts instead of a single 3600s timeout.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            pool_size = int(os.getenv("INFERENCE_MAX_CONNECTIONS", 0)) or _default_pool_size()
+            http2 = HTTP2 and importlib.util.find_spec("h2") is not None
+            transport = PooledTransport(
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                http2=http2,
+                compress_min_bytes=COMPRESS_MIN_BYTES,
+            )
+            _client = httpx.Client(
+                transport=transport,
+                timeout=httpx.Timeout(
+                    connect=CONNECT_TIMEOUT, read=READ_TIMEOUT,
+                    write=WRITE_TIMEOUT, pool=POOL_TIMEOUT,
+                ),
+            )
+            logger.info(f"HTTP client ready (max_connections={pool_size}, http2={http2})")
+        return _client
+
+
+def close_http_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,37 @@
+import hashlib
+import os
+from typing import BinaryIO, Iterable, Optional
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# How long a duplicate submission waits for the in-flight original before getting 202
+WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 300))
+POLL_INTERVAL = 1.0
+
+_CHUNK = 1024 * 1024
+
+
+def _file_digest(fileobj: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(_CHUNK), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def request_key(email: str, model: str, prompt: str, files: Iterable[BinaryIO],
+                client_key: Optional[str] = None) -> str:
+    """
+    Deduplication key of a /process submission, scoped to the user.
+
+    Uses the client's Idempotency-Key header when given; otherwise the
+    content: model, prompt and the SHA-256 of every uploaded file, in order
+    (so re-posting the same upload under another filename still matches).
+    Blocking (reads the uploads); call it off the event loop.
+    """
+    parts = [email]
+    if client_key:
+        parts += ["client", client_key.strip()]
+    else:
+        parts += ["content", model, prompt, *(_file_digest(f) for f in files)]
+    return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
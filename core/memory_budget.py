@@ -0,0 +1,155 @@
+import ctypes
+import ctypes.util
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+import psutil
+
+from core.cancellation import check_cancelled
+from core.shared_state import WORKERS
+
+# Bytes of page pixels rendering may hold at once in this process (0 = size from available RAM)
+RENDER_MEMORY_BUDGET = int(float(os.getenv("RENDER_MEMORY_BUDGET_MB", 0)) * 1024 * 1024)
+# Share of the RAM available at start-up given to rendering, split between the uvicorn workers
+RENDER_MEMORY_FRACTION = float(os.getenv("RENDER_MEMORY_FRACTION", 0.25))
+MIN_BUDGET = 128 * 1024 * 1024
+# A page render holds the pixmap and its PIL copy at the same time
+RENDER_COPIES = 2
+_WAIT_SLICE = 0.25  # waiting renders re-check their request's cancel token this often
+# Allocations from this size up get their own mapping, returned to the OS when freed
+MMAP_THRESHOLD = 1024 * 1024
+_M_MMAP_THRESHOLD = -3  # glibc mallopt() parameter
+
+
+def default_render_budget() -> int:
+    if RENDER_MEMORY_BUDGET:
+        return RENDER_MEMORY_BUDGET
+    available = psutil.virtual_memory().available
+    return max(MIN_BUDGET, int(available * RENDER_MEMORY_FRACTION / max(1, WORKERS)))
+
+
+def pin_mmap_threshold() -> bool:
+    """
+    Pins glibc's mmap threshold so page pixmaps are always mmapped.
+
+    By default glibc raises the threshold each time a large mmapped block is
+    freed, so later pixmaps come from the heap of the render thread that
+    allocated them and stay cached there once freed. Every render thread
+    then keeps its last pages resident and the budget bounds only what is in
+    use, not RSS. Has no effect off glibc, or when MALLOC_MMAP_THRESHOLD_
+    is set explicitly.
+    """
+    if not sys.platform.startswith("linux") or "MALLOC_MMAP_THRESHOLD_" in os.environ:
+        return False
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6")
+        return bool(libc.mallopt(_M_MMAP_THRESHOLD, MMAP_THRESHOLD))
+    except (OSError, AttributeError):  # not glibc (e.g. musl)
+        return False
+
+
+def estimate_render_bytes(width_pt: float, height_pt: float, dpi: int, channels: int = 3) -> int:
+    """Peak memory of rendering a page of this size (PDF points) at `dpi`."""
+    zoom = dpi / 72
+    return int(width_pt * zoom) * int(height_pt * zoom) * channels * RENDER_COPIES
+
+
+class MemoryBudget:
+    """
+    Byte-weighted semaphore shared by every render thread of the process.
+
+    A page render reserves its estimated pixmap size before rasterizing and
+    releases it once the page image is saved, so concurrent requests together
+    never hold more than `capacity` bytes of page pixels. Waiters are admitted
+    in FIFO order, so a large page is not starved by a stream of small ones.
+    A page larger than the whole budget runs alone.
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        self.capacity = capacity or default_render_budget()
+        self.in_use = 0
+        self._waiters = deque()
+        self._cond = threading.Condition()
+        self.stats = {"acquired": 0, "waits": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "peak_bytes": 0}
+
+    def resize(self, capacity: int):
+        with self._cond:
+            self.capacity = capacity
+            self._cond.notify_all()
+
+    def acquire(self, nbytes: int) -> int:
+        """
+        Blocks until `nbytes` fit into the budget and reserves them.
+
+        Returns:
+            The reserved amount (clamped to the capacity), to pass to release().
+        """
+        with self._cond:
+            nbytes = min(nbytes, self.capacity)
+            ticket = object()
+            self._waiters.append(ticket)
+            start = time.perf_counter()
+            waited = False
+            try:
+                while self._waiters[0] is not ticket or self.in_use + nbytes > self.capacity:
+                    waited = True
+                    self._cond.wait(_WAIT_SLICE)
+                    # A render queued behind others must not outlive its request
+                    check_cancelled()
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+            self.in_use += nbytes
+            self.stats["acquired"] += 1
+            self.stats["peak_bytes"] = max(self.stats["peak_bytes"], self.in_use)
+            if waited:
+                elapsed = time.perf_counter() - start
+                self.stats["waits"] += 1
+                self.stats["wait_seconds"] += elapsed
+                self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], elapsed)
+            return nbytes
+
+    def release(self, nbytes: int):
+        with self._cond:
+            self.in_use -= nbytes
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: int):
+        reserved = self.acquire(nbytes)
+        try:
+            yield reserved
+        finally:
+            self.release(reserved)
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            stats = dict(self.stats)
+            stats.update(capacity_bytes=self.capacity, in_use_bytes=self.in_use, waiting=len(self._waiters))
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["max_wait_seconds"] = round(stats["max_wait_seconds"], 3)
+        return stats
+
+
+_render_budget: Optional[MemoryBudget] = None
+_budget_lock = threading.Lock()
+
+
+def get_render_budget() -> MemoryBudget:
+    global _render_budget
+    with _budget_lock:
+        if _render_budget is None:
+            pin_mmap_threshold()
+            _render_budget = MemoryBudget()
+    return _render_budget
+
+
+def get_render_budget_stats() -> Optional[dict]:
+    # Not created until the first PDF is rendered
+    return _render_budget.get_stats() if _render_budget is not None else None
@@ -1,4 +1,94 @@
 import time
+from collections import deque
+from threading import Lock
+from typing import Optional
+
+from core.shared_state import MULTI_WORKER, get_store
 
 START_TIME = time.time()
 REQUEST_STATS = {"total": 0, "success": 0, "failed": 0}
+
+# Generation budget vs. actual tokens (model.token_budget)
+TOKEN_STATS = {"pages": 0, "budget": 0, "used": 0, "early_stops": 0, "truncated": 0}
+_token_lock = Lock()
+
+
+def get_request_stats() -> dict:
+    if MULTI_WORKER:
+        return {**dict.fromkeys(REQUEST_STATS, 0), **get_store().counters("requests")}
+    return dict(REQUEST_STATS)
+
+
+def record_tokens(budget: int, used: int, early_stopped: bool = False, truncated: bool = False):
+    with _token_lock:
+        TOKEN_STATS["pages"] += 1
+        TOKEN_STATS["budget"] += budget
+        TOKEN_STATS["used"] += used
+        TOKEN_STATS["early_stops"] += int(early_stopped)
+        TOKEN_STATS["truncated"] += int(truncated)
+
+
+def get_token_stats() -> dict:
+    if MULTI_WORKER:
+        stats = {**dict.fromkeys(TOKEN_STATS, 0), **get_store().counters("tokens")}
+    else:
+        with _token_lock:
+            stats = dict(TOKEN_STATS)
+    stats["utilization"] = round(stats["used"] / stats["budget"], 3) if stats["budget"] else None
+    return stats
+
+
+# Inference HTTP transport (core.http_client)
+HTTP_STATS = {"requests": 0, "new_connections": 0, "reused_connections": 0, "bytes_sent": 0, "bytes_saved": 0}
+_http_lock = Lock()
+
+
+def record_http_request(new_connection: bool, bytes_sent: int = 0, bytes_saved: int = 0):
+    with _http_lock:
+        HTTP_STATS["requests"] += 1
+        HTTP_STATS["new_connections" if new_connection else "reused_connections"] += 1
+        HTTP_STATS["bytes_sent"] += bytes_sent
+        HTTP_STATS["bytes_saved"] += bytes_saved
+
+
+def get_http_stats() -> dict:
+    if MULTI_WORKER:
+        stats = {**dict.fromkeys(HTTP_STATS, 0), **get_store().counters("http")}
+    else:
+        with _http_lock:
+            stats = dict(HTTP_STATS)
+    stats["reuse_rate"] = round(stats["reused_connections"] / stats["requests"], 3) if stats["requests"] else None
+    return stats
+
+
+# Recent latencies (seconds) of lightweight operations, reported by /health components
+LATENCY_WINDOW = 500
+_latencies = {"api": deque(maxlen=LATENCY_WINDOW), "auth": deque(maxlen=LATENCY_WINDOW)}
+_latency_lock = Lock()
+
+
+def record_latency(kind: str, seconds: float):
+    with _latency_lock:
+        _latencies.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def latency_p50_ms(kind: str) -> Optional[float]:
+    with _latency_lock:
+        values = sorted(_latencies.get(kind, ()))
+    return round(values[len(values) // 2] * 1000, 1) if values else None
+
+
+# Multi-worker mode: each worker pushes its counter increments to the shared
+# store (core.shared_state) and the getters above report the sum over workers.
+_flushed = {}
+
+
+def flush_shared_metrics():
+    """Adds the counter increments since the last flush to the shared store."""
+    with _token_lock, _http_lock:
+        current = {"requests": dict(REQUEST_STATS), "tokens": dict(TOKEN_STATS), "http": dict(HTTP_STATS)}
+    store = get_store()
+    for namespace, values in current.items():
+        last = _flushed.get(namespace, {})
+        store.add_counters(namespace, {k: v - last.get(k, 0) for k, v in values.items()})
+        _flushed[namespace] = values
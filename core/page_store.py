@@ -0,0 +1,52 @@
+import gzip
+import threading
+from typing import Tuple
+
+try:
+    import zstandard
+    DEFAULT_CODEC = "zstd"
+except ImportError:
+    zstandard = None
+    DEFAULT_CODEC = "gzip"
+
+# Pages are compressed from render / inference threads and read from asyncio.to_thread;
+# zstandard (de)compressors must not be shared between threads
+_local = threading.local()
+
+
+def _zstd(kind: str):
+    coder = getattr(_local, kind, None)
+    if coder is None:
+        coder = zstandard.ZstdCompressor(level=6) if kind == "compressor" else zstandard.ZstdDecompressor()
+        setattr(_local, kind, coder)
+    return coder
+
+
+def compress_text(text: str, codec: str = DEFAULT_CODEC) -> Tuple[bytes, str]:
+    """
+    Compresses page text for storage in OCRPage.text_z.
+
+    Returns:
+        (blob, codec) — the codec must be stored alongside the blob.
+    """
+    raw = (text or "").encode("utf-8")
+    if codec == "zstd" and zstandard is not None:
+        return _zstd("compressor").compress(raw), "zstd"
+    return gzip.compress(raw, compresslevel=6), "gzip"
+
+
+def decompress_text(blob: bytes, codec: str) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Page stored with zstd but the zstandard package is not installed")
+        return _zstd("decompressor").decompress(blob).decode("utf-8")
+    if codec == "gzip":
+        return gzip.decompress(blob).decode("utf-8")
+    return blob.decode("utf-8")
+
+
+def page_text(row) -> str:
+    """Text of an OCRPage row; rows written before compression keep it in `text`."""
+    if row.text_z is not None:
+        return decompress_text(row.text_z, row.codec)
+    return row.text or ""
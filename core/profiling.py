@@ -0,0 +1,354 @@
+import contextvars
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+from core.shared_state import state_path
+from misc.logger import setup_logger
+
+logger = setup_logger(name="profiling", log_dir="logs")
+
+PROFILES_DIR = state_path("profiles")
+KINDS = ("cprofile", "sampling")
+DEFAULT_INTERVAL = 0.005   # sampling period (seconds)
+MAX_WINDOW = 600           # seconds; an armed session never outlives this
+# Since 3.12 cProfile uses sys.monitoring: one profiler per interpreter, seeing every thread
+_GLOBAL_CPROFILE = sys.version_info >= (3, 12)
+
+
+class ProfileSession:
+    """
+    Profiles the OCR work of the next `requests` /process calls, or of the
+    calls started within `seconds` (both: whichever ends first).
+
+    OCR work runs in threads (asyncio.to_thread, the render pool, the
+    inference pool); the entry points wrap their callables with profiled(),
+    which registers the thread with the session of the request it serves.
+
+    - "cprofile": deterministic profile of those threads, saved as .pstats
+      (from Python 3.12 one profiler sees every thread while the session runs).
+    - "sampling": stacks of those threads every `interval` seconds, saved as
+      a speedscope file (one profile per thread pool); much lower overhead.
+    """
+
+    def __init__(self, kind: str = "sampling", requests: int = 0, seconds: float = 0, interval: float = DEFAULT_INTERVAL):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown profile kind '{kind}' (expected one of {KINDS})")
+        self.id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+        self.kind = kind
+        self.requests = requests if requests or seconds else 1
+        self.seconds = min(seconds or MAX_WINDOW, MAX_WINDOW)
+        self.interval = interval
+        self.started = time.time()
+        self.claimed = self.done = 0
+        self.finished = False
+        self.output: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._threads = Counter()      # ident -> active profiled calls
+        self._thread_names = {}
+        self._profiles = []            # per-thread cProfile.Profile (before 3.12)
+        self._global_profile: Optional[cProfile.Profile] = None
+        self._stacks = Counter()       # (group, stack) -> samples
+        self._sampler: Optional[threading.Thread] = None
+        self._timer = threading.Timer(self.seconds, self.finish)
+        self._timer.daemon = True
+
+    # -------------------------
+    # LIFECYCLE
+    # -------------------------
+    def start(self):
+        self._timer.start()
+        if self.kind == "sampling":
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True, name="profile-sampler")
+            self._sampler.start()
+
+    def claim(self) -> bool:
+        """Takes a /process request into the session (False once it is full or finished)."""
+        with self._lock:
+            if self.finished or (self.requests and self.claimed >= self.requests):
+                return False
+            self.claimed += 1
+            if self.kind == "cprofile" and _GLOBAL_CPROFILE and self._global_profile is None:
+                self._global_profile = cProfile.Profile()
+                self._global_profile.enable()
+            return True
+
+    def request_done(self):
+        with self._lock:
+            self.done += 1
+            complete = self.requests and self.done >= self.requests
+        if complete:
+            # Called from the event loop: writing the profile happens off it
+            threading.Thread(target=self.finish, daemon=True, name="profile-finish").start()
+
+    def finish(self):
+        global _session
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            if self._global_profile is not None:
+                self._global_profile.disable()
+        self._timer.cancel()
+        if self._sampler is not None and self._sampler is not threading.current_thread():
+            self._sampler.join()
+        with _session_lock:
+            if _session is self:
+                _session = None
+        try:
+            self.output = self._write()
+        except Exception as e:
+            logger.error(f"Failed to write profile {self.id}: {e}", exc_info=True)
+        logger.info(f"Profile {self.id} finished ({self.done} requests): {self.output or 'no samples'}")
+
+    # -------------------------
+    # COLLECTION
+    # -------------------------
+    def run(self, fn, *args, **kwargs):
+        ident = threading.get_ident()
+        with self._lock:
+            self._threads[ident] += 1
+            self._thread_names[ident] = threading.current_thread().name
+        profile = None
+        if self.kind == "cprofile" and not _GLOBAL_CPROFILE:
+            profile = cProfile.Profile()
+            profile.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+            with self._lock:
+                if profile is not None:
+                    self._profiles.append(profile)
+                self._threads[ident] -= 1
+                if self._threads[ident] <= 0:
+                    del self._threads[ident]
+
+    def _sample_loop(self):
+        while not self.finished:
+            with self._lock:
+                idents = list(self._threads)
+                names = dict(self._thread_names)
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                # Pool threads are named "<prefix>_<n>": one speedscope profile per pool
+                group = names.get(ident, "thread").rsplit("_", 1)[0]
+                self._stacks[(group, tuple(reversed(stack)))] += 1
+            time.sleep(self.interval)
+
+    # -------------------------
+    # OUTPUT
+    # -------------------------
+    def _write(self) -> Optional[str]:
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        if self.kind == "cprofile":
+            profiles = [self._global_profile] if self._global_profile else self._profiles
+            if not profiles:
+                return None
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            path = os.path.join(PROFILES_DIR, f"{self.id}.pstats")
+            stats.dump_stats(path)
+            return path
+
+        if not self._stacks:
+            return None
+        frames, index, groups = [], {}, {}
+        for (group, stack), count in self._stacks.items():
+            ids = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                ids.append(index[frame])
+            samples, weights = groups.setdefault(group, ([], []))
+            samples.append(ids)
+            weights.append(count * self.interval)
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"xf-ocr {self.id}",
+            "exporter": "core.profiling",
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": group,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": round(sum(weights), 6),
+                    "samples": samples,
+                    "weights": weights,
+                } for group, (samples, weights) in sorted(groups.items())
+            ],
+        }
+        path = os.path.join(PROFILES_DIR, f"{self.id}.speedscope.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f)
+        return path
+
+    def status(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "requests": self.requests,
+            "seconds": self.seconds,
+            "claimed": self.claimed,
+            "done": self.done,
+            "started": datetime.fromtimestamp(self.started).isoformat(),
+            "finished": self.finished,
+            "file": os.path.basename(self.output) if self.output else None,
+            "pid": os.getpid(),
+        }
+
+
+# Armed session of this process; None keeps every hook below a no-op
+_session: Optional[ProfileSession] = None
+_last: Optional[ProfileSession] = None
+_session_lock = threading.Lock()
+_active: contextvars.ContextVar = contextvars.ContextVar("profile_session", default=None)
+
+
+def start_session(**kwargs) -> ProfileSession:
+    global _session, _last
+    with _session_lock:
+        if _session is not None:
+            raise RuntimeError(f"Profile {_session.id} is still running")
+        _session = _last = ProfileSession(**kwargs)
+    _session.start()
+    return _last
+
+
+def stop_session() -> Optional[ProfileSession]:
+    session = _session
+    if session is not None:
+        session.finish()
+    return _last
+
+
+def session_status() -> Optional[dict]:
+    return _last.status() if _last is not None else None
+
+
+@contextmanager
+def profile_scope():
+    """Around one request's OCR work: joins the armed session if it still takes requests."""
+    session = _session
+    if session is None or not session.claim():
+        yield
+        return
+    reset = _active.set(session)
+    try:
+        yield
+    finally:
+        _active.reset(reset)
+        session.request_done()
+
+
+def profiled(fn):
+    """
+    `fn` itself, or a wrapper recording it into the session of the current
+    request. Call it where work is handed to another thread, in the
+    submitting context: executor.submit(copy_context().run, profiled(fn), ...).
+    """
+    session = _active.get()
+    if session is None:
+        return fn
+    return functools.partial(session.run, fn)
+
+
+def list_profiles() -> list:
+    if not os.path.isdir(PROFILES_DIR):
+        return []
+    entries = []
+    for name in sorted(os.listdir(PROFILES_DIR), reverse=True):
+        path = os.path.join(PROFILES_DIR, name)
+        entries.append({"name": name, "bytes": os.path.getsize(path), "modified": datetime.fromtimestamp(os.path.getmtime(path)).isoformat()})
+    return entries
+
+
+def profile_path(name: str) -> Optional[str]:
+    path = os.path.join(PROFILES_DIR, os.path.basename(name))
+    return path if os.path.isfile(path) else None
+
+
+# ==========================
+# THREAD STACKS
+# ==========================
+
+def dump_stacks() -> str:
+    """Current stack of every thread (render-*, inference-*, asyncio event loop and pools)."""
+    frames = sys._current_frames()
+    parts = []
+    for thread in sorted(threading.enumerate(), key=lambda t: t.name):
+        frame = frames.get(thread.ident)
+        if frame is None:
+            continue
+        header = f'Thread "{thread.name}" ident={thread.ident}{" daemon" if thread.daemon else ""}'
+        parts.append(header + "\n" + "".join(traceback.format_stack(frame)))
+    return f"pid {os.getpid()}, {len(parts)} threads\n\n" + "\n".join(parts)
+
+
+# ==========================
+# TRACEMALLOC
+# ==========================
+
+def tracemalloc_start(frames: int = 10) -> dict:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return tracemalloc_status()
+
+
+def tracemalloc_stop() -> dict:
+    tracemalloc.stop()
+    return tracemalloc_status()
+
+
+def tracemalloc_status() -> dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {"tracing": tracing, "frames": tracemalloc.get_traceback_limit(), "current_bytes": current, "peak_bytes": peak}
+
+
+def tracemalloc_top(limit: int = 25, key_type: str = "lineno") -> dict:
+    """Top allocators of memory still held (key_type: lineno, filename or traceback)."""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running")
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    stats = snapshot.statistics(key_type)
+    return {
+        **tracemalloc_status(),
+        "top": [
+            {
+                "where": stat.traceback.format() if key_type == "traceback" else str(stat.traceback[0]),
+                "bytes": stat.size,
+                "count": stat.count,
+            } for stat in stats[:limit]
+        ],
+        "total_bytes": sum(stat.size for stat in stats),
+    }
@@ -0,0 +1,15 @@
+from typing import Any
+
+import orjson
+from starlette.responses import JSONResponse
+
+
+class OrjsonResponse(JSONResponse):
+    """
+    JSONResponse serialized with orjson, for the large OCR payloads returned
+    as dicts (skipping FastAPI's jsonable_encoder pass). Replaces FastAPI's
+    deprecated ORJSONResponse with the same options.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
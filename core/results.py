@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from core.checkpoint import get_saved_pages
+from db.database import SessionLocal, OCRRequest
+
+# Rendered markdown of recently viewed requests
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 64))
+
+# Fields of a saved file that are returned to clients / stored in metadata.json
+SAVED_FILE_FIELDS = ("original_name", "safe_name", "saved_path", "type", "page_count")
+
+
+def render_markdown(model_label: str, pages: list, pdf_count: int, image_count: int, processed_at: str) -> str:
+    """Builds the result.md document from page dicts."""
+    if not pages:
+        ocr_md = "No text extracted."
+    else:
+        sections = []
+        for p in pages:
+            if p["source_type"] == "pdf":
+                header = f"## Page {p['page_no']} (PDF: {p['source_file']} — Page {p['pdf_page_no']})"
+            else:
+                header = f"## Page {p['page_no']} (Image: {p['source_file']})"
+
+            sections.append(f"{header}\n{p['text']}")
+
+        ocr_md = "\n\n".join(sections)
+
+    return f"""# OCR Results
+Processed by **{model_label}**  
+Time: {processed_at}
+
+## Summary
+- PDFs: {pdf_count}
+- Images: {image_count}
+- Total Pages: {len(pages)}
+
+## OCR Output
+{ocr_md}
+"""
+
+
+def build_metadata(db_request: OCRRequest, saved_files: list, total_pages: int, error_pages: list) -> dict:
+    """
+    Compact metadata.json content. Page text is not duplicated here: it lives
+    only in OCRPage (compressed); failed pages, which are not checkpointed,
+    are kept under "errors".
+    """
+    request_dir = os.path.dirname(db_request.metadata_json_path)
+    return {
+        "id": db_request.id,
+        "filename": ", ".join(f["original_name"] for f in saved_files),
+        "timestamp": os.path.basename(request_dir).rsplit("_", 1)[0],
+        "processed_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "model": db_request.model,
+        "total_pages": total_pages,
+        "savedFiles": [{k: f.get(k) for k in SAVED_FILE_FIELDS} for f in saved_files],
+        "errors": error_pages
+    }
+
+
+def write_metadata(path: str, metadata: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def load_metadata(path: Optional[str]) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+class ResultCache:
+    """
+    Small LRU of rendered results keyed by (request_id, status, finalized_at).
+
+    Each worker has its own: invalidate() only reaches this one, so the key
+    changes whenever any worker finalizes the request (e.g. a resume that
+    stays "partial").
+    """
+
+    def __init__(self, size: int = RESULT_CACHE_SIZE):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, request_id: str):
+        with self._lock:
+            for key in [k for k in self._items if k[0] == request_id]:
+                del self._items[key]
+
+
+result_cache = ResultCache()
+
+
+def get_result(db: Session, db_request: OCRRequest, metadata: Optional[dict] = None) -> dict:
+    """
+    Returns {"pages", "markdown"} for a request, rendered on demand from the
+    page store and cached.
+
+    Requests saved before pages were stored compressed still have their
+    markdown in metadata.json / result.md, which is used as is.
+    """
+    key = (db_request.id, db_request.status, db_request.finalized_at)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+
+    metadata = metadata if metadata is not None else load_metadata(db_request.metadata_json_path)
+    pages = sorted(get_saved_pages(db, db_request.id) + metadata.get("errors", []), key=lambda p: p["page_no"])
+
+    if "ocrResult" in metadata:
+        markdown = metadata["ocrResult"]
+    elif db_request.result_md_path and os.path.exists(db_request.result_md_path):
+        with open(db_request.result_md_path, "r", encoding="utf-8") as f:
+            markdown = f.read()
+    elif not pages and db_request.status == "processing":
+        markdown = "No result content available."
+    else:
+        file_types = [f.file_type for f in db_request.files]
+        markdown = render_markdown(
+            db_request.model,
+            pages,
+            pdf_count=file_types.count("pdf"),
+            image_count=file_types.count("image"),
+            processed_at=metadata.get("processed_at") or db_request.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        )
+
+    result = {"pages": pages, "markdown": markdown}
+    if db_request.status != "processing":
+        result_cache.put(key, result)
+    return result
+
+
+def load_result(request_id: str, metadata: Optional[dict] = None) -> dict:
+    """
+    get_result() with its own sync session, for calling from a worker thread
+    (e.g. via asyncio.to_thread) while request handlers use the async session.
+    """
+    db = SessionLocal()
+    try:
+        return get_result(db, db.get(OCRRequest, request_id), metadata)
+    finally:
+        db.close()
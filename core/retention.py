@@ -0,0 +1,261 @@
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+
+from core.shared_state import FileLock, get_store
+from misc.logger import setup_logger
+
+logger = setup_logger(name="retention", log_dir="logs")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOADS_DIR = os.getenv("OCR_UPLOADS_DIR", os.path.join(BASE_DIR, "uploads"))
+
+# Time to live per artifact class (0 = keep forever)
+TTL_SECONDS = {
+    # uploads/images/<user>/<request_id>: rendered pages, not served again once OCRed
+    "page_images": float(os.getenv("RETENTION_PAGE_IMAGES_HOURS", 1)) * 3600,
+    # uploads/<user>/<timestamp>_<request_id>: original files (metadata.json is kept)
+    "uploads": float(os.getenv("RETENTION_UPLOADS_DAYS", 30)) * 86400,
+    # upload / image directories without a request row, e.g. submissions rejected by a limit
+    "orphans": float(os.getenv("RETENTION_ORPHANS_HOURS", 24)) * 3600,
+}
+SWEEP_INTERVAL = float(os.getenv("RETENTION_SWEEP_INTERVAL", 600))
+BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 200))   # deletions per sweep
+_QUERY_CHUNK = 500
+
+
+def user_slug(email: str) -> str:
+    """Directory name of a user under uploads/ (as created by routers.process)."""
+    return email.replace("@", "_").replace(".", "_")
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.stat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _subdirs(path: str):
+    try:
+        with os.scandir(path) as entries:
+            return [e for e in entries if e.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+
+
+class RetentionSweeper:
+    """
+    Deletes expired upload artifacts in the background, by class (TTL_SECONDS):
+    rendered page images, original uploads and orphaned directories.
+
+    Each sweep deletes at most `batch_size` items, so a large backlog is
+    worked off over several sweeps without long IO bursts. Requests a live
+    run is processing are never touched; "processing" requests whose run
+    died (stale heartbeat, core.checkpoint) are swept like any other.
+    Purging originals deletes the files of a
+    request's ProcessedFile rows and marks the rows (purged_at, no
+    saved_path); result pages and metadata.json stay, so history keeps working.
+
+    A sweep also totals the bytes stored per user and class (storage_usage());
+    directory sizes are cached by mtime, so only new or changed directories
+    are walked.
+    With several uvicorn workers only one sweeps at a time (file lock).
+    """
+
+    def __init__(self, uploads_dir: str = UPLOADS_DIR, interval: float = SWEEP_INTERVAL, batch_size: int = BATCH_SIZE):
+        self.uploads_dir = uploads_dir
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_sweep: Optional[dict] = None
+        self._sizes: Dict[str, tuple] = {}   # path -> (mtime, bytes)
+        self._lock = FileLock("retention")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -------------------------
+    # SCAN
+    # -------------------------
+    def _artifacts(self) -> list:
+        """(class, user_slug, request_id, path, mtime) of every request directory."""
+        items = []
+        for user in _subdirs(os.path.join(self.uploads_dir, "images")):
+            for entry in _subdirs(user.path):
+                items.append(("page_images", user.name, entry.name, entry.path, entry.stat().st_mtime))
+        for user in _subdirs(self.uploads_dir):
+            if user.name == "images":
+                continue
+            for entry in _subdirs(user.path):
+                # <timestamp>_<request_id>
+                request_id = entry.name.rsplit("_", 1)[-1]
+                items.append(("uploads", user.name, request_id, entry.path, entry.stat().st_mtime))
+        return items
+
+    def _size(self, path: str, mtime: float) -> int:
+        """Bytes under a request directory; walked again only when the directory's mtime changes."""
+        cached = self._sizes.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = self._sizes[path] = (mtime, _dir_size(path))
+        return cached[1]
+
+    @staticmethod
+    def _load_requests(db, request_ids) -> Dict[str, object]:
+        from db.database import OCRRequest
+
+        request_ids = list(request_ids)
+        found = {}
+        for i in range(0, len(request_ids), _QUERY_CHUNK):
+            chunk = request_ids[i:i + _QUERY_CHUNK]
+            for req in db.query(OCRRequest).filter(OCRRequest.id.in_(chunk)).all():
+                found[req.id] = req
+        return found
+
+    # -------------------------
+    # DELETE
+    # -------------------------
+    def _purge_originals(self, db, req) -> int:
+        """Deletes a request's uploaded files and marks its ProcessedFile rows; returns bytes freed."""
+        from core.results import load_metadata, write_metadata
+
+        freed = 0
+        purged_at = datetime.utcnow()
+        for f in req.files:
+            if f.purged_at is not None:
+                continue
+            if f.file_path:
+                try:
+                    freed += os.path.getsize(f.file_path)
+                    os.remove(f.file_path)
+                except FileNotFoundError:
+                    pass
+            f.saved_path = None
+            f.purged_at = purged_at
+
+        metadata = load_metadata(req.metadata_json_path)
+        if metadata.get("savedFiles"):
+            for saved in metadata["savedFiles"]:
+                saved["saved_path"] = None
+            write_metadata(req.metadata_json_path, metadata)
+        # Files first, rows second: a crash in between leaves rows that the next sweep purges again
+        db.commit()
+        return freed
+
+    def sweep(self) -> dict:
+        from core.checkpoint import is_running
+        from db.database import SessionLocal
+
+        now = time.time()
+        stats = {"page_images": 0, "uploads": 0, "orphans": 0, "freed_bytes": 0, "pending": 0}
+        usage = defaultdict(lambda: {"uploads": 0, "page_images": 0})
+        budget = self.batch_size
+
+        artifacts = self._artifacts()
+        # Directories gone since the last sweep
+        self._sizes = {a[3]: self._sizes[a[3]] for a in artifacts if a[3] in self._sizes}
+        db = SessionLocal()
+        try:
+            requests = self._load_requests(db, {a[2] for a in artifacts})
+            for kind, slug, request_id, path, mtime in artifacts:
+                req = requests.get(request_id)
+                size = self._size(path, mtime)
+
+                if req is None:
+                    cls, age = "orphans", now - mtime
+                elif is_running(req.status, req.heartbeat_at):
+                    usage[slug][kind] += size
+                    continue
+                else:
+                    cls, age = kind, now - mtime
+                    if kind == "uploads" and req.timestamp:
+                        age = (datetime.utcnow() - req.timestamp).total_seconds()
+                    if kind == "uploads" and all(f.purged_at is not None for f in req.files):
+                        usage[slug][kind] += size
+                        continue
+
+                ttl = TTL_SECONDS[cls]
+                if not ttl or age < ttl:
+                    usage[slug][kind] += size
+                    continue
+                if budget <= 0:
+                    stats["pending"] += 1
+                    usage[slug][kind] += size
+                    continue
+
+                try:
+                    if cls == "uploads":
+                        freed = self._purge_originals(db, req)
+                        usage[slug][kind] += max(0, size - freed)
+                    else:
+                        shutil.rmtree(path)
+                        self._sizes.pop(path, None)
+                        freed = size
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Failed to delete {cls} artifact {path}: {e}")
+                    usage[slug][kind] += size
+                    continue
+                budget -= 1
+                stats[cls] += 1
+                stats["freed_bytes"] += freed
+        finally:
+            db.close()
+
+        stats["duration_s"] = round(time.time() - now, 3)
+        stats["ts"] = now
+        get_store().put("storage_usage", dict(usage))
+        get_store().put("retention_last_sweep", stats)
+        if stats["page_images"] or stats["uploads"] or stats["orphans"]:
+            logger.info(
+                f"Retention sweep: {stats['page_images']} page image dirs, {stats['uploads']} uploads, "
+                f"{stats['orphans']} orphans deleted ({stats['freed_bytes'] / 2**20:.1f} MB), {stats['pending']} pending"
+            )
+        self.last_sweep = stats
+        return stats
+
+    # -------------------------
+    # LIFECYCLE
+    # -------------------------
+    def _loop(self):
+        while not self._stop.is_set():
+            if self._lock.acquire(blocking=False):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Retention sweep failed: {e}", exc_info=True)
+                finally:
+                    self._lock.release()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="retention-sweeper")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+retention_sweeper = RetentionSweeper()
+
+
+def storage_usage(email: str) -> dict:
+    """Bytes stored for a user per artifact class, as of the last sweep."""
+    usage = get_store().get("storage_usage", {}).get(user_slug(email), {})
+    return {"uploads": usage.get("uploads", 0), "page_images": usage.get("page_images", 0)}
+
+
+def get_retention_stats() -> dict:
+    return {
+        "ttl_seconds": TTL_SECONDS,
+        "last_sweep": get_store().get("retention_last_sweep"),
+    }
@@ -0,0 +1,230 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: FileLock only serializes threads of one process
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATE_DIR = os.getenv("OCR_STATE_DIR", os.path.join(BASE_DIR, "run"))
+
+
+def _parent_args() -> list:
+    try:
+        with open(f"/proc/{os.getppid()}/cmdline", "rb") as f:
+            return [arg.decode(errors="replace") for arg in f.read().split(b"\0") if arg]
+    except OSError:  # not Linux, or the parent is gone
+        return []
+
+
+def _flag_value(args: list, *flags: str) -> Optional[str]:
+    for i, arg in enumerate(args):
+        for flag in flags:
+            if arg == flag and i + 1 < len(args):
+                return args[i + 1]
+            if arg.startswith(flag + "=") or (len(flag) == 2 and arg.startswith(flag) and len(arg) > 2):
+                return arg[len(flag):].lstrip("=")
+    return None
+
+
+def _detect_workers() -> int:
+    """
+    Number of worker processes serving the app. uvicorn and gunicorn read
+    WEB_CONCURRENCY as the default worker count; without it the server's
+    command line (our parent's) is checked for --workers / -w. A worker of
+    a multi-process server whose count can't be found refuses to start:
+    guessing 1 would give every worker its own metrics, status and leases.
+    """
+    if os.getenv("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    args = _parent_args()
+    names = {os.path.basename(arg) for arg in args[:3]}
+    if args and args[0].startswith("gunicorn:"):  # master retitled by setproctitle
+        names.add("gunicorn")
+    if not names & {"uvicorn", "gunicorn"}:
+        return 1
+    workers = _flag_value(args, "--workers", "-w")
+    if workers is not None:
+        return int(workers)
+    if "uvicorn" in names:
+        # Our parent is uvicorn itself only under --reload (one worker)
+        return 1
+    raise RuntimeError(
+        "Started as a worker of a multi-process server, but the number of workers is unknown; "
+        "set WEB_CONCURRENCY to it"
+    )
+
+
+WORKERS = _detect_workers()
+MULTI_WORKER = WORKERS > 1
+# Workers of one server run share the uvicorn master as parent; counters are scoped to it
+RUN_ID = str(os.getppid() if MULTI_WORKER else os.getpid())
+
+
+def state_path(name: str) -> str:
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, name)
+
+
+class SharedStore:
+    """
+    Small key/value and counter store shared by all uvicorn workers on a host.
+
+    Backed by a local SQLite file in WAL mode, so readers never block the
+    writer and every worker sees the same metrics, model status and health
+    snapshot. Each thread gets its own connection. Counters are scoped to the
+    current server run (RUN_ID); those of earlier runs are dropped on open.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or state_path("shared_state.db")
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, updated REAL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (ns TEXT, key TEXT, value REAL, PRIMARY KEY (ns, key))"
+            )
+            conn.execute("DELETE FROM counters WHERE ns NOT LIKE ?", (f"{RUN_ID}:%",))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, key: str, value):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, updated) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time())
+        )
+
+    def get(self, key: str, default=None):
+        row = self._conn().execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        """Rows of a read outside any transaction: WAL readers neither wait for nor block writers."""
+        return self._conn().execute(sql, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yields this thread's connection inside a write transaction (BEGIN
+        IMMEDIATE), so read-check-update sequences are atomic across workers.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def add_counters(self, namespace: str, deltas: dict):
+        """Adds `deltas` to the namespace's counters in one transaction."""
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO counters (ns, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (ns, key) DO UPDATE SET value = value + excluded.value",
+                [(f"{RUN_ID}:{namespace}", k, v) for k, v in deltas.items()]
+            )
+
+    def counters(self, namespace: str) -> dict:
+        rows = self._conn().execute(
+            "SELECT key, value FROM counters WHERE ns = ?", (f"{RUN_ID}:{namespace}",)
+        ).fetchall()
+        return {k: int(v) if float(v).is_integer() else v for k, v in rows}
+
+
+_store: Optional[SharedStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SharedStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SharedStore()
+    return _store
+
+
+class FileLock:
+    """
+    Cross-process lock on a file in STATE_DIR (flock), e.g. so only one worker
+    launches or restarts a vLLM server at a time.
+
+    Also usable as a long-lived, non-blocking lease: the worker that holds
+    the "supervisor" lock owns background sampling until it exits, at which
+    point the OS releases the lock and another worker can take over.
+    """
+
+    def __init__(self, name: str):
+        self.path = state_path(f"{name}.lock")
+        self._fd = None
+        self._thread_lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        if not self._thread_lock.acquire(blocking, -1 if timeout is None else timeout):
+            return False
+        if fcntl is None:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not blocking or (deadline is not None and time.monotonic() >= deadline):
+                    os.close(fd)
+                    self._thread_lock.release()
+                    return False
+                time.sleep(0.1)
+
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    @property
+    def held(self) -> bool:
+        return self._thread_lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+@contextmanager
+def file_lock(name: str, timeout: Optional[float] = None):
+    lock = FileLock(name)
+    if not lock.acquire(timeout=timeout):
+        raise TimeoutError(f"Timed out waiting for lock '{name}'")
+    try:
+        yield lock
+    finally:
+        lock.release()
@@ -0,0 +1,93 @@
+import os
+from mimetypes import guess_type
+from urllib.parse import quote
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from core.compression import parse_accept_encoding
+
+# Fingerprinted build output (Next.js _next/): the URL changes whenever the content does
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Variants written by tools/precompress.py next to the original, in order of preference
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+# Hand large files to the reverse proxy instead of streaming them from a worker:
+# "X-Accel-Redirect" (nginx, with STATIC_OFFLOAD_PREFIX = an internal location) or
+# "X-Sendfile" (Apache / lighttpd, absolute path). Empty serves everything from the app.
+OFFLOAD_HEADER = os.getenv("STATIC_OFFLOAD_HEADER", "")
+OFFLOAD_PREFIX = os.getenv("STATIC_OFFLOAD_PREFIX", "")
+OFFLOAD_MIN_BYTES = int(os.getenv("STATIC_OFFLOAD_MIN_BYTES", 1024 * 1024))
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with cache headers, precompressed variants and proxy offload.
+
+    - Every response carries `cache_control` (e.g. IMMUTABLE_CACHE for
+      fingerprinted assets); ETag / Last-Modified revalidation and Range
+      requests (big PDFs) are handled by Starlette's FileResponse.
+    - With `precompressed`, a `.br` / `.gz` file next to the requested one is
+      served as is when the client accepts it, so the compression middleware
+      never recompresses static assets. Range requests get the identity file.
+    - With `offload`, files of at least OFFLOAD_MIN_BYTES are answered with an
+      OFFLOAD_HEADER redirect and sent by the reverse proxy, so long
+      downloads don't hold an app worker.
+    """
+
+    def __init__(self, *, cache_control: str = "no-cache", precompressed: bool = False, offload: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_control = cache_control
+        self.precompressed = precompressed
+        self.offload = offload and bool(OFFLOAD_HEADER)
+
+    def _variant(self, full_path: str, request_headers: Headers):
+        accepted = parse_accept_encoding(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in PRECOMPRESSED:
+            if accepted.get(encoding, accepted.get("*", 0.0)) <= 0:
+                continue
+            try:
+                return encoding, f"{full_path}{suffix}", os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+        return None
+
+    def _offload_response(self, full_path: str, stat_result: os.stat_result) -> Response:
+        if OFFLOAD_PREFIX:
+            rel = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+            target = f"{OFFLOAD_PREFIX.rstrip('/')}/{quote(rel)}"
+        else:
+            target = os.path.abspath(full_path)
+        return Response(headers={
+            OFFLOAD_HEADER: target,
+            "Content-Type": guess_type(str(full_path))[0] or "application/octet-stream",
+            "Cache-Control": self.cache_control,
+        })
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+
+        if self.offload and status_code == 200 and stat_result.st_size >= OFFLOAD_MIN_BYTES:
+            return self._offload_response(full_path, stat_result)
+
+        variant = None
+        if self.precompressed and "range" not in request_headers:
+            variant = self._variant(str(full_path), request_headers)
+
+        if variant is not None:
+            encoding, path, variant_stat = variant
+            response = FileResponse(
+                path, status_code=status_code, stat_result=variant_stat,
+                media_type=guess_type(str(full_path))[0] or "text/plain",
+            )
+            response.headers["Content-Encoding"] = encoding
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        response.headers["Cache-Control"] = self.cache_control
+        if self.precompressed:
+            response.headers.add_vary_header("Accept-Encoding")
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
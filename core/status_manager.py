@@ -1,6 +1,12 @@
 from threading import Lock
+from core.shared_state import MULTI_WORKER, get_store
 
 class StatusManager:
+    """
+    Model loading status. With several uvicorn workers (WEB_CONCURRENCY > 1)
+    the status is published to the shared store so every worker reports the
+    same state, whichever one handled /load-model.
+    """
     _instance = None
     _lock = Lock()
     
@@ -31,7 +37,17 @@ class StatusManager:
             if not is_loading and model_id and "error" not in (message or "").lower():
                 self.current_model = model_id
 
+            if MULTI_WORKER:
+                get_store().put("model_status", {
+                    "loading": self.loading_status,
+                    "active_model": self.current_model
+                })
+
     def get_status(self):
+        if MULTI_WORKER:
+            status = get_store().get("model_status")
+            if status is not None:
+                return status
         with self._lock:
             return {
                 "loading": self.loading_status.copy(),
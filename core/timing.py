@@ -0,0 +1,161 @@
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") != "0"
+# Requests slower than this are appended to the trace file (0 = off)
+SLOW_REQUEST_MS = float(os.getenv("TIMING_SLOW_MS", 0))
+TRACE_PATH = os.getenv("TIMING_TRACE_PATH", os.path.join(BASE_DIR, "logs", "slow_requests.jsonl"))
+_trace_lock = threading.Lock()
+
+
+class RequestTimer:
+    """
+    Span totals of one HTTP request, per stage and per page.
+
+    Spans are recorded from the event loop and from render / inference
+    threads (asyncio.to_thread and copy_context().run carry the current
+    timer), so stages that run in parallel can add up to more than the
+    wall time; `count` and `max_ms` tell them apart.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.pages = {}
+        self.attrs = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, page: Optional[str] = None):
+        with self._lock:
+            stage = self.stages.setdefault(name, [0.0, 0, 0.0])
+            stage[0] += seconds
+            stage[1] += 1
+            stage[2] = max(stage[2], seconds)
+            if page is not None:
+                per_page = self.pages.setdefault(page, {})
+                per_page[name] = per_page.get(name, 0.0) + seconds
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def summary(self, pages: bool = True) -> dict:
+        with self._lock:
+            result = {
+                "total_ms": round(self.elapsed_ms(), 1),
+                "stages": {
+                    name: {"ms": round(total * 1000, 1), "count": count, "max_ms": round(peak * 1000, 1)}
+                    for name, (total, count, peak) in self.stages.items()
+                },
+            }
+            if pages:
+                result["pages"] = {
+                    page: {name: round(s * 1000, 1) for name, s in stages.items()}
+                    for page, stages in sorted(self.pages.items())
+                }
+        return result
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: one metric per stage plus the total so far."""
+        with self._lock:
+            parts = [
+                f'{name};dur={total * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+                for name, (total, count, _) in self.stages.items()
+            ]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("request_timer", default=None)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _current.get()
+
+
+def annotate(**attrs):
+    """Attaches fields (e.g. request_id) to the current request's trace."""
+    timer = _current.get()
+    if timer is not None:
+        timer.attrs.update(attrs)
+
+
+class span:
+    """
+    Times a block into the current request's timer; a no-op outside a request.
+
+        with span("render", page=stem):
+            ...
+    """
+    __slots__ = ("name", "page", "timer", "start")
+
+    def __init__(self, name: str, page: Optional[str] = None):
+        self.name = name
+        self.page = page
+        self.timer = _current.get()
+
+    def __enter__(self):
+        if self.timer is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.timer is not None:
+            self.timer.add(self.name, time.perf_counter() - self.start, self.page)
+
+
+def _write_trace(record: dict):
+    os.makedirs(os.path.dirname(TRACE_PATH), exist_ok=True)
+    with _trace_lock, open(TRACE_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class TimingMiddleware:
+    """
+    Gives every HTTP request a RequestTimer, adds its Server-Timing header
+    to the response and, when TIMING_SLOW_MS is set, appends requests slower
+    than that (with per-stage and per-page timings) to TIMING_TRACE_PATH.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (SERVER_TIMING or SLOW_REQUEST_MS):
+            await self.app(scope, receive, send)
+            return
+
+        timer = RequestTimer()
+        status = {"code": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if SERVER_TIMING:
+                    MutableHeaders(scope=message).append("Server-Timing", timer.server_timing())
+            await send(message)
+
+        reset = _current.set(timer)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(reset)
+            if SLOW_REQUEST_MS and timer.elapsed_ms() >= SLOW_REQUEST_MS:
+                record = {
+                    "ts": datetime.now().isoformat(),
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "status": status["code"],
+                    **timer.attrs,
+                    **timer.summary(),
+                }
+                await asyncio.to_thread(_write_trace, record)
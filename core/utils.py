@@ -1,8 +1,7 @@
 import os
-import fitz
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from db.database import OCRRequest
 from datetime import date
 
@@ -11,6 +10,7 @@ load_dotenv()
 DAILY_PAGE_LIMIT = int(os.getenv("DAILY_PAGE_LIMIT", 40))
 
 def get_pdf_page_count(file_path: str) -> int:
+    import fitz  # PyMuPDF: imported on first use to keep API start-up fast
     try:
         doc = fitz.open(file_path)
         count = len(doc)
@@ -20,12 +20,16 @@ def get_pdf_page_count(file_path: str) -> int:
         print(f"Error counting PDF pages: {e}")
         return 0
 
-def check_usage_limit(email: str, additional_pages: int, db: Session):
+async def get_daily_usage(email: str, db: AsyncSession) -> int:
     today = date.today()
-    current_usage = db.query(func.sum(OCRRequest.total_pages)).filter(
+    current_usage = await db.scalar(select(func.sum(OCRRequest.total_pages)).filter(
         OCRRequest.user_email == email,
         func.date(OCRRequest.timestamp) == today
-    ).scalar() or 0
+    ))
+    return current_usage or 0
+
+async def check_usage_limit(email: str, additional_pages: int, db: AsyncSession):
+    current_usage = await get_daily_usage(email, db)
     
     if current_usage + additional_pages > DAILY_PAGE_LIMIT:
         remaining = DAILY_PAGE_LIMIT - current_usage
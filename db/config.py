@@ -1,7 +1,8 @@
 import os
 from dotenv import load_dotenv
 
-load_dotenv(override=True)
+# DOTENV_OVERRIDE=0 keeps variables already set (e.g. by tools/loadtest.py) over .env
+load_dotenv(override=os.getenv("DOTENV_OVERRIDE", "1") != "0")
 
 class Config:
     DB_USER = os.getenv("DB_USER", "postgres")
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, JSON, Date
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, JSON, Date, LargeBinary, Index, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -25,6 +25,10 @@ class OCRRequest(Base):
     total_pages = Column(Integer)
     result_md_path = Column(String)
     metadata_json_path = Column(String)
+    status = Column(String, default="completed") # processing | partial | cancelled | completed
+    idempotency_key = Column(String, unique=True, index=True, nullable=True) # core.idempotency, scoped to the user
+    heartbeat_at = Column(DateTime, nullable=True) # last beat of the run processing it (core.checkpoint)
+    finalized_at = Column(DateTime, nullable=True) # last finalize (each resume ends with one); keys core.results.ResultCache
     
     user = relationship("User", back_populates="requests")
     files = relationship("ProcessedFile", back_populates="request")
@@ -40,6 +44,7 @@ class ProcessedFile(Base):
     saved_path = Column(String)
     file_type = Column(String)
     page_count = Column(Integer)
+    purged_at = Column(DateTime, nullable=True) # original deleted by core.retention
     
     request = relationship("OCRRequest", back_populates="files")
     pages = relationship("OCRPage", back_populates="file")
@@ -53,17 +58,60 @@ class OCRPage(Base):
     source_type = Column(String)
     source_file = Column(String)
     pdf_page_no = Column(Integer, nullable=True)
-    text = Column(Text)
+    text = Column(Text) # legacy rows only, new rows use text_z
+    text_z = Column(LargeBinary, nullable=True) # compressed page text (core.page_store)
+    codec = Column(String, nullable=True)
     
     request = relationship("OCRRequest", back_populates="pages")
     file = relationship("ProcessedFile", back_populates="pages")
 
+    # One checkpoint per page: a resume racing the original run can't duplicate pages
+    __table_args__ = (Index("ix_ocr_pages_request_page", "request_id", "page_no", unique=True),)
+
 from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 engine = create_engine(config.DATABASE_URL, poolclass=NullPool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_url(url: str) -> str:
+    """Maps a sync DATABASE_URL to its asyncio driver (asyncpg for Postgres, aiosqlite for SQLite)."""
+    scheme, sep, rest = url.partition("://")
+    base = scheme.split("+")[0]
+    driver = {"postgresql": "asyncpg", "postgres": "asyncpg", "sqlite": "aiosqlite"}.get(base)
+    if not driver:
+        return url
+    return f"{'postgresql' if base == 'postgres' else base}+{driver}{sep}{rest}"
+
+# Async engine for request handlers, so queries and commits don't block the event loop.
+# The sync engine above stays for worker threads (page checkpoints, history rendering).
+async_engine = create_async_engine(_async_url(config.DATABASE_URL), poolclass=NullPool)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def _add_missing_columns():
+    """create_all() doesn't alter existing tables, so add columns introduced after the first deploy."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            if table.name == "ocr_pages" and "ix_ocr_pages_request_page" not in {i["name"] for i in inspector.get_indexes(table.name)}:
+                # Pages checkpointed twice before the unique index existed: keep the first copy
+                conn.execute(text(
+                    "DELETE FROM ocr_pages WHERE id NOT IN "
+                    "(SELECT MIN(id) FROM ocr_pages GROUP BY request_id, page_no)"
+                ))
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+            # Indexes of added columns (e.g. the unique idempotency key)
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
 
 def get_db():
     db = SessionLocal()
@@ -71,3 +119,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
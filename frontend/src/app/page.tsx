@@ -30,6 +30,7 @@ interface HistoryItem {
 }
 
 const API_BASE = process.env.NEXT_PUBLIC_API_BASE || "http://localhost:8000";
+const HISTORY_PAGE_SIZE = 20;
 // const API_BASE = "https://unmonarchical-stalked-lea.ngrok-free.dev";
 const BASE_PATH = process.env.NEXT_PUBLIC_BASE_PATH || (process.env.NODE_ENV === 'production' ? '/XF-ocr.github.io' : '');
 
@@ -132,6 +133,7 @@ export default function Dashboard() {
   const [isProcessing, setIsProcessing] = useState(false);
   const [ocrResult, setOcrResult] = useState<any>(null);
   const [history, setHistory] = useState<HistoryItem[]>([]);
+  const [historyTotal, setHistoryTotal] = useState(0);
   const [selectedHistory, setSelectedHistory] = useState<HistoryItem | null>(null);
   const [toast, setToast] = useState<string | null>(null);
   const [backendOnline, setBackendOnline] = useState<boolean | null>(null);
@@ -195,10 +197,11 @@ export default function Dashboard() {
     }
   };
 
-  const fetchHistory = async () => {
+  // /history is paged (newest first); `offset` > 0 appends the next page ("Load more")
+  const fetchHistory = async (offset = 0) => {
     if (!currentUser) return;
     try {
-      const res = await fetch(`${API_BASE}/history`, {
+      const res = await fetch(`${API_BASE}/history?limit=${HISTORY_PAGE_SIZE}&offset=${offset}`, {
         headers: {
           'Authorization': `Bearer ${currentUser.token}`,
           'ngrok-skip-browser-warning': 'true'
@@ -209,8 +212,9 @@ export default function Dashboard() {
         return;
       }
       if (res.ok) {
-        const data = await res.json();
-        setHistory(data);
+        const data: HistoryItem[] = await res.json();
+        setHistory(prev => offset ? [...prev, ...data] : data);
+        setHistoryTotal(Number(res.headers.get('X-Total-Count') ?? offset + data.length));
       }
     } catch (err) {
       console.error("Failed to fetch history", err);
@@ -359,16 +363,25 @@ export default function Dashboard() {
     formData.append('model', currentModel);
 
     try {
-      const response = await fetch(`${API_BASE}/process`, {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${currentUser.token}`,
-          'ngrok-skip-browser-warning': 'true'
-        },
-        body: formData
-      });
-
-      const data = await response.json();
+      let response: Response;
+      let data: any;
+      let attempts = 0;
+      do {
+        response = await fetch(`${API_BASE}/process`, {
+          method: 'POST',
+          headers: {
+            'Authorization': `Bearer ${currentUser.token}`,
+            'ngrok-skip-browser-warning': 'true'
+          },
+          body: formData
+        });
+        data = await response.json();
+        // 202: an identical upload is still being processed. Sending it again waits
+        // for that run and returns its result once done.
+        if (response.status === 202) {
+          showToast("An identical upload is still processing, waiting for it...");
+        }
+      } while (response.status === 202 && ++attempts < 6);
 
       if (response.status === 200) {
         setOcrResult(data);
@@ -393,6 +406,7 @@ export default function Dashboard() {
     localStorage.removeItem('user');
     setCurrentUser(null);
     setHistory([]);
+    setHistoryTotal(0);
     setQuota(null);
     setOcrResult(null);
     setSelectedHistory(null);
@@ -487,6 +501,11 @@ export default function Dashboard() {
                   </div>
                 ))
               )}
+              {history.length < historyTotal && (
+                <button className="history-load-more" onClick={() => fetchHistory(history.length)}>
+                  Load more ({historyTotal - history.length})
+                </button>
+              )}
             </div>
           </div>
 
@@ -627,7 +646,10 @@ export default function Dashboard() {
                   <button className="close-split-btn" onClick={() => setSelectedHistory(null)}>Back to Dashboard</button>
                 </div>
                 <div className="pane-content">
-                  {selectedHistory.savedFiles[0]?.type === 'pdf' ? (
+                  {selectedHistory.savedFiles.length > 0 && selectedHistory.savedFiles.every((f: any) => !f.saved_path) ? (
+                    // Originals purged by retention (saved_path cleared); the extraction is kept
+                    <p className="empty-state">Original deleted by retention</p>
+                  ) : selectedHistory.savedFiles[0]?.type === 'pdf' ? (
                     <SecureFilePreview
                       className="file-preview-frame"
                       src={`${API_BASE}${selectedHistory.savedFiles[0].saved_path}`}
@@ -635,7 +657,7 @@ export default function Dashboard() {
                     />
                   ) : (
                     <div className="image-preview-list">
-                      {selectedHistory.savedFiles.map((f: any, idx: number) => (
+                      {selectedHistory.savedFiles.filter((f: any) => f.saved_path).map((f: any, idx: number) => (
                         <SecureFilePreview
                           key={idx}
                           className="image-preview-item"
@@ -1,20 +1,30 @@
 import os
+import sys
+import time
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from db.database import init_db
-from core.metrics import REQUEST_STATS
-from routers import process, history, usage, health
+from core.metrics import REQUEST_STATS, record_latency
+from core.compression import CompressionMiddleware
+from core.static import CachedStaticFiles, IMMUTABLE_CACHE
+from core.timing import TimingMiddleware
+from core.shared_state import WORKERS, file_lock
+from routers import process, history, usage, health, admin
 
 # Static file setup
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")
+UPLOADS_DIR = os.getenv("OCR_UPLOADS_DIR", os.path.join(BASE_DIR, "uploads"))
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 
 app = FastAPI(title="XFINITE-OCR Professional Backend")
 
-app.mount("/uploads", StaticFiles(directory=UPLOADS_DIR), name="uploads")
+# Upload paths are unique per request and never rewritten; large originals can be sent by the proxy
+app.mount(
+    "/uploads",
+    CachedStaticFiles(directory=UPLOADS_DIR, cache_control="private, max-age=86400", offload=True),
+    name="uploads"
+)
 
 # Enable CORS
 app.add_middleware(
@@ -34,12 +44,22 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Negotiated zstd/br/gzip compression for large JSON responses
+app.add_middleware(CompressionMiddleware)
+
+# Per-request spans → Server-Timing header (and the slow request trace, TIMING_SLOW_MS)
+app.add_middleware(TimingMiddleware)
+
 # Middleware for stats tracking
 @app.middleware("http")
 async def track_stats(request: Request, call_next):
     REQUEST_STATS["total"] += 1
+    start = time.perf_counter()
     try:
         response = await call_next(request)
+        if not request.url.path.startswith("/process"):
+            # OCR calls take seconds to minutes and would drown out API latency
+            record_latency("api", time.perf_counter() - start)
         if response.status_code < 400:
             REQUEST_STATS["success"] += 1
         else:
@@ -53,25 +73,78 @@ async def track_stats(request: Request, call_next):
 @app.on_event("startup")
 def startup_db():
     try:
-        init_db()
+        # Workers start together; serialize schema creation/migration
+        with file_lock("init_db", timeout=60):
+            init_db()
         print("Database initialized successfully.")
     except Exception as e:
         print(f"CRITICAL: Database initialization failed: {e}")
         raise e
 
+@app.on_event("startup")
+def startup_health_sampler():
+    from core.health_sampler import health_sampler
+    health_sampler.start()
+
+@app.on_event("startup")
+def startup_retention_sweeper():
+    from core.retention import retention_sweeper
+    retention_sweeper.start()
+
+@app.on_event("startup")
+def startup_model_warmup():
+    # Loads the most demanded model(s) in the background and keeps them warm (model.warmup)
+    from model.warmup import model_warmup
+    model_warmup.start()
+
+@app.on_event("startup")
+def preload_ocr_stack():
+    # The OCR stack (PyMuPDF, PIL, openai) is imported lazily so the API answers
+    # /health right away; load it in the background so the first /process doesn't pay for it
+    if os.getenv("PRELOAD_OCR_IMPORTS", "1") != "0":
+        import importlib
+        import threading
+        threading.Thread(
+            target=importlib.import_module, args=("misc.ocr_model",), daemon=True, name="preload-imports"
+        ).start()
+
+@app.on_event("shutdown")
+def shutdown_background_tasks():
+    from core.health_sampler import health_sampler
+    from core.http_client import close_http_client
+    from model.ocr_cpu import shutdown_cpu_pool
+    from core.retention import retention_sweeper
+    from model.warmup import model_warmup
+    health_sampler.stop()
+    retention_sweeper.stop()
+    model_warmup.stop()
+    close_http_client()
+    # Only if OCR ran: importing misc.ocr_model here would load the whole OCR stack
+    ocr_model = sys.modules.get("misc.ocr_model")
+    if ocr_model is not None:
+        ocr_model.close_processors()
+    shutdown_cpu_pool()
+
 # Include Routers
 app.include_router(process.router)
 app.include_router(history.router)
 app.include_router(usage.router)
 app.include_router(health.router)
+app.include_router(admin.router)
 
 # Static frontend serving
 docs_path = os.path.join(BASE_DIR, "docs")
 SUBPATH = "/XF-ocr.github.io"
 
 if os.path.exists(docs_path):
-    app.mount(f"{SUBPATH}/_next", StaticFiles(directory=os.path.join(docs_path, "_next")), name="next-static")
-    app.mount(SUBPATH, StaticFiles(directory=docs_path, html=True), name="static")
+    # Precompressed variants come from tools/precompress.py (run after each frontend export)
+    app.mount(
+        f"{SUBPATH}/_next",
+        CachedStaticFiles(directory=os.path.join(docs_path, "_next"), cache_control=IMMUTABLE_CACHE, precompressed=True),
+        name="next-static"
+    )
+    # Pages keep their URLs across deploys: always revalidate (cheap 304s via ETag)
+    app.mount(SUBPATH, CachedStaticFiles(directory=docs_path, html=True, precompressed=True), name="static")
     
     @app.get("/")
     async def root_redirect():
@@ -79,4 +152,5 @@ if os.path.exists(docs_path):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # WEB_CONCURRENCY=N runs N worker processes sharing state via core.shared_state
+    uvicorn.run("main:app" if WORKERS > 1 else app, host="0.0.0.0", port=8000, workers=WORKERS)
@@ -1,2 +1,9 @@
 from .logger import setup_logger
-from .ocr_model import ocr_pdf, ocr_image
\ No newline at end of file
+
+
+def __getattr__(name):
+    # The OCR entry points pull in PyMuPDF, PIL and the openai SDK; import them on first use
+    if name in ("ocr_pdf", "ocr_image"):
+        from . import ocr_model
+        return getattr(ocr_model, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
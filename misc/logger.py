@@ -1,46 +1,215 @@
+import atexit
+import contextvars
+import json
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Optional
 
+# LOG_ASYNC=0 writes from the calling thread, as before (handy when debugging a crash)
+LOG_ASYNC = os.getenv("LOG_ASYNC", "1") != "0"
+# "json" (one object per line, with request/page ids) or "text" for the log files
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Request / page ids attached to every record logged in this context (see log_context)
+_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    Adds fields (e.g. request_id, page) to every record logged inside the block,
+    including from threads started via asyncio.to_thread or submitted with
+    contextvars.copy_context().run.
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the current log_context onto the record, in the logging thread."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        fields = _context.get()
+        if fields:
+            record.context = fields
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per call site (file:line) for records below WARNING: at most
+    `rate` records per second, with bursts of `burst`. The number of dropped
+    records is appended to the next one let through.
+    """
+
+    def __init__(self, rate: float, burst: int = 5):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, dropped = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, dropped + 1)
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+
+        if dropped:
+            record.suppressed = dropped
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "src": f"{record.filename}:{record.lineno}",
+            "thread": record.threadName,
+        }
+        entry.update(getattr(record, "context", {}))
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        context = getattr(record, "context", None)
+        if context:
+            line += " | " + " ".join(f"{k}={v}" for k, v in context.items())
+        if getattr(record, "suppressed", 0):
+            line += f" (+{record.suppressed} suppressed)"
+        return line
+
+
+class _RecordQueueHandler(QueueHandler):
+    """
+    Enqueues the record as is, only resolving the message and traceback text,
+    so formatting (incl. JSON) happens on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _DispatchHandler(logging.Handler):
+    """Listener-side handler: console plus the file handlers of the record's logger."""
+
+    def __init__(self):
+        super().__init__()
+        self.console: Optional[logging.Handler] = None
+        self.files = {}
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        if self.console and record.levelno >= self.console.level:
+            self.console.handle(record)
+        for handler in self.files.get(record.name, ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_dispatch = _DispatchHandler()
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = QueueListener(_queue, _dispatch)
+            _listener.start()
+            atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
 def setup_logger(
     name: str = "app",
     log_dir: str = "logs",
     level: int = logging.INFO,
     max_bytes: int = 10 * 1024 * 1024,  # 10 MB per file
-    backup_count: int = 5
+    backup_count: int = 5,
+    rate_limit: Optional[float] = None
 ) -> logging.Logger:
     """
     Sets up a production-grade logger with console and file handlers.
-    
+
     Features:
     - distinct log files for general logs and separate error logs.
     - RotatingFileHandler to manage disk usage.
     - Console output for real-time monitoring.
-    
+    - Non-blocking: records are queued and written by a single listener
+      thread shared by all loggers (LOG_ASYNC=0 disables this).
+    - JSON lines in the log files (LOG_FORMAT=text for the classic format),
+      carrying the fields set with log_context (request_id, page, ...).
+
     Args:
         name: Name of the logger.
         log_dir: Directory to store log files.
         level: Logging level (default: logging.INFO).
         max_bytes: Max size of a log file before rotation.
         backup_count: Number of backup log files to keep.
-        
+        rate_limit: Max INFO/DEBUG records per second per call site, for
+            loggers on per-page hot paths. Warnings and errors are never dropped.
+
     Returns:
         Configured logging.Logger instance.
     """
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # Prevent adding handlers multiple times if function is called repeatedly
     if logger.hasHandlers():
         return logger
 
-    # Formatter
-    formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    # Formatters
+    console_formatter = TextFormatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+    file_formatter = JsonFormatter() if LOG_FORMAT == "json" else console_formatter
 
     # Ensure log directory exists
     try:
@@ -49,28 +218,43 @@ def setup_logger(
         print(f"CRITICAL: Failed to create log directory {log_dir}: {e}", file=sys.stderr)
         return logger
 
-    # 1. Console Handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(level)
-    logger.addHandler(console_handler)
+    # 1. Console Handler (one, shared by all loggers in async mode)
+    if LOG_ASYNC and _dispatch.console is not None:
+        console_handler = _dispatch.console
+    else:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(console_formatter)
+        console_handler.setLevel(level)
 
     # 2. General File Handler (Rotating)
     app_log_path = os.path.join(log_dir, f"{name}.log")
     file_handler = RotatingFileHandler(
         app_log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
     )
-    file_handler.setFormatter(formatter)
+    file_handler.setFormatter(file_formatter)
     file_handler.setLevel(level)
-    logger.addHandler(file_handler)
 
     # 3. Error File Handler (Separate errors for easier debugging)
     error_log_path = os.path.join(log_dir, f"{name}_error.log")
     error_handler = RotatingFileHandler(
         error_log_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
     )
-    error_handler.setFormatter(formatter)
+    error_handler.setFormatter(file_formatter)
     error_handler.setLevel(logging.ERROR)
-    logger.addHandler(error_handler)
 
-    return logger
\ No newline at end of file
+    if rate_limit:
+        logger.addFilter(RateLimitFilter(rate_limit))
+
+    if LOG_ASYNC:
+        _dispatch.console = console_handler
+        _dispatch.files[name] = (file_handler, error_handler)
+        queue_handler = _RecordQueueHandler(_queue)
+        queue_handler.addFilter(ContextFilter())
+        logger.addHandler(queue_handler)
+        _ensure_listener()
+    else:
+        for handler in (console_handler, file_handler, error_handler):
+            handler.addFilter(ContextFilter())
+            logger.addHandler(handler)
+
+    return logger
@@ -1,5 +1,6 @@
-from preprocess import pdf_processor
-from model.ocr_gpu import OCRGPU
+from preprocess.pdf_processor import pdf_processor, page_index_from_path
+from core.utils import get_pdf_page_count
+from model.profiles import get_profile
 from misc.logger import setup_logger
 
 logger = setup_logger(name="ocr-model", log_dir="logs")
@@ -10,26 +11,73 @@ import threading
 _processors = {}
 _processor_lock = threading.Lock()
 
+def _engine_class(model_name):
+    """OCR engine for a model id, per its profile (see model.engine.OCREngine)."""
+    if get_profile(model_name).engine == "cpu":
+        from model.ocr_cpu import OCRCPU
+        return OCRCPU
+    from model.ocr_gpu import OCRGPU
+    return OCRGPU
+
 def get_processor(model_name):
     with _processor_lock:
         if model_name not in _processors:
-            logger.info(f"Loading processor for {model_name}...")
-            _processors[model_name] = OCRGPU(model_name)
+            engine = _engine_class(model_name)
+            logger.info(f"Loading {engine.__name__} processor for {model_name}...")
+            _processors[model_name] = engine(model_name)
         else:
             logger.info(f"Using cached processor for {model_name}")
     return _processors[model_name]
 
-def ocr_pdf(pdf_path, output_dir, model):
+def close_processors():
+    """Closes every cached processor (worker processes, connections); they are created again on use."""
+    with _processor_lock:
+        processors = list(_processors.values())
+        _processors.clear()
+    for processor in processors:
+        try:
+            processor.close()
+        except Exception as e:
+            logger.warning(f"Failed to close {type(processor).__name__}: {e}")
+
+def ocr_pdf(pdf_path, output_dir, model, skip_pages=None, on_page=None):
+    """
+    OCRs a PDF page by page.
+
+    Args:
+        skip_pages: 0-indexed pages already done (e.g. when resuming a job).
+        on_page: Called with each page result ({"page_index", "text", ...}) as
+            soon as it completes, so it can be checkpointed.
+    """
     logger.info(f"Processing PDF: {pdf_path}")
-    list_of_images = pdf_processor(pdf_path, output_dir, workers=4, dpi=300)
+    profile = get_profile(model)
+    page_nums = None
+    if skip_pages:
+        skip = set(skip_pages)
+        page_nums = [p for p in range(get_pdf_page_count(pdf_path)) if p not in skip]
+        logger.info(f"Resuming: {len(skip)} pages already done, {len(page_nums)} left")
+
+    list_of_images = pdf_processor(
+        pdf_path,
+        output_dir,
+        workers=profile.render_workers,
+        dpi=profile.dpi,
+        max_dim=profile.max_dim,
+        min_dim=profile.min_dim,
+        image_format=profile.image_format,
+        image_quality=profile.image_quality,
+        page_nums=page_nums,
+    ) or []
     logger.info(f"Processing {len(list_of_images)} images")
 
+    def _on_result(img_path, res):
+        # Page index comes from the rendered filename, so skipped pages keep their numbers
+        res['page_index'] = page_index_from_path(img_path)
+        if on_page:
+            on_page(res)
+
     processor = get_processor(model)
-    results = processor.run_batch(list_of_images)
-    
-    # Map 'page_no' from OCRGPU to 'page_index' for the backend
-    for res in results:
-        res['page_index'] = res.get('page_no', 1) - 1
+    results = processor.run_batch(list_of_images, on_result=_on_result)
         
     logger.info(f"Completed processing {len(list_of_images)} images")
     return results
@@ -1 +1,6 @@
-from .ocr_gpu import OCRGPU
\ No newline at end of file
+def __getattr__(name):
+    # OCRGPU pulls in PIL and the openai SDK; import it on first use
+    if name == "OCRGPU":
+        from .ocr_gpu import OCRGPU
+        return OCRGPU
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
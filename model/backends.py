@@ -0,0 +1,212 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from core.cancellation import RequestCancelled
+from core.http_client import get_http_client
+from misc.logger import setup_logger
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = setup_logger(name="ocr-backends", log_dir="logs")
+
+# ==========================
+# TUNABLES
+# ==========================
+
+MAX_CONSECUTIVE_FAILURES = 3   # Eject a backend after this many failed calls in a row
+HEALTH_INTERVAL = 10.0         # Seconds between health checks
+LATENCY_WINDOW = 200           # Recent call latencies kept per backend
+
+
+class Backend:
+    """One OpenAI-compatible inference endpoint (e.g. a vLLM server)."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.last_error: Optional[str] = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._client: Optional["OpenAI"] = None
+
+    @property
+    def client(self) -> "OpenAI":
+        if self._client is None:
+            # Imported on first use: /health pulls in this module, not the openai SDK
+            from openai import OpenAI
+            # Shares the pooled keep-alive transport (and its timeouts) with every backend
+            self._client = OpenAI(api_key="EMPTY", base_url=self.url, http_client=get_http_client())
+        return self._client
+
+    def stats(self) -> dict:
+        lat = sorted(self.latencies)
+
+        def _pct(q):
+            return round(lat[min(len(lat) - 1, int(q * len(lat)))] * 1000, 1) if lat else None
+
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "latency_p50_ms": _pct(0.5),
+            "latency_p95_ms": _pct(0.95),
+            "last_error": self.last_error,
+        }
+
+
+class BackendPool:
+    """
+    Routes inference calls for one model over several endpoints.
+
+    - Least-outstanding-requests routing (ties go to the lower p50 latency).
+    - A backend is ejected after MAX_CONSECUTIVE_FAILURES failed calls and
+      re-admitted once its /models endpoint answers again.
+    """
+
+    def __init__(self, model_name: str, urls: List[str], health_interval: float = HEALTH_INTERVAL):
+        if not urls:
+            raise ValueError(f"No inference backends configured for {model_name}")
+        self.model_name = model_name
+        self.backends = [Backend(u) for u in urls]
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    # -------------------------
+    # ROUTING
+    # -------------------------
+    def _pick(self, exclude=()) -> Backend:
+        with self._lock:
+            candidates = [b for b in self.backends if b.healthy and b not in exclude]
+            if not candidates:
+                # Everything is ejected: keep trying rather than failing the request outright
+                candidates = [b for b in self.backends if b not in exclude] or self.backends
+
+            def _key(b):
+                p50 = sorted(b.latencies)[len(b.latencies) // 2] if b.latencies else 0.0
+                return (b.outstanding, p50)
+
+            backend = min(candidates, key=_key)
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def _release(self, backend: Backend, started: float, error: Optional[Exception]):
+        with self._lock:
+            backend.outstanding -= 1
+            if isinstance(error, RequestCancelled):
+                # Aborted by us, not the backend's fault; and not a full-length call
+                return
+            if error is None:
+                backend.latencies.append(time.perf_counter() - started)
+                backend.consecutive_failures = 0
+                return
+
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            backend.last_error = str(error)[:200]
+            if backend.healthy and backend.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                backend.healthy = False
+                backend.ejections += 1
+                logger.warning(f"Ejected backend {backend.url} after {backend.consecutive_failures} failures: {error}")
+
+    @contextmanager
+    def acquire(self, exclude=()):
+        """Yields the least-loaded backend and records the call's outcome and latency."""
+        backend = self._pick(exclude)
+        started = time.perf_counter()
+        error = None
+        try:
+            yield backend
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release(backend, started, error)
+
+    # -------------------------
+    # HEALTH CHECKS
+    # -------------------------
+    def check_backend(self, backend: Backend) -> bool:
+        try:
+            r = get_http_client().get(f"{backend.url}/models", timeout=2)
+            if r.status_code != 200:
+                return False
+            served = [m.get("id") for m in r.json().get("data", [])]
+            return not served or self.model_name in served
+        except Exception:
+            return False
+
+    def check_all(self):
+        for backend in self.backends:
+            ok = self.check_backend(backend)
+            with self._lock:
+                if ok and not backend.healthy:
+                    logger.info(f"Re-admitted backend {backend.url}")
+                    backend.consecutive_failures = 0
+                elif not ok and backend.healthy:
+                    backend.ejections += 1
+                    logger.warning(f"Backend {backend.url} failed health check, ejecting")
+                backend.healthy = ok
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_all()
+
+    def start_health_checks(self):
+        if self._health_thread and self._health_thread.is_alive():
+            return
+        self._stop.clear()
+        self._health_thread = threading.Thread(target=self._health_loop, daemon=True, name=f"health-{self.model_name}")
+        self._health_thread.start()
+
+    def stop_health_checks(self):
+        self._stop.set()
+
+    def expected_latency(self) -> Optional[float]:
+        """Best p50 call latency (seconds) among healthy backends, None until measured."""
+        with self._lock:
+            p50s = [
+                sorted(b.latencies)[len(b.latencies) // 2]
+                for b in self.backends if b.healthy and b.latencies
+            ]
+        return min(p50s) if p50s else None
+
+    def stats(self) -> list:
+        with self._lock:
+            return [b.stats() for b in self.backends]
+
+
+# One pool per served model, shared by every processor in the process
+_pools: Dict[str, BackendPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(model_name: str, urls: List[str]) -> BackendPool:
+    with _pools_lock:
+        pool = _pools.get(model_name)
+        if pool is None or [b.url for b in pool.backends] != [u.rstrip("/") for u in urls]:
+            if pool:
+                pool.stop_health_checks()
+            pool = BackendPool(model_name, urls)
+            pool.start_health_checks()
+            _pools[model_name] = pool
+        return pool
+
+
+def get_backend_stats() -> dict:
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.stats() for name, pool in pools.items()}
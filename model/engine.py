@@ -0,0 +1,39 @@
+import abc
+from typing import Callable, Optional
+
+from model.profiles import get_profile
+
+DEFAULT_PROMPT = "OCR the text in the image and output as markdown."
+
+
+class OCREngine(abc.ABC):
+    """
+    Interface of the OCR engines behind misc.ocr_model.get_processor.
+
+    The engine for a model id is chosen by its profile (`engine` field):
+    "gpu" is model.ocr_gpu.OCRGPU (VLMs served by vLLM), "cpu" is
+    model.ocr_cpu.OCRCPU (Tesseract in a process pool). Each engine manages
+    its own capacity, so CPU requests never queue behind GPU inference.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_id = model_name
+        self.profile = get_profile(model_name)
+
+    @abc.abstractmethod
+    def run_batch(
+        self,
+        image_paths: list,
+        prompt: str = DEFAULT_PROMPT,
+        on_result: Optional[Callable[[str, dict], None]] = None,
+    ) -> list:
+        """
+        OCRs page images.
+
+        Returns a list of {"page_no", "text"} dicts in the order of image_paths.
+        `on_result(image_path, result)` is called as each page completes so
+        callers can checkpoint progress before the whole batch is done.
+        """
+
+    def close(self):
+        """Releases engine resources (worker processes, connections)."""
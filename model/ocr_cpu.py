@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Callable, Optional
+
+from core.cancellation import current_token
+from misc.logger import setup_logger
+from model.engine import OCREngine, DEFAULT_PROMPT
+
+logger = setup_logger(name="ocr-cpu", log_dir="logs")
+
+TESSERACT_LANG = os.getenv("TESSERACT_LANG", "eng")
+TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", "--oem 1 --psm 3")
+# Worker processes for CPU OCR; defaults to the profile's concurrency
+CPU_OCR_WORKERS = int(os.getenv("CPU_OCR_WORKERS", 0))
+
+# Capacity of the shared CPU pool (reported by /health)
+CPU_ENGINE_STATS = {"workers": 0, "in_flight": 0, "pages": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker():
+    # One page per process: keep Tesseract's OpenMP threads from oversubscribing the cores
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _ocr_page(img_path: str, max_dim: int, min_dim: int, lang: str, config: str) -> str:
+    """Runs in a pool process: preprocess one page and OCR it with Tesseract."""
+    import pytesseract
+    from preprocess.image_processor import ImageProcessor
+
+    img = ImageProcessor.process_image(img_path, max_dim=max_dim, min_dim=min_dim)
+    if img is None:
+        raise ValueError(f"Could not load image {img_path}")
+    return pytesseract.image_to_string(img.convert("L"), lang=lang, config=config).strip()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """One process pool per API process, shared by every CPU model id."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a threaded server process is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            with _stats_lock:
+                CPU_ENGINE_STATS["workers"] = workers
+            logger.info(f"Started CPU OCR pool with {workers} processes")
+    return _executor
+
+
+def get_cpu_engine_stats() -> dict:
+    with _stats_lock:
+        return dict(CPU_ENGINE_STATS)
+
+
+def shutdown_cpu_pool():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+class OCRCPU(OCREngine):
+    """
+    CPU OCR engine (Tesseract) for cheap requests such as xf1-mini.
+
+    Pages are recognized in a pool of worker processes, one page per core at
+    a time, so it scales across cores without touching the GPU servers.
+    Output is plain text (Tesseract has no layout-to-markdown step).
+    """
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        # Imported here, not at module level: /health imports this module and pytesseract pulls in PIL
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError("CPU OCR needs the pytesseract package (pip install pytesseract)")
+        if shutil.which(getattr(pytesseract.pytesseract, "tesseract_cmd", "tesseract")) is None:
+            raise RuntimeError("CPU OCR needs the tesseract binary on PATH (e.g. apt install tesseract-ocr)")
+
+        self.model_name = f"tesseract ({TESSERACT_LANG})"
+        self.workers = CPU_OCR_WORKERS or max(1, self.profile.concurrency)
+        _get_executor(self.workers)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        # Looked up on use: after close() the shared pool is started again by the next batch
+        return _get_executor(self.workers)
+
+    def close(self):
+        """Shuts down the worker processes; the pool is shared by every CPU model id."""
+        shutdown_cpu_pool()
+
+    @staticmethod
+    def _page_done(future):
+        failed = not future.cancelled() and future.exception() is not None
+        with _stats_lock:
+            CPU_ENGINE_STATS["in_flight"] -= 1
+            CPU_ENGINE_STATS["pages"] += int(not failed and not future.cancelled())
+            CPU_ENGINE_STATS["errors"] += int(failed)
+
+    def run_batch(
+        self,
+        image_paths: list,
+        prompt: str = DEFAULT_PROMPT,
+        on_result: Optional[Callable[[str, dict], None]] = None,
+    ) -> list:
+        """
+        OCRs every page in the process pool. The prompt is ignored: Tesseract
+        only transcribes.
+        """
+        logger.info(f"Processing batch of {len(image_paths)} images with {self.model_name} ({self.workers} processes)")
+
+        executor = self.executor
+        futures = {}
+        for i, path in enumerate(image_paths):
+            future = executor.submit(
+                _ocr_page, path, self.profile.max_dim, self.profile.min_dim, TESSERACT_LANG, TESSERACT_CONFIG
+            )
+            with _stats_lock:
+                CPU_ENGINE_STATS["in_flight"] += 1
+            future.add_done_callback(self._page_done)
+            futures[future] = i
+
+        token = current_token()
+        results = [None] * len(image_paths)
+        try:
+            # Cancelling the request drops its queued pages from the pool
+            with (token.on_cancel(lambda: [f.cancel() for f in futures]) if token else nullcontext()):
+                for future in as_completed(futures):
+                    i = futures[future]
+                    if future.cancelled() and token is not None:
+                        token.raise_if_cancelled()
+                    try:
+                        text = future.result()
+                    except Exception as e:
+                        logger.error(f"CPU OCR failed for {image_paths[i]}: {e}")
+                        raise
+                    results[i] = {"page_no": i + 1, "text": text}
+                    if on_result:
+                        on_result(image_paths[i], results[i])
+        except Exception:
+            # Free the pool for other requests
+            for future in futures:
+                future.cancel()
+            raise
+
+        return results
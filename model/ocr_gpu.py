@@ -7,46 +7,67 @@ import hashlib
 import signal
 import sys
 import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from io import BytesIO
 from pathlib import Path
+from typing import Callable, Optional
 from PIL import Image
-from openai import OpenAI
-from misc.logger import setup_logger
-import torch
+from openai import APIConnectionError, APITimeoutError
+from misc.logger import setup_logger, log_context
+from core.cancellation import RequestCancelled, check_cancelled, current_token
+from core.timing import span
+from core.profiling import profiled
+from model.backends import get_pool
+from model.engine import OCREngine, DEFAULT_PROMPT
+from model.token_budget import TokenBudgeter, RepetitionDetector, estimate_ink_density
+from preprocess.image_processor import ImageProcessor
+from preprocess.layout_crop import LayoutCropper
 
-logger = setup_logger(name="ocr-worker", log_dir="logs")
+logger = setup_logger(name="ocr-worker", log_dir="logs", rate_limit=2.0)
 
-class OCRGPU:
+DEFAULT_MODEL = "PaddlePaddle/PaddleOCR-VL"
+
+MODEL_MAP = {
+    "xf3-pro": "tencent/HunyuanOCR",
+    "xf3": "PaddlePaddle/PaddleOCR-VL",
+    "xf3-large": "deepseek-ai/DeepSeek-OCR",
+}
+
+class OCRGPU(OCREngine):
     def __init__(
         self,
         model_name: str,
         out_dir: str = "outputs",
-        batch_size: int = 1,
+        batch_size: Optional[int] = None,
     ):
-        
+        super().__init__(model_name)
         self.out_dir = out_dir
-        self.batch_size = batch_size
+        self.batch_size = batch_size or self.profile.batch_size
+        self.concurrency = max(1, self.profile.concurrency)
         self.temperature = 0.0
-        self.max_tokens = 16384
+        # Upper bound only; each page gets its own budget from self.budgeter
+        self.max_tokens = self.profile.max_tokens
+        self.budgeter = TokenBudgeter(cap=self.max_tokens, floor=self.profile.min_tokens)
+        # Optional CPU stage: crop pages to their text regions to cut vision tokens
+        self.cropper = LayoutCropper(self.profile.layout_crop) if self.profile.layout_crop else None
 
         os.makedirs(self.out_dir, exist_ok=True)
 
         # start_vllm.py would be needed here, assuming 'start' is imported
-        from model.start_vllm import start
-        model_map = {
-                    "xf3-pro": "tencent/HunyuanOCR",
-                    "xf3": "PaddlePaddle/PaddleOCR-VL",
-                    "xf3-large": "deepseek-ai/DeepSeek-OCR",
-                }
-
-        self.model_name = model_map.get(model_name, "PaddlePaddle/PaddleOCR-VL")
-        start(self.model_name)
-
-        self.client = OpenAI(
-            api_key="EMPTY",
-            base_url="http://localhost:8001/v1",
-            timeout=3600,
-        )
+        from model.start_vllm import start, VLLM_HOST, VLLM_PORT
+
+        if model_name not in MODEL_MAP:
+            logger.warning(f"No GPU model mapped to '{model_name}', using {DEFAULT_MODEL}")
+        self.model_name = MODEL_MAP.get(model_name, DEFAULT_MODEL)
+
+        backend_urls = list(self.profile.backends)
+        if not backend_urls:
+            # No remote nodes configured: serve from the local vLLM instance
+            start(self.model_name)
+            backend_urls = [f"http://{VLLM_HOST}:{VLLM_PORT}/v1"]
+        self.pool = get_pool(self.model_name, backend_urls)
 
         self.PaddleOCR_TASKS = {
             "ocr": {"ocr", "text", "extract", "read", "markdown"},
@@ -71,12 +92,23 @@ class OCRGPU:
         best = max(scores, key=scores.get)
         return best if scores[best] > 0 else "ocr"
 
+    def load_page(self, path: str) -> Image.Image:
+        # Rendered PDF pages are already sized; this mainly bounds raw image uploads
+        return ImageProcessor.process_image(
+            path, max_dim=self.profile.max_dim, min_dim=self.profile.min_dim
+        )
+
+    def encode_image(self, img: Image.Image) -> str:
+        buf = BytesIO()
+        if self.profile.image_format == "PNG":
+            img.save(buf, format="PNG")
+        else:
+            img.save(buf, format=self.profile.image_format, quality=self.profile.image_quality)
+        return base64.b64encode(buf.getvalue()).decode()
+
     def img_to_b64(self, path: str) -> str:
         try:
-            img = Image.open(path).convert("RGB")
-            buf = BytesIO()
-            img.save(buf, format="PNG")
-            return base64.b64encode(buf.getvalue()).decode()
+            return self.encode_image(self.load_page(path))
         except Exception as e:
             logger.error(f"Failed to load image {path}: {e}")
             raise
@@ -84,70 +116,210 @@ class OCRGPU:
     # -------------------------
     # UNIFIED PROCESSOR
     # -------------------------
-    def run_batch(self, image_paths: list, prompt: str = "OCR the text in the image and output as markdown."):
+    def _build_messages(self, img_path: str, prompt: str):
+        """Returns (messages, ink_density) for a single page."""
+        key = Path(img_path).stem
+        try:
+            with span("load", page=key):
+                img = self.load_page(img_path)
+            # Measured on the full page, so the learned tokens-per-ink ratio doesn't depend on cropping
+            ink = estimate_ink_density(img)
+            if self.cropper:
+                with span("crop", page=key):
+                    img = self.cropper.crop(img)
+            with span("encode", page=key):
+                img_b64 = self.encode_image(img)
+        except Exception as e:
+            logger.error(f"Failed to load image {img_path}: {e}")
+            raise
+
+        messages = [{
+            "role": "user",
+            "content": [
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{self.profile.mime_type};base64,{img_b64}"
+                    },
+                },
+                {"type": "text", "text": prompt},
+            ],
+        }]
+        return messages, ink
+
+    def _infer(self, messages: list, max_tokens: int):
+        """
+        Runs one page on the least-loaded backend, retrying once on another
+        backend if the connection fails.
+
+        Returns:
+            (text, completion_tokens or None, early_stopped)
+        """
+        token = current_token()
+        if token is not None:
+            token.raise_if_cancelled()
+            # Shed the page if it can't finish before the request's deadline anyway. Cancelling the
+            # token (not just this page) ends the request as "cancelled", so it can be resumed.
+            remaining, expected = token.remaining(), self.pool.expected_latency()
+            if remaining is not None and expected is not None and remaining < expected:
+                token.cancel(f"deadline: {remaining:.1f}s left, pages take ~{expected:.1f}s")
+                token.raise_if_cancelled()
+
+        tried = []
+        attempts = min(2, len(self.pool.backends))
+        for attempt in range(attempts):
+            try:
+                with self.pool.acquire(exclude=tried) as backend:
+                    tried.append(backend)
+                    return self._infer_on(backend.client, messages, max_tokens)
+            except (APIConnectionError, APITimeoutError) as e:
+                if attempt + 1 >= attempts:
+                    raise
+                logger.warning(f"Backend {tried[-1].url} failed ({e}), retrying on another backend")
+
+    def _infer_on(self, client, messages: list, max_tokens: int):
+        token = current_token()
+        remaining = token.remaining() if token else None
+        if remaining is not None:
+            # Don't keep the backend busy past the request's deadline
+            client = client.with_options(timeout=max(remaining, 1.0))
+        try:
+            return self._complete(client, messages, max_tokens, token)
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            # Errors caused by aborting the call (closed stream, deadline timeout) aren't backend failures
+            if token is not None and token.cancelled:
+                raise RequestCancelled(token.reason) from e
+            raise
+
+    def _complete(self, client, messages: list, max_tokens: int, token=None):
+        extra_body = {}
+        if self.model_name == "deepseek-ai/DeepSeek-OCR":
+            extra_body = {
+                "skip_special_tokens": False,
+                "vllm_xargs": {
+                    "ngram_size": 30,
+                    "window_size": 90,
+                    "whitelist_token_ids": [128821, 128822],
+                },
+            }
+
+        if not self.profile.early_stop:
+            response = client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                extra_body=extra_body,
+            )
+            used = response.usage.completion_tokens if response.usage else None
+            return response.choices[0].message.content, used, False
+
+        # Stream so runaway repetition can be cut off before the budget is spent
+        stream = client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=max_tokens,
+            extra_body=extra_body,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        detector = RepetitionDetector()
+        text, chunks, used = "", 0, None
+        early_stopped = False
+        try:
+            # Closing the stream aborts the request on the server (vLLM frees the sequence),
+            # also while it is still queued and no chunk has arrived yet
+            with (token.on_cancel(stream.close) if token else nullcontext()):
+                for chunk in stream:
+                    if token is not None:
+                        token.raise_if_cancelled()
+                    if chunk.usage:
+                        used = chunk.usage.completion_tokens
+                    if not chunk.choices or not chunk.choices[0].delta.content:
+                        continue
+                    text += chunk.choices[0].delta.content
+                    chunks += 1
+                    if detector.feed(text):
+                        early_stopped = True
+                        break
+        finally:
+            stream.close()
+
+        if early_stopped:
+            text = detector.trim(text)
+            logger.warning(f"Stopped repeating output after ~{chunks} tokens (budget={max_tokens})")
+        return text, used if used is not None else chunks, early_stopped
+
+    def _process_page(self, img_path: str, prompt: str) -> str:
+        with log_context(page=Path(img_path).stem):
+            check_cancelled()
+            messages, ink = self._build_messages(img_path, prompt)
+            budget = self.budgeter.estimate(ink)
+            # Includes waiting for a free backend slot and the vLLM queue
+            with span("infer", page=Path(img_path).stem):
+                text, used, early_stopped = self._infer(messages, budget)
+            if self.budgeter.record(ink, used, budget, early_stopped) and budget < self.budgeter.cap:
+                # The estimate cut the page's text off: redo it once with the full budget
+                logger.warning(f"Output truncated at {budget} tokens, retrying with {self.budgeter.cap}")
+                with span("infer", page=Path(img_path).stem):
+                    text, used, early_stopped = self._infer(messages, self.budgeter.cap)
+                self.budgeter.record(ink, used, self.budgeter.cap, early_stopped)
+            return text
+
+    def run_batch(
+        self,
+        image_paths: list,
+        prompt: str = DEFAULT_PROMPT,
+        on_result: Optional[Callable[[str, dict], None]] = None,
+    ):
         """
         Unified entry point for both models. 
-        Returns a list of extracted text strings corresponding to image_paths.
+        Returns a list of {"page_no", "text"} dicts in the order of image_paths.
+
+        `on_result(image_path, result)` is called as each page completes so
+        callers can checkpoint progress before the whole batch is done.
+
+        Pages are sent as one request each; `batch_size` pages are encoded and
+        in flight at a time, `concurrency` of them in parallel (see model.profiles).
         """
-        logger.info(f"Processing batch of {len(image_paths)} images with {self.model_name}")
+        logger.info(
+            f"Processing batch of {len(image_paths)} images with {self.model_name} "
+            f"(batch_size={self.batch_size}, concurrency={self.concurrency})"
+        )
         
         if self.model_name == "PaddlePaddle/PaddleOCR-VL":
             prompt = self.assign_task_from_prompt(prompt)
             logger.info(f"Assigned PaddleOCR task: {prompt}")
 
+        def _process(img_path):
+            return self._process_page(img_path, prompt)
+
         results = []
         page_no = 1
-        for i in range(0, len(image_paths), self.batch_size):
-            batch = image_paths[i:i + self.batch_size]
-            
-            messages = []
-            for img_path in batch:
-                img_b64 = self.img_to_b64(img_path)
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{img_b64}"
-                            },
-                        },
-                        {"type": "text", "text": prompt},
-                    ],
-                })
-
-            # Call vLLM
-            try:
-                extra_body = {}
-                if self.model_name == "deepseek-ai/DeepSeek-OCR":
-                    self.max_tokens = 4096
-                    extra_body = {
-                        "skip_special_tokens": False,
-                        "vllm_xargs": {
-                            "ngram_size": 30,
-                            "window_size": 90,
-                            "whitelist_token_ids": [128821, 128822],
-                        },
-                    }
-
-
-                response = self.client.chat.completions.create(
-                    model=self.model_name,
-                    messages=messages,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    extra_body=extra_body,
-                )
-                
-                # Extract results
-                for choice in response.choices:
-                    text = choice.message.content
-                    results.append({"page_no":page_no, "text":text })
-                    page_no += 1
-
-            except Exception as e:
-                logger.error(f"Inference error: {e}")
-                raise
+        workers = min(self.concurrency, self.batch_size)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference") as executor:
+            for i in range(0, len(image_paths), self.batch_size):
+                batch = image_paths[i:i + self.batch_size]
+
+                # Call vLLM
+                try:
+                    # Each page runs in a copy of the caller's context (log request id, cancel token)
+                    futures = [executor.submit(contextvars.copy_context().run, profiled(_process), p) for p in batch]
+                    for img_path, text in zip(batch, (f.result() for f in futures)):
+                        result = {"page_no": page_no, "text": text}
+                        results.append(result)
+                        if on_result:
+                            on_result(img_path, result)
+                        page_no += 1
+
+                except RequestCancelled:
+                    raise
+                except Exception as e:
+                    logger.error(f"Inference error: {e}")
+                    raise
 
         return results
 
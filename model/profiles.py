@@ -0,0 +1,211 @@
+import os
+import threading
+from dataclasses import dataclass, fields, replace
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+from misc.logger import setup_logger
+
+logger = setup_logger(name="model-profiles", log_dir="logs")
+
+# ==========================
+# PROFILE LOCATION
+# ==========================
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILES_PATH = os.getenv("OCR_PROFILES_PATH", os.path.join(BASE_DIR, "profiles.yaml"))
+
+DEFAULT_PROFILE_KEY = "default"
+
+ENGINES = ("gpu", "cpu")
+LAYOUT_DETECTORS = ("ink", "surya")
+CPU_COUNT = os.cpu_count() or 2
+
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """
+    Render / preprocess / inference settings for a single model id.
+
+    Attributes:
+        dpi: PDF render resolution.
+        max_dim: Longest side (px) of the image sent to the model.
+        min_dim: Shortest allowed longest side (px), small images are upscaled.
+        image_format: Encoding used for rendered pages and request payloads (PNG/JPEG/WEBP).
+        image_quality: Quality for lossy formats.
+        batch_size: Pages encoded and kept in flight per inference wave.
+        render_workers: Threads used to render a PDF.
+        concurrency: Parallel inference requests per batch.
+        max_tokens: Upper bound on generated tokens per page.
+        min_tokens: Lower bound of the per-page budget estimated from ink density.
+        early_stop: Stream responses and stop on repeating output.
+        backends: OpenAI-compatible base URLs serving this model. Empty means
+            the local vLLM server managed by model.start_vllm.
+        engine: "gpu" (VLM via vLLM, model.ocr_gpu) or "cpu" (Tesseract in a
+            process pool, model.ocr_cpu; concurrency is the number of processes).
+        layout_crop: Text region detector used to crop pages before encoding
+            ("ink", "surya"; empty disables it). See preprocess.layout_crop.
+    """
+    dpi: int = 300
+    max_dim: int = 1024
+    min_dim: int = 256
+    image_format: str = "PNG"
+    image_quality: int = 90
+    batch_size: int = 1
+    render_workers: int = 4
+    concurrency: int = 1
+    max_tokens: int = 16384
+    min_tokens: int = 512
+    early_stop: bool = True
+    backends: Tuple[str, ...] = ()
+    engine: str = "gpu"
+    layout_crop: str = ""
+
+    @property
+    def image_ext(self) -> str:
+        return {"JPEG": "jpg", "WEBP": "webp"}.get(self.image_format, "png")
+
+    @property
+    def mime_type(self) -> str:
+        subtype = {"JPEG": "jpeg", "WEBP": "webp"}.get(self.image_format, "png")
+        return f"image/{subtype}"
+
+
+# Built-in profiles, keyed by the model ids in model.ocr_gpu.MODEL_MAP (and CPU models).
+# Pages are downscaled to max_dim anyway, so DPI is only as high as needed
+# to keep a letter/A4 page above max_dim after rendering.
+BUILTIN_PROFILES: Dict[str, ModelProfile] = {
+    DEFAULT_PROFILE_KEY: ModelProfile(),
+    # Tesseract on CPU: full-resolution pages (it reads small text poorly when
+    # downscaled), small ones upscaled, one page per core
+    "xf1-mini": ModelProfile(
+        engine="cpu", dpi=300, max_dim=3600, min_dim=1200,
+        batch_size=CPU_COUNT * 2, render_workers=4, concurrency=CPU_COUNT,
+    ),
+    # PaddlePaddle/PaddleOCR-VL (0.9B, dynamic resolution)
+    "xf3": ModelProfile(
+        dpi=200, max_dim=1280, batch_size=8, concurrency=4, max_tokens=8192,
+    ),
+    # tencent/HunyuanOCR (served with --enforce-eager, fewer parallel requests)
+    "xf3-pro": ModelProfile(
+        dpi=200, max_dim=1536, batch_size=4, concurrency=2, max_tokens=8192,
+    ),
+    # deepseek-ai/DeepSeek-OCR (1024x1024 base mode)
+    "xf3-large": ModelProfile(
+        dpi=150, max_dim=1024, image_format="JPEG", image_quality=92,
+        batch_size=8, concurrency=4, max_tokens=4096,
+    ),
+}
+
+_FIELD_NAMES = {f.name for f in fields(ModelProfile)}
+
+_profiles: Optional[Dict[str, ModelProfile]] = None
+_profiles_lock = threading.Lock()
+
+
+def _normalize(overrides: dict, source: str) -> dict:
+    clean = {}
+    if overrides is not None and not isinstance(overrides, dict):
+        logger.warning(f"Ignoring profile entry in {source}: expected a mapping of fields, got {type(overrides).__name__}")
+        return clean
+    for key, value in (overrides or {}).items():
+        if key not in _FIELD_NAMES:
+            logger.warning(f"Ignoring unknown profile field '{key}' in {source}")
+            continue
+        if key == "image_format":
+            value = str(value).upper().replace("JPG", "JPEG")
+        elif key == "backends":
+            value = tuple(value or ())
+        elif key == "layout_crop" and value and value not in LAYOUT_DETECTORS:
+            logger.warning(f"Ignoring unknown layout_crop detector '{value}' in {source}")
+            continue
+        elif key == "engine" and value not in ENGINES:
+            logger.warning(f"Ignoring unknown engine '{value}' in {source}")
+            continue
+        clean[key] = value
+    return clean
+
+
+def load_profiles(path: Optional[str] = None) -> Dict[str, ModelProfile]:
+    """
+    Builds the profile registry from the built-in defaults and an optional YAML file.
+
+    The YAML maps model ids to partial profiles. A `default` entry is applied
+    to every profile before the per-model overrides:
+
+        default:
+          render_workers: 8
+        xf3:
+          dpi: 220
+          max_tokens: 6144
+
+    Args:
+        path: YAML file to load (defaults to OCR_PROFILES_PATH).
+
+    Returns:
+        Dict of model id -> ModelProfile.
+    """
+    path = path or PROFILES_PATH
+    profiles = dict(BUILTIN_PROFILES)
+
+    if not os.path.exists(path):
+        return profiles
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            # An empty file loads as None
+            data = yaml.safe_load(f) or {}
+        if not isinstance(data, dict):
+            raise ValueError(f"expected a mapping of model ids to profiles, got {type(data).__name__}")
+    except Exception as e:
+        logger.error(f"Failed to load profiles from {path}: {e}", exc_info=True)
+        return profiles
+
+    base = _normalize(data.get(DEFAULT_PROFILE_KEY), path)
+    for key in set(profiles) | set(data):
+        merged = {**base, **_normalize(data.get(key), path)}
+        profiles[key] = replace(profiles.get(key, profiles[DEFAULT_PROFILE_KEY]), **merged)
+
+    logger.info(f"Loaded model profiles from {path}: {sorted(profiles)}")
+    return profiles
+
+
+def get_profile(model_id: str) -> ModelProfile:
+    """Returns the profile for a model id, falling back to the default profile."""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = load_profiles()
+        return _profiles.get(model_id, _profiles[DEFAULT_PROFILE_KEY])
+
+
+def reload_profiles(path: Optional[str] = None) -> Dict[str, ModelProfile]:
+    """Re-reads the YAML file, e.g. after tuning a profile on a live server."""
+    global _profiles
+    with _profiles_lock:
+        _profiles = load_profiles(path)
+        return dict(_profiles)
+
+
+def all_profiles() -> Dict[str, ModelProfile]:
+    """Returns every registered profile (built-in and YAML)."""
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = load_profiles()
+        return dict(_profiles)
+
+
+def override_profile(model_id: str, **overrides) -> ModelProfile:
+    """
+    Replaces fields of one profile in the live registry, e.g. backends given
+    on a command line. Processors created afterwards use the new values.
+    """
+    global _profiles
+    with _profiles_lock:
+        if _profiles is None:
+            _profiles = load_profiles()
+        base = _profiles.get(model_id, _profiles[DEFAULT_PROFILE_KEY])
+        _profiles[model_id] = replace(base, **_normalize(overrides, "override"))
+        return _profiles[model_id]
@@ -4,7 +4,6 @@ import signal
 import sys
 import os
 import time
-import httpx
 
 # ---------------- PATH SETUP ----------------
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -12,9 +11,14 @@ if parent_dir not in sys.path:
     sys.path.insert(0, parent_dir)
 
 from misc.logger import setup_logger
+from core.http_client import get_http_client
+from core.shared_state import file_lock, state_path
 
 # ---------------- CONFIG ----------------
-PID_FILE = "vllm_server.pid"
+# Shared by all uvicorn workers, so any of them can find and stop the server
+PID_FILE = state_path("vllm_server.pid")
+# Upper bound on waiting for another worker's launch/restart to finish
+START_LOCK_TIMEOUT = 600
 VLLM_PORT = 8001
 VLLM_HOST = "127.0.0.1"
 
@@ -25,7 +29,7 @@ def get_current_vllm_model():
     """Check which model is currently served by vLLM"""
     url = f"http://{VLLM_HOST}:{VLLM_PORT}/v1/models"
     try:
-        r = httpx.get(url, timeout=2)
+        r = get_http_client().get(url, timeout=2)
         if r.status_code == 200:
             data = r.json()
             # vLLM returns a list of models
@@ -73,7 +77,7 @@ def wait_for_vllm(timeout: int = 120):
 
     while time.time() - start < timeout:
         try:
-            r = httpx.get(url, timeout=2)
+            r = get_http_client().get(url, timeout=2)
             if r.status_code == 200:
                 logger.info("✅ vLLM is ready to accept requests")
                 return
@@ -125,6 +129,13 @@ def build_command(model_name: str):
 
 # ---------------- START SERVER ----------------
 def start(model_name: str):
+    # Only one process may stop/launch vLLM at a time; workers that wait here
+    # find the model already served and skip the restart. This serializes
+    # launches but nothing owns the server: any worker may switch its model.
+    with file_lock("vllm", timeout=START_LOCK_TIMEOUT):
+        return _start(model_name)
+
+def _start(model_name: str):
     should_start = stop_existing_server(model_name)
     
     if not should_start:
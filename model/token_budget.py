@@ -0,0 +1,131 @@
+import threading
+from typing import Optional
+
+from PIL import Image
+
+from core.metrics import record_tokens
+
+# ==========================
+# TUNABLES
+# ==========================
+
+INK_THRESHOLD = 160         # Grayscale value below which a pixel counts as ink
+INK_SAMPLE_DIM = 512        # Ink density is measured on a thumbnail
+MIN_INK = 0.005             # Floor of the ink density when learning the ratio (near-blank pages)
+PRIOR_TOKENS_PER_INK = 20000  # ~3k tokens for a dense page (ink ≈ 0.15)
+HEADROOM = 2.0              # Budget = expected tokens * HEADROOM
+EMA_ALPHA = 0.2             # Weight of the newest observation
+
+
+def estimate_ink_density(img: Image.Image) -> float:
+    """
+    Fraction of dark pixels on the page, measured on a small grayscale thumbnail.
+
+    The thumbnail is subsampled (nearest neighbour), not averaged: averaging
+    blurs small dense text into gray above the threshold, reading as no ink.
+
+    Args:
+        img: Page image (any mode).
+
+    Returns:
+        Ink density in [0, 1].
+    """
+    thumb = img.convert("L")
+    thumb.thumbnail((INK_SAMPLE_DIM, INK_SAMPLE_DIM), resample=Image.NEAREST)
+    hist = thumb.histogram()
+    total = sum(hist) or 1
+    return sum(hist[:INK_THRESHOLD]) / total
+
+
+class TokenBudgeter:
+    """
+    Per-model estimator of the max_tokens to request for a page.
+
+    The expected output length is ink density times a tokens-per-ink ratio
+    learned from previous (non-truncated) pages. Budgets are returned to the
+    caller and never stored on the shared processor.
+    """
+
+    def __init__(self, cap: int, floor: int = 512):
+        self.cap = cap
+        self.floor = min(floor, cap)
+        self.tokens_per_ink = PRIOR_TOKENS_PER_INK
+        self._lock = threading.Lock()
+
+    def estimate(self, ink_density: float) -> int:
+        with self._lock:
+            ratio = self.tokens_per_ink
+        expected = ink_density * ratio
+        return int(max(self.floor, min(self.cap, expected * HEADROOM)))
+
+    def record(self, ink_density: float, used: Optional[int], budget: int, early_stopped: bool = False) -> bool:
+        """
+        Feeds back the real completion length of a page; returns whether it
+        was truncated (used >= budget), so the caller can redo it at `cap`.
+
+        A truncated page needed at least `budget` tokens: the ratio is raised
+        to at least what would have given it that budget, so it can't stay
+        stuck below the page's real length. Early-stopped pages don't update
+        the ratio, since their length isn't the natural length of the page.
+        """
+        truncated = used is not None and used >= budget and not early_stopped
+        record_tokens(budget, used or 0, early_stopped=early_stopped, truncated=truncated)
+
+        if used is None or early_stopped:
+            return truncated
+        ink = max(ink_density, MIN_INK)
+        with self._lock:
+            if truncated:
+                self.tokens_per_ink = max(self.tokens_per_ink, budget / ink)
+            else:
+                observed = used / ink
+                self.tokens_per_ink = (1 - EMA_ALPHA) * self.tokens_per_ink + EMA_ALPHA * observed
+        return truncated
+
+
+class RepetitionDetector:
+    """
+    Detects runaway generation: the tail of the text being one short unit
+    repeated `min_repeats` times (e.g. the same table row or phrase over and over).
+
+    Args:
+        min_period: Shortest repeating unit (chars) considered.
+        max_period: Longest repeating unit (chars) considered.
+        min_repeats: Consecutive repeats required to flag the output.
+        check_every: Only re-check after this many new chars.
+    """
+
+    def __init__(self, min_period: int = 8, max_period: int = 200, min_repeats: int = 16, check_every: int = 64):
+        self.min_period = min_period
+        self.max_period = max_period
+        self.min_repeats = min_repeats
+        self.check_every = check_every
+        self._last_checked = 0
+        self.period = None
+
+    def feed(self, text: str) -> bool:
+        if len(text) - self._last_checked < self.check_every:
+            return False
+        self._last_checked = len(text)
+
+        tail = text[-self.max_period * self.min_repeats:]
+        for period in range(self.min_period, self.max_period + 1):
+            need = period * self.min_repeats
+            if len(tail) < need:
+                break
+            unit = tail[-period:]
+            if not unit.strip():
+                continue
+            if tail[-need:] == unit * self.min_repeats:
+                self.period = period
+                return True
+        return False
+
+    def trim(self, text: str) -> str:
+        """Drops the repeated tail, keeping a single occurrence of the unit."""
+        if not self.period:
+            return text
+        unit = text[-self.period:]
+        while text.endswith(unit * 2):
+            text = text[:-self.period]
+        return text
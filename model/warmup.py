@@ -0,0 +1,357 @@
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from core.shared_state import get_store, state_path
+from core.status_manager import status_manager
+from misc.logger import setup_logger
+
+logger = setup_logger(name="model-warmup", log_dir="logs")
+
+# ==========================
+# POLICY
+# ==========================
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") != "0"
+# Kept warm whatever the traffic (comma-separated model ids)
+PINNED_MODELS = [m.strip() for m in os.getenv("WARMUP_MODELS", "").split(",") if m.strip()]
+# Loaded at start-up when there is no demand history yet
+DEFAULT_MODEL = os.getenv("WARMUP_DEFAULT_MODEL", "xf3")
+DEMAND_HALF_LIFE = float(os.getenv("WARMUP_DEMAND_HALF_LIFE", 3600))      # seconds
+CHECK_INTERVAL = float(os.getenv("WARMUP_INTERVAL", 60))                  # seconds between policy checks
+MAX_WARM_MODELS = int(os.getenv("WARMUP_MAX_MODELS", 2))                  # remote / CPU models kept warm
+# Ready models idle for this long get a synthetic page, so a dead backend is found before a user does (0 = off)
+KEEPALIVE_SECONDS = float(os.getenv("WARMUP_KEEPALIVE_SECONDS", 900))
+# The local vLLM serves one model: switch only when the served one has been unused this long,
+# nothing is running on it, and the predicted model has SWITCH_RATIO times its demand
+SWITCH_IDLE_SECONDS = float(os.getenv("WARMUP_SWITCH_IDLE_SECONDS", 300))
+SWITCH_RATIO = 2.0
+# A request whose model needs a switch while other requests run is refused (503) with this Retry-After
+SWITCH_RETRY_AFTER = int(os.getenv("WARMUP_SWITCH_RETRY_AFTER", 30))
+ERROR_BACKOFF = 600   # seconds before a model that failed to load is tried again
+
+DEMAND_KEY = "model_demand"
+WARMUP_PROMPT = "Convert the document to markdown."
+
+
+def _is_local(model: str) -> bool:
+    """Served by the local vLLM instance (GPU engine without configured backends)."""
+    from model.profiles import get_profile
+
+    profile = get_profile(model)
+    return profile.engine == "gpu" and not profile.backends
+
+
+def _served_name(model: str) -> str:
+    from model.ocr_gpu import MODEL_MAP, DEFAULT_MODEL as DEFAULT_GPU_MODEL
+    return MODEL_MAP.get(model, DEFAULT_GPU_MODEL)
+
+
+class ModelWarmup:
+    """
+    Keeps the models users are about to need loaded, so cold starts (vLLM
+    launch plus graph capture, minutes) land on this thread instead of a
+    /process request.
+
+    - Demand: every OCR request and /load-model call adds to an
+      exponentially decaying per-model score (half-life DEMAND_HALF_LIFE),
+      kept in the shared store so it is common to all workers and survives
+      restarts.
+    - Pre-loading: at start-up and every CHECK_INTERVAL the most demanded
+      models are loaded: remote-backend and CPU models (up to
+      MAX_WARM_MODELS) directly, the local vLLM model only when switching
+      can't hurt anyone (see SWITCH_*).
+    - Warm-up: a loaded model OCRs a synthetic page before it is reported
+      ready, so CUDA graphs, the processor cache and backend connections are
+      initialized; load and warm-up times are reported as time-to-ready.
+    - Keep-warm: ready models idle for KEEPALIVE_SECONDS get another
+      synthetic page; a failure marks them cold and the next check reloads.
+
+    Requests that find their model not ready in this worker count as cold hits.
+    The status shown to the UI (status_manager) follows the local vLLM only.
+    """
+
+    def __init__(self):
+        self._states: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Event] = {}   # model -> set when its load ends
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._page_path: Optional[str] = None
+        self.enabled = WARMUP_ENABLED
+
+    # -------------------------
+    # DEMAND
+    # -------------------------
+    def record_demand(self, model: str, request: bool = True) -> bool:
+        """
+        Counts demand for `model`; returns whether it was ready (not a cold
+        start). `request=False` (e.g. /load-model) leaves the hit counters alone.
+        """
+        now = time.time()
+        with self._lock:
+            # Lost updates between workers only drop a sample; no transaction needed
+            demand = get_store().get(DEMAND_KEY, {})
+            entry = demand.get(model, {"score": 0.0, "ts": now})
+            entry["score"] = entry["score"] * 0.5 ** ((now - entry["ts"]) / DEMAND_HALF_LIFE) + 1
+            entry["ts"] = entry["last_used"] = now
+            demand[model] = entry
+            get_store().put(DEMAND_KEY, demand)
+            if self.enabled:
+                warm = self._states.get(model, {}).get("state") == "ready"
+            else:
+                warm = model in getattr(sys.modules.get("misc.ocr_model"), "_processors", {})
+        # Another worker may have switched the local vLLM to a different model since
+        if warm and _is_local(model) and status_manager.get_status()["active_model"] not in (None, model):
+            warm = False
+        if request:
+            get_store().add_counters("warmup", {"warm_hits" if warm else "cold_hits": 1})
+        return warm
+
+    def demand(self) -> Dict[str, dict]:
+        now = time.time()
+        return {
+            model: {
+                "score": round(entry["score"] * 0.5 ** ((now - entry["ts"]) / DEMAND_HALF_LIFE), 3),
+                "last_used": entry.get("last_used"),
+            }
+            for model, entry in get_store().get(DEMAND_KEY, {}).items()
+        }
+
+    def predicted(self) -> list:
+        """Models in the order they should be warm: pinned ones, then by decayed demand."""
+        demand = self.demand()
+        ranked = sorted(demand, key=lambda m: demand[m]["score"], reverse=True)
+        order = PINNED_MODELS + [m for m in ranked if m not in PINNED_MODELS]
+        return order or ([DEFAULT_MODEL] if DEFAULT_MODEL else [])
+
+    # -------------------------
+    # WARM-UP
+    # -------------------------
+    def _synthetic_page(self) -> str:
+        if self._page_path is None:
+            from PIL import Image, ImageDraw
+
+            path = state_path("warmup_page.png")
+            img = Image.new("RGB", (1024, 384), "white")
+            draw = ImageDraw.Draw(img)
+            for i, line in enumerate(("Warm-up page", "The quick brown fox jumps over the lazy dog.", "0123456789 | A1 B2 C3")):
+                draw.text((40, 60 + i * 90), line, fill="black")
+            img.save(path)
+            self._page_path = path
+        return self._page_path
+
+    def _state(self, model: str) -> dict:
+        with self._lock:
+            return dict(self._states.get(model, {}))
+
+    def _set_state(self, model: str, **fields):
+        with self._lock:
+            self._states.setdefault(model, {"state": "cold"}).update(fields)
+
+    @staticmethod
+    def _running_on(served: str) -> int:
+        """Requests running (in any worker) on a model the local vLLM serves as `served`."""
+        from core.admission import get_admission_stats
+
+        return sum(
+            count for model, count in get_admission_stats()["by_model"].items()
+            if model != "unknown" and _is_local(model) and _served_name(model) == served
+        )
+
+    def _check_switch(self, served: str):
+        """Refuses a request's switch of the local vLLM while it serves other running requests."""
+        from fastapi import HTTPException
+
+        others = self._running_on(served)
+        if others:
+            raise HTTPException(
+                status_code=503,
+                detail=f"The model server is busy with {others} other request(s) on {served}; retry shortly.",
+                headers={"Retry-After": str(SWITCH_RETRY_AFTER)},
+            )
+
+    def ensure(self, model: str, reason: str = "policy") -> bool:
+        """
+        Loads `model` (launching / switching the local vLLM if needed) and warms it up; blocking.
+        Callers arriving while another thread loads the model wait for that load.
+
+        Raises:
+            HTTPException: 503 when a request (reason "request") would switch the
+                local vLLM while requests on its current model are running.
+        """
+        from fastapi import HTTPException
+        from misc.ocr_model import get_processor
+
+        while True:
+            with self._lock:
+                loading = self._loading.get(model)
+                if loading is None:
+                    self._loading[model] = threading.Event()
+                    break
+            loading.wait()
+            if self._state(model).get("state") == "error":
+                return False
+        local = False
+        try:
+            local = _is_local(model)
+            state = self._state(model)
+            served = self._served() if local else None
+            if state.get("state") == "ready" and not (local and served != _served_name(model)):
+                return True
+            if local and reason == "request" and served not in (None, _served_name(model)):
+                self._check_switch(served)
+
+            logger.info(f"Warming up {model} ({reason})")
+            self._set_state(model, state="loading", reason=reason, error=None)
+            if local:
+                status_manager.set_loading(True, model, "Starting model server...")
+            start = time.perf_counter()
+            if local:
+                from model.start_vllm import start as start_vllm
+                # No-op if already served; the cached processor alone doesn't prove that
+                start_vllm(_served_name(model))
+            processor = get_processor(model)
+            load_s = time.perf_counter() - start
+
+            self._set_state(model, state="warming")
+            if local:
+                status_manager.set_loading(True, model, "Warming up...")
+            warm_start = time.perf_counter()
+            processor.run_batch([self._synthetic_page()], WARMUP_PROMPT)
+            warmup_s = time.perf_counter() - warm_start
+
+            now = time.time()
+            if local:
+                # The local vLLM serves one model: the others it was serving are gone
+                with self._lock:
+                    others = [m for m, s in self._states.items() if m != model and s.get("state") == "ready"]
+                for other in others:
+                    if _is_local(other):
+                        self._set_state(other, state="cold")
+            self._set_state(
+                model, state="ready", load_s=round(load_s, 2), warmup_s=round(warmup_s, 2),
+                time_to_ready_s=round(load_s + warmup_s, 2), ready_at=now, last_ping=now,
+            )
+            if local:
+                status_manager.set_loading(False, model, "Ready")
+            logger.info(f"{model} ready in {load_s + warmup_s:.1f}s (load {load_s:.1f}s, warm-up {warmup_s:.1f}s)")
+            return True
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Warm-up of {model} failed: {e}", exc_info=True)
+            self._set_state(model, state="error", error=str(e), failed_at=time.time())
+            if local:
+                status_manager.set_loading(False, model, f"Error: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._loading.pop(model).set()
+
+    def ensure_async(self, model: str, reason: str = "policy"):
+        threading.Thread(target=self.ensure, args=(model, reason), daemon=True, name=f"warmup-{model}").start()
+
+    def _keepalive(self, model: str):
+        try:
+            from misc.ocr_model import get_processor
+            get_processor(model).run_batch([self._synthetic_page()], WARMUP_PROMPT)
+            self._set_state(model, last_ping=time.time())
+        except Exception as e:
+            logger.warning(f"Keep-warm page for {model} failed, marking it cold: {e}")
+            self._set_state(model, state="cold", error=str(e))
+
+    # -------------------------
+    # POLICY
+    # -------------------------
+    @staticmethod
+    def _served() -> Optional[str]:
+        from model.start_vllm import get_current_vllm_model
+        return get_current_vllm_model()
+
+    def _should_try(self, model: str) -> bool:
+        state = self._state(model)
+        if state.get("state") == "error":
+            return time.time() - state.get("failed_at", 0) > ERROR_BACKOFF
+        return state.get("state") in (None, "cold")
+
+    def _local_idle(self, served: str, served_model: Optional[str], demand: dict) -> bool:
+        if self._running_on(served):
+            return False
+        last_used = (demand.get(served_model) or {}).get("last_used") or 0
+        return time.time() - last_used > SWITCH_IDLE_SECONDS
+
+    def check(self):
+        """One policy pass: load what is predicted, ping what is idle."""
+        order = self.predicted()
+        demand = self.demand()
+
+        remote = [m for m in order if not _is_local(m)][:MAX_WARM_MODELS]
+        for model in remote:
+            if self._should_try(model):
+                self.ensure(model)
+
+        local = next((m for m in order if _is_local(m)), None)
+        if local is not None:
+            served = self._served()
+            if served is None or served == _served_name(local):
+                if self._should_try(local):
+                    self.ensure(local)
+            else:
+                served_model = next((m for m in demand if _is_local(m) and _served_name(m) == served), None)
+                served_score = (demand.get(served_model) or {}).get("score", 0.0)
+                target_score = (demand.get(local) or {}).get("score", 0.0)
+                if (local in PINNED_MODELS or target_score >= SWITCH_RATIO * served_score) \
+                        and self._local_idle(served, served_model, demand) and self._should_try(local):
+                    self.ensure(local, reason=f"switch from {served}")
+
+        if KEEPALIVE_SECONDS:
+            now = time.time()
+            with self._lock:
+                states = {m: dict(s) for m, s in self._states.items()}
+            for model, state in states.items():
+                last_used = (demand.get(model) or {}).get("last_used") or 0
+                if state.get("state") == "ready" and now - max(last_used, state.get("last_ping", 0)) > KEEPALIVE_SECONDS:
+                    self._keepalive(model)
+
+    # -------------------------
+    # LIFECYCLE
+    # -------------------------
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Warm-up check failed: {e}", exc_info=True)
+            self._stop.wait(CHECK_INTERVAL)
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="model-warmup")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            models = {m: dict(s) for m, s in self._states.items()}
+        return {
+            "enabled": self.enabled,
+            "models": models,
+            "demand": self.demand(),
+            "predicted": self.predicted()[:MAX_WARM_MODELS + 1],
+            **dict.fromkeys(("warm_hits", "cold_hits"), 0),
+            **get_store().counters("warmup"),
+        }
+
+
+model_warmup = ModelWarmup()
+
+
+def get_warmup_stats() -> dict:
+    return model_warmup.get_stats()
@@ -1,2 +1,9 @@
-from .pdf_processor import pdf_processor
-from .image_processor import ImageProcessor
\ No newline at end of file
+def __getattr__(name):
+    # PyMuPDF / PIL are imported on first use, not when a submodule is imported
+    if name == "pdf_processor":
+        from .pdf_processor import pdf_processor
+        return pdf_processor
+    if name == "ImageProcessor":
+        from .image_processor import ImageProcessor
+        return ImageProcessor
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
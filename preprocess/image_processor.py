@@ -1,7 +1,8 @@
 from PIL import Image, ImageOps
 from misc.logger import setup_logger
 
-logger = setup_logger(name="image_processor")
+# Called once per rendered page: throttle the per-image INFO messages
+logger = setup_logger(name="image_processor", rate_limit=1.0)
 
 # ==========================
 # HARD CONSTANTS (TUNABLE)
@@ -17,10 +18,15 @@ MAX_ASPECT_RATIO = 6.0  # Prevent pathological long receipts
 
 class ImageProcessor:
     @staticmethod
-    def process_image(image_input) -> Image.Image:
+    def process_image(image_input, max_dim: int = MAX_DIM, min_dim: int = MIN_DIM) -> Image.Image:
         """
         Production-grade VLM OCR preprocessing.
 
+        Args:
+            image_input: Path or PIL image.
+            max_dim: Longest side after resizing (see model.profiles).
+            min_dim: Images whose longest side is below this are upscaled.
+
         Guarantees:
         - RGB preserved
         - EXIF orientation fixed
@@ -68,10 +74,10 @@ class ImageProcessor:
             # ----------------------
             max_side = max(width, height)
 
-            if max_side > MAX_DIM:
-                scale = MAX_DIM / max_side
-            elif max_side < MIN_DIM:
-                scale = MIN_DIM / max_side
+            if max_side > max_dim:
+                scale = max_dim / max_side
+            elif max_side < min_dim:
+                scale = min_dim / max_side
             else:
                 scale = 1.0
 
@@ -1,18 +1,38 @@
 import argparse
+import contextvars
 import os
 import pathlib
+import re
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
 from typing import List, Optional
-from preprocess.image_processor import ImageProcessor
+from preprocess.image_processor import ImageProcessor, MAX_DIM, MIN_DIM
 from PIL import Image
 
 import fitz  # PyMuPDF
-from misc.logger import setup_logger
+from misc.logger import setup_logger, log_context
+from core.cancellation import RequestCancelled, check_cancelled
+from core.memory_budget import get_render_budget, estimate_render_bytes
+from core.timing import span
+from core.profiling import profiled
 
-# Initialize Logger
-logger = setup_logger(name="pdf_processor", log_dir="logs")
+# Initialize Logger (progress is logged per rendered chunk, so throttle it)
+logger = setup_logger(name="pdf_processor", log_dir="logs", rate_limit=2.0)
+
+
+_PAGE_SUFFIX = re.compile(r"_p(\d+)\.\w+$")
+
+
+def page_index_from_path(image_path: str) -> int:
+    """
+    Returns the 0-indexed PDF page number encoded in a rendered page filename.
+
+    Args:
+        image_path: Path produced by render_pages (`<stem>_p<page>.<ext>`).
+    """
+    match = _PAGE_SUFFIX.search(image_path)
+    return int(match.group(1)) if match else 0
 
 
 @lru_cache(maxsize=16)
@@ -87,9 +107,15 @@ def render_pages(
     pdf_path: str,
     page_nums: List[int],
     output_dir: str,
-    dpi: int
+    dpi: int,
+    max_dim: int = MAX_DIM,
+    min_dim: int = MIN_DIM,
+    image_format: str = "PNG",
+    image_quality: int = 90
 ) -> List[str]:
     results: List[str] = []
+    ext = {"JPEG": "jpg", "WEBP": "webp"}.get(image_format, "png")
+    save_kwargs = {"optimize": True} if image_format == "PNG" else {"quality": image_quality}
 
     try:
         doc = fitz.open(pdf_path)
@@ -99,32 +125,57 @@ def render_pages(
 
     mat = get_zoom_matrix(dpi)
     stem = pathlib.Path(pdf_path).stem
+    # Shared by all concurrent requests: bounds the page pixels held in memory process-wide
+    budget = get_render_budget()
 
     for page_num in page_nums:
+        # Stop rendering as soon as the request is cancelled (client gone / deadline)
         try:
-            page = doc.load_page(page_num)
-
-            # Render page → pixmap (RGB)
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-
-            # Pixmap → PIL Image (NO disk I/O)
-            img = Image.frombytes(
-                "RGB",
-                (pix.width, pix.height),
-                pix.samples
-            )
+            check_cancelled()
+        except RequestCancelled:
+            doc.close()
+            raise
 
-            # Apply VLM-safe preprocessing
-            img = ImageProcessor.process_image(img)
-
-            output_filename = f"{stem}_p{page_num}.png"
-            output_path = os.path.join(output_dir, output_filename)
-
-            img.save(output_path, format="PNG", optimize=True)
-            results.append(output_path)
-
-        except Exception as e:
-            logger.error(f"Error rendering page {page_num}: {e}", exc_info=True)
+        with log_context(page=page_num):
+            try:
+                page = doc.load_page(page_num)
+                # Same key as the inference spans of this page (image file stem)
+                key = f"{stem}_p{page_num}"
+
+                with span("render_wait", page=key):
+                    reserved = budget.acquire(estimate_render_bytes(page.rect.width, page.rect.height, dpi))
+                try:
+                    with span("render", page=key):
+                        # Render page → pixmap (RGB)
+                        pix = page.get_pixmap(matrix=mat, alpha=False)
+
+                        # Pixmap → PIL Image (NO disk I/O)
+                        img = Image.frombytes(
+                            "RGB",
+                            (pix.width, pix.height),
+                            pix.samples
+                        )
+                        pix = None  # free the pixmap before resizing
+
+                    with span("preprocess", page=key):
+                        # Apply VLM-safe preprocessing
+                        img = ImageProcessor.process_image(img, max_dim=max_dim, min_dim=min_dim)
+
+                    output_filename = f"{stem}_p{page_num}.{ext}"
+                    output_path = os.path.join(output_dir, output_filename)
+
+                    with span("save", page=key):
+                        img.save(output_path, format=image_format, **save_kwargs)
+                    img = None
+                finally:
+                    budget.release(reserved)
+                results.append(output_path)
+
+            except RequestCancelled:
+                doc.close()
+                raise
+            except Exception as e:
+                logger.error(f"Error rendering page {page_num}: {e}", exc_info=True)
 
     doc.close()
     return results
@@ -153,7 +204,12 @@ def pdf_processor(
     pdf_path: str, 
     output_dir: str, 
     workers: int, 
-    dpi: int
+    dpi: int,
+    max_dim: int = MAX_DIM,
+    min_dim: int = MIN_DIM,
+    image_format: str = "PNG",
+    image_quality: int = 90,
+    page_nums: Optional[List[int]] = None
 ) -> List[str]:
     """
     Orchestrates the parallel rendering of a PDF file using ThreadPoolExecutor.
@@ -163,6 +219,14 @@ def pdf_processor(
         output_dir: Output directory for images.
         workers: Number of parallel threads.
         dpi: DPI for rendering.
+        max_dim: Longest side of the saved page images.
+        min_dim: Minimum longest side of the saved page images.
+        image_format: PIL format used to save pages (PNG/JPEG/WEBP).
+        image_quality: Quality for lossy formats.
+        page_nums: 0-indexed pages to render (default: all), e.g. to resume a job.
+
+    Returns:
+        Paths of the rendered pages, in page order.
     """
     start_time = time.time()
     logger.info("Starting PDF processing job...")
@@ -193,23 +257,36 @@ def pdf_processor(
         logger.warning("PDF has 0 pages. Nothing to process.")
         return
 
+    pages = list(range(num_pages))
+    if page_nums is not None:
+        wanted = set(page_nums)
+        pages = [p for p in pages if p in wanted]
+        if not pages:
+            logger.info("No pages left to render.")
+            return []
+
     # Don't create more workers than pages
-    workers = min(workers, num_pages)
+    workers = min(workers, len(pages))
 
-    pages = list(range(num_pages))
     chunks = chunkify(pages, workers)
 
     logger.info(
-        f"Job Details: file={pdf_path} | pages={num_pages} | workers={workers} | dpi={dpi}"
+        f"Job Details: file={pdf_path} | pages={num_pages} | workers={workers} | dpi={dpi} "
+        f"| max_dim={max_dim} | format={image_format}"
     )
 
     total_rendered = 0
     
     all_results = []
-    with ThreadPoolExecutor(max_workers=workers) as executor:
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render") as executor:
         # Submit all tasks
+        # copy_context: render threads log with the caller's request id
         futures = {
-            executor.submit(render_pages, pdf_path, chunk, output_dir, dpi): chunk 
+            executor.submit(
+                contextvars.copy_context().run,
+                profiled(render_pages), pdf_path, chunk, output_dir, dpi,
+                max_dim, min_dim, image_format, image_quality
+            ): chunk
             for chunk in chunks if chunk
         }
 
@@ -219,11 +296,13 @@ def pdf_processor(
                 result_paths = future.result()
                 all_results.extend(result_paths)
                 total_rendered += len(result_paths)
-                logger.info(f"Progress: {total_rendered}/{num_pages} pages rendered.")
+                logger.info(f"Progress: {total_rendered}/{len(pages)} pages rendered.")
+            except RequestCancelled:
+                raise
             except Exception as e:
                 logger.error(f"Worker thread failed: {e}", exc_info=True)
 
     duration = time.time() - start_time
     logger.info(f"Job Completed! Rendered {total_rendered} pages in {duration:.2f}s")
-    return sorted(all_results)
+    return sorted(all_results, key=page_index_from_path)
 
@@ -0,0 +1,79 @@
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from core.auth import require_admin
+from core import profiling
+
+# Profiling state lives in the worker process that serves the call (the response
+# carries its pid); run a single worker, or repeat the call, to reach a given one.
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.post("/profile")
+async def start_profile(
+    kind: str = Query("sampling", pattern="^(cprofile|sampling)$",
+                      description="sampling: low-overhead stack samples (speedscope); cprofile: deterministic (pstats)"),
+    requests: int = Query(0, ge=0, description="Profile the next N /process requests"),
+    seconds: float = Query(0, ge=0, le=profiling.MAX_WINDOW, description="Profile /process requests started within this window"),
+    interval_ms: float = Query(5, ge=1, le=1000, description="Sampling period"),
+):
+    """Arms a profiling session; with neither requests nor seconds, the next request is profiled."""
+    try:
+        session = profiling.start_session(kind=kind, requests=requests, seconds=seconds, interval=interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return session.status()
+
+
+@router.get("/profile")
+async def profile_status():
+    return {"session": profiling.session_status()}
+
+
+@router.delete("/profile")
+async def stop_profile():
+    """Ends the running session early and writes what it collected."""
+    session = await asyncio.to_thread(profiling.stop_session)
+    return {"session": session.status() if session else None}
+
+
+@router.get("/profiles")
+async def list_profiles():
+    return {"profiles": await asyncio.to_thread(profiling.list_profiles), "pid": os.getpid()}
+
+
+@router.get("/profiles/{name}")
+async def download_profile(name: str):
+    """.pstats: `python -m pstats <file>` or snakeviz; .speedscope.json: https://www.speedscope.app"""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=os.path.basename(path), media_type="application/octet-stream")
+
+
+@router.get("/stacks", response_class=PlainTextResponse)
+async def thread_stacks():
+    """Stack of every thread of this worker: render_*, inference_*, asyncio_* (OCR calls) and the event loop."""
+    return profiling.dump_stacks()
+
+
+@router.post("/tracemalloc/start")
+async def tracemalloc_start(frames: int = Query(10, ge=1, le=100)):
+    return profiling.tracemalloc_start(frames)
+
+
+@router.post("/tracemalloc/stop")
+async def tracemalloc_stop():
+    return profiling.tracemalloc_stop()
+
+
+@router.get("/tracemalloc")
+async def tracemalloc_top(
+    limit: int = Query(25, ge=1, le=500),
+    key: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+):
+    try:
+        return await asyncio.to_thread(profiling.tracemalloc_top, limit, key)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
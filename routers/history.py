@@ -1,61 +1,82 @@
 import os
-import json
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from db.database import get_db, OCRRequest
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from core.responses import OrjsonResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import get_async_db, SessionLocal, OCRRequest
 from core.auth import verify_google_token
+from core.results import get_result, load_metadata, SAVED_FILE_FIELDS
 
 router = APIRouter()
 
-@router.get("/history")
-async def get_history(user: dict = Depends(verify_google_token), db: Session = Depends(get_db)):
+# Requests rendered per /history call; kept within the result cache so a page stays cached
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 20))
+
+@router.get("/history", response_class=OrjsonResponse)
+async def get_history(
+    include: Optional[str] = Query(None, description="Comma separated: pages"),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=100, description="Requests per page, newest first"),
+    offset: int = Query(0, ge=0),
+    user: dict = Depends(verify_google_token),
+    db: AsyncSession = Depends(get_async_db)
+):
     import asyncio
     
     email = user.get("email")
-    # Quick DB query (usually fast enough, but could overlap)
-    db_requests = db.query(OCRRequest).filter(OCRRequest.user_email == email).order_by(OCRRequest.timestamp.desc()).all()
+    include_pages = "pages" in (include or "")
+    total = await db.scalar(select(func.count(OCRRequest.id)).filter(OCRRequest.user_email == email))
+    request_ids = (await db.scalars(
+        select(OCRRequest.id).filter(OCRRequest.user_email == email)
+        .order_by(OCRRequest.timestamp.desc(), OCRRequest.id).limit(limit).offset(offset)
+    )).all()
     
-    def _load_history_files(requests):
+    def _load_history_files(request_ids):
         history_list = []
-        for req in requests:
-            meta_path = req.metadata_json_path
-            data = {}
-            if os.path.exists(meta_path):
-                try:
-                    with open(meta_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                except:
-                    pass
-            
-            data["id"] = req.id
-            data["timestamp"] = req.timestamp.strftime("%Y%m%d_%H%M%S")
-            data["model"] = req.model
-            data["total_pages"] = req.total_pages
-            
-            if "savedFiles" not in data or not data["savedFiles"]:
-                data["savedFiles"] = [
-                    {
-                        "original_name": f.original_name,
-                        "safe_name": f.safe_name,
-                        "saved_path": f.saved_path,
-                        "type": f.file_type
-                    } for f in req.files
-                ]
-            
-            if "filename" not in data:
-                names = [f.original_name for f in req.files]
-                data["filename"] = ", ".join(names) if names else "Unknown Document"
-                
-            if "ocrResult" not in data:
-                if os.path.exists(req.result_md_path):
-                    with open(req.result_md_path, "r", encoding="utf-8") as rf:
-                        data["ocrResult"] = rf.read()
+        # Own session: this runs in a worker thread
+        thread_db = SessionLocal()
+        try:
+            for request_id in request_ids:
+                req = thread_db.get(OCRRequest, request_id)
+                data = load_metadata(req.metadata_json_path)
+                # Markdown is rendered from the page store (cached); legacy metadata carries it inline
+                result = get_result(thread_db, req, data)
+
+                data["id"] = req.id
+                data["timestamp"] = req.timestamp.strftime("%Y%m%d_%H%M%S")
+                data["model"] = req.model
+                data["total_pages"] = req.total_pages
+                data["status"] = req.status or "completed"
+                data["ocrResult"] = result["markdown"]
+                data.pop("errors", None)
+                if include_pages:
+                    data["pages"] = result["pages"]
+                else:
+                    data.pop("pages", None)
+
+                if "savedFiles" not in data or not data["savedFiles"]:
+                    data["savedFiles"] = [
+                        {
+                            "original_name": f.original_name,
+                            "safe_name": f.safe_name,
+                            "saved_path": f.saved_path,
+                            "type": f.file_type,
+                            "page_count": f.page_count
+                        } for f in req.files
+                    ]
                 else:
-                    data["ocrResult"] = "No result content available."
-            
-            history_list.append(data)
+                    data["savedFiles"] = [{k: f.get(k) for k in SAVED_FILE_FIELDS} for f in data["savedFiles"]]
+
+                if "filename" not in data:
+                    names = [f.original_name for f in req.files]
+                    data["filename"] = ", ".join(names) if names else "Unknown Document"
+
+                history_list.append(data)
+        finally:
+            thread_db.close()
         return history_list
 
     # Offload heavy IO loop to thread
-    history = await asyncio.to_thread(_load_history_files, db_requests)
-    return history
+    history = await asyncio.to_thread(_load_history_files, request_ids)
+    # Still a plain list for existing clients; the total tells them whether to fetch more
+    return OrjsonResponse(history, headers={"X-Total-Count": str(total)})
@@ -1,80 +1,415 @@
 import os
 import uuid
+import asyncio
+import contextlib
 import shutil
-import json
 from datetime import datetime
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
-from sqlalchemy.orm import Session
-from db.database import get_db, OCRRequest, ProcessedFile, OCRPage
+from typing import Optional
+from fastapi import APIRouter, Request, UploadFile, File, Form, Query, Depends, HTTPException
+from core.responses import OrjsonResponse
+from sqlalchemy import select, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import get_async_db, OCRRequest, ProcessedFile, OCRPage
 from core.auth import verify_google_token
 from core.utils import get_pdf_page_count, check_usage_limit
-from misc.ocr_model import ocr_pdf, ocr_image
+from core.checkpoint import (
+    PageCheckpointer, claim_request, get_saved_pages_async, get_saved_page_nos, is_running, keep_alive, release_request
+)
+from core.results import build_metadata, write_metadata, load_metadata, load_result, result_cache
+from core.idempotency import IDEMPOTENCY_HEADER, WAIT_SECONDS, POLL_INTERVAL, request_key
+from core.admission import admission
+from core.cancellation import CancelToken, RequestCancelled, cancel_scope, watch_disconnect, MAX_REQUEST_SECONDS
+from core.profiling import profile_scope, profiled
+from model.warmup import model_warmup
+from core.timing import span, annotate, current_timer
+from misc.logger import log_context
 
 router = APIRouter()
 
-UPLOADS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+UPLOADS_DIR = os.getenv("OCR_UPLOADS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads"))
 
 @router.post("/load-model")
 async def load_model(
     model: str = Form(...),
     user: dict = Depends(verify_google_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Pre-warm or load the model into memory (for vLLM/XF3)"""
-    from misc.ocr_model import get_processor
-    from core.status_manager import status_manager
-    import threading
-
-    def _load_task(model_name):
-        try:
-            status_manager.set_loading(True, model_name, "Initializing weights...")
-            # CRITICAL: Use the raw ID so it matches what /process uses
-            get_processor(model_name)
-            status_manager.set_loading(False, model_name, "Ready")
-        except Exception as e:
-            status_manager.set_loading(False, model_name, f"Error: {str(e)}")
-
-    # Start loading in background thread
-    thread = threading.Thread(target=_load_task, args=(model,))
-    thread.daemon = True
-    thread.start()
+    # A model switch in the UI is a strong hint: count it as demand and warm the model up
+    # (load + synthetic page) in the background; progress is reported by status_manager
+    await asyncio.to_thread(model_warmup.record_demand, model, False)
+    model_warmup.ensure_async(model, reason="load-model")
     
     return {"status": "success", "message": f"Model {model} loading started in background"}
 
-@router.post("/process")
+MODEL_LABELS = {
+    "xf1-mini": "XF1 Mini (High-Speed CPU)",
+    "xf3": "XF3 (Neural v3.0)",
+    "xf3-pro": "XF3 Pro (End-to-end Reasoning)",
+    "xf3-large": "XF3 Large (High-Res 3B)"
+}
+
+def _model_id_from_label(label: str) -> str:
+    for model_id, model_label in MODEL_LABELS.items():
+        if model_label == label:
+            return model_id
+    return (label or "").removeprefix("Model ")
+
+def _assign_page_numbers(saved_files: list):
+    """PDF pages come first, then images, so page numbers are stable across resumes."""
+    next_page_no = 1
+    for file_type in ("pdf", "image"):
+        for f in saved_files:
+            if f["type"] == file_type:
+                f["first_page_no"] = next_page_no
+                next_page_no += max(1, f["page_count"])
+
+async def _run_ocr(request_id: str, saved_files: list, model: str, user_slug: str, done_page_nos: set,
+                   token: CancelToken) -> list:
+    """
+    OCRs every page not in done_page_nos, checkpointing each page as it completes.
+
+    Stops early once `token` is cancelled (client disconnected or deadline);
+    pages done so far stay checkpointed, so the request can be resumed.
+
+    Returns:
+        Error placeholder pages, one per page that failed or was never rendered
+        (these are not checkpointed, so a resume retries them).
+    """
+    # The OCR stack (PyMuPDF, PIL, openai) is imported on first use, not at app start-up
+    from misc.ocr_model import ocr_pdf, ocr_image
+    error_pages = []
+
+    if not await asyncio.to_thread(model_warmup.record_demand, model) and model_warmup.enabled:
+        # Cold start: load and warm up here. Also relaunches a local vLLM switched to another model,
+        # unless other requests are running on it (503, see ModelWarmup.ensure)
+        with span("warmup"):
+            await asyncio.to_thread(model_warmup.ensure, model, "request")
+
+    # asyncio.to_thread carries the context: OCR logs are tagged with the request id and
+    # render / inference workers see the cancel token (and an armed profiling session)
+    with log_context(request_id=request_id), cancel_scope(token), profile_scope(), \
+            PageCheckpointer(request_id) as checkpointer:
+        for f in saved_files:
+            if f["type"] != "pdf":
+                continue
+            done = {
+                n - f["first_page_no"] for n in done_page_nos
+                if f["first_page_no"] <= n < f["first_page_no"] + f["page_count"]
+            }
+            if f["page_count"] and len(done) >= f["page_count"]:
+                continue
+
+            def _on_page(page, f=f):
+                checkpointer.save({
+                    "page_no": f["first_page_no"] + page["page_index"],
+                    "source_type": "pdf",
+                    "source_file": f["original_name"],
+                    "pdf_page_no": page["page_index"] + 1,
+                    "text": page.get("text", "")
+                }, file_id=f["db_id"])
+
+            try:
+                output_img_dir = os.path.join(UPLOADS_DIR, "images", user_slug, request_id)
+                os.makedirs(output_img_dir, exist_ok=True)
+
+                # Offload blocking OCR to thread
+                await asyncio.to_thread(profiled(ocr_pdf), f["path"], output_img_dir, model, done, _on_page)
+                error = "OCR error: page could not be rendered"
+
+            except RequestCancelled:
+                return error_pages
+            except Exception as e:
+                error = f"OCR error: {str(e)}"
+
+            # Pages with neither an earlier nor a new checkpoint (failed renders are only logged)
+            for page_no in range(f["first_page_no"], f["first_page_no"] + max(1, f["page_count"])):
+                if page_no in done_page_nos or page_no in checkpointer.page_nos:
+                    continue
+                error_pages.append({
+                    "page_no": page_no,
+                    "source_type": "pdf",
+                    "source_file": f["original_name"],
+                    "pdf_page_no": page_no - f["first_page_no"] + 1,
+                    "text": error
+                })
+
+        for f in saved_files:
+            if f["type"] != "image" or f["first_page_no"] in done_page_nos:
+                continue
+            page = {
+                "page_no": f["first_page_no"],
+                "source_type": "image",
+                "source_file": f["original_name"],
+                "pdf_page_no": None,
+            }
+            try:
+                # Offload blocking OCR to thread
+                page["text"] = await asyncio.to_thread(profiled(ocr_image), f["path"], model)
+                checkpointer.save(page, file_id=f["db_id"])
+
+            except RequestCancelled:
+                return error_pages
+            except Exception as e:
+                page["text"] = f"OCR error: {str(e)}"
+                error_pages.append(page)
+
+    return error_pages
+
+async def _run_with_cancellation(request: Request, request_id: str, timeout: Optional[float], run) -> tuple:
+    """
+    Runs `run(token)` with a CancelToken that is cancelled when the client
+    disconnects or the deadline (request timeout, capped by PROCESS_MAX_SECONDS) passes.
+    The request's heartbeat is kept fresh meanwhile, so it isn't taken over.
+
+    Returns:
+        (result of run, cancel reason or None)
+    """
+    limits = [t for t in (timeout, MAX_REQUEST_SECONDS) if t and t > 0]
+    token = CancelToken(timeout=min(limits) if limits else None)
+    watcher = asyncio.create_task(watch_disconnect(request, token))
+    heartbeat = asyncio.create_task(keep_alive(request_id))
+    try:
+        with span("ocr"):
+            result = await run(token)
+    finally:
+        watcher.cancel()
+        heartbeat.cancel()
+    return result, token.reason
+
+async def _run_and_finalize(request: Request, db_request: OCRRequest, saved_files: list, model: str, user_slug: str,
+                            done_page_nos: set, timeout: Optional[float], include: set, db: AsyncSession) -> dict:
+    """
+    OCRs the pages not in done_page_nos and finalizes the request. If either
+    step fails, the request is released ("partial") at once rather than
+    staying "processing" until its heartbeat goes stale.
+    """
+    try:
+        error_pages, cancel_reason = await _run_with_cancellation(
+            request, db_request.id, timeout,
+            lambda token: _run_ocr(db_request.id, saved_files, model, user_slug, done_page_nos, token)
+        )
+        return await _finalize_request(db_request, saved_files, error_pages, db, include, cancel_reason)
+    except BaseException:
+        with contextlib.suppress(Exception):
+            await asyncio.shield(release_request(db_request.id))
+        raise
+
+async def _finalize_request(db_request: OCRRequest, saved_files: list, error_pages: list, db: AsyncSession, include: set,
+                            cancel_reason: Optional[str] = None) -> dict:
+    """
+    Writes the compact metadata.json, marks the request as done and builds the response.
+
+    Page text is stored once (compressed, in OCRPage); markdown is rendered
+    from it. The response carries the markdown and slim metadata by default;
+    `include` opts into "pages" and "full_metadata" (metadata with pages and ocrResult).
+    """
+    with span("db_finalize"):
+        saved_count = await db.scalar(select(func.count()).select_from(OCRPage).filter(OCRPage.request_id == db_request.id))
+    expected = sum(max(1, f["page_count"] or 0) for f in saved_files)
+    if cancel_reason:
+        # Checkpointed pages are kept; POST /process/{id}/resume finishes the rest
+        db_request.status = "cancelled"
+    else:
+        # Missing pages without an error placeholder still leave the request resumable
+        db_request.status = "partial" if error_pages or saved_count < expected else "completed"
+    result_cache.invalidate(db_request.id)
+    total_pages = saved_count + len(error_pages)
+
+    with span("metadata"):
+        metadata = build_metadata(db_request, saved_files, total_pages, error_pages)
+        write_metadata(db_request.metadata_json_path, metadata)
+
+    # The daily quota sums total_pages: a request that stops early stays charged for every page it
+    # asked for, since POST /process/{id}/resume OCRs the rest without another quota check
+    db_request.total_pages = max(total_pages, expected)
+    db_request.finalized_at = datetime.utcnow()
+    with span("db_finalize"):
+        await db.commit()
+
+    return await _build_response(db_request, metadata, include, cancel_reason)
+
+async def _build_response(db_request: OCRRequest, metadata: dict, include: set, cancel_reason: Optional[str] = None) -> dict:
+    # Decompressing and rendering every page is CPU/IO bound; keep it off the event loop
+    with span("markdown"):
+        result = await asyncio.to_thread(load_result, db_request.id, metadata)
+    response_metadata = {k: v for k, v in metadata.items() if k != "errors"}
+    response = {
+        "status": "success",
+        "request_id": db_request.id,
+        "job_status": db_request.status,
+        "total_pages": db_request.total_pages,
+        "result": result["markdown"],
+        "metadata": response_metadata
+    }
+    if cancel_reason:
+        response["cancel_reason"] = cancel_reason
+    if "pages" in include:
+        response["pages"] = result["pages"]
+    if "full_metadata" in include:
+        response_metadata["pages"] = result["pages"]
+        response_metadata["ocrResult"] = result["markdown"]
+    timer = current_timer()
+    if "timings" in include and timer is not None:
+        # Per stage and per page (keyed by rendered image name); Server-Timing carries the stage totals
+        response_metadata["timings"] = timer.summary()
+    return response
+
+def _parse_include(include: Optional[str]) -> set:
+    return {part.strip() for part in (include or "").split(",") if part.strip()}
+
+def _saved_files_from_db(db_request: OCRRequest) -> list:
+    saved_files = [
+        {
+            "original_name": f.original_name,
+            "safe_name": f.safe_name,
+            "path": f.file_path,
+            "saved_path": f.saved_path,
+            "type": f.file_type,
+            "page_count": f.page_count,
+            "db_id": f.id
+        } for f in sorted(db_request.files, key=lambda f: f.id)
+    ]
+    _assign_page_numbers(saved_files)
+    return saved_files
+
+async def _resume(request: Request, db_request: OCRRequest, include: set, timeout: Optional[float],
+                  db: AsyncSession) -> dict:
+    """OCRs the pages of db_request that have no checkpoint yet and finalizes it."""
+    if any(f.purged_at is not None for f in db_request.files):
+        raise HTTPException(status_code=410, detail="The uploaded files of this request were deleted by retention")
+    email = db_request.user_email
+    model = _model_id_from_label(db_request.model)
+    saved_files = _saved_files_from_db(db_request)
+    done_page_nos = await get_saved_page_nos(db, db_request.id)
+    user_slug = email.replace("@", "_").replace(".", "_")
+    remaining_pages = max(1, sum(f["page_count"] or 1 for f in saved_files) - len(done_page_nos))
+
+    async with admission.hold(email, remaining_pages, model=model):
+        if not await claim_request(db, db_request.id):
+            raise HTTPException(status_code=409, detail="Request is already being processed")
+        # Re-read: the previous run may have checkpointed more pages until it stopped
+        done_page_nos = await get_saved_page_nos(db, db_request.id)
+        return await _run_and_finalize(
+            request, db_request, saved_files, model, user_slug, done_page_nos, timeout, include, db
+        )
+
+async def _attach_duplicate(request: Request, db_request: OCRRequest, include: set, timeout: Optional[float],
+                            db: AsyncSession) -> Optional[OrjsonResponse]:
+    """
+    Answers a repeated submission from the request it duplicates instead of
+    OCRing it again: waits for an original that a live run is processing,
+    returns a completed one as is, and resumes an interrupted one (partial,
+    cancelled, or "processing" with a stale heartbeat after its worker died).
+
+    Returns None when the original can't be resumed because retention deleted
+    its uploads; its idempotency key is released so the submission starts a
+    new request.
+    """
+    running, waited = is_running(db_request.status, db_request.heartbeat_at), 0.0
+    while True:
+        while running and waited < WAIT_SECONDS:
+            if await request.is_disconnected():
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+            waited += POLL_INTERVAL
+            # Column query, then end the transaction: each poll sees the original's latest commit
+            row = (await db.execute(
+                select(OCRRequest.status, OCRRequest.heartbeat_at).filter(OCRRequest.id == db_request.id)
+            )).one()
+            await db.commit()
+            running = is_running(*row)
+
+        if running:
+            return OrjsonResponse(status_code=202, content={
+                "status": "processing",
+                "request_id": db_request.id,
+                "job_status": "processing",
+                "detail": f"An identical request is still running; poll GET /process/{db_request.id}"
+            })
+
+        await db.refresh(db_request)
+        if db_request.status == "completed":
+            metadata = await asyncio.to_thread(load_metadata, db_request.metadata_json_path)
+            response = await _build_response(db_request, metadata, include)
+            break
+        try:
+            response = await _resume(request, db_request, include, timeout, db)
+            break
+        except HTTPException as e:
+            if e.status_code == 410:
+                await db.execute(
+                    update(OCRRequest)
+                    .where(OCRRequest.id == db_request.id, OCRRequest.idempotency_key == db_request.idempotency_key)
+                    .values(idempotency_key=None)
+                )
+                await db.commit()
+                return None
+            if e.status_code != 409:
+                raise
+            # Another submission claimed it first: wait for that run instead
+            running = True
+    response["deduplicated"] = True
+    return OrjsonResponse(response)
+
+async def _find_duplicate(email: str, key: str, db: AsyncSession) -> Optional[OCRRequest]:
+    return await db.scalar(
+        select(OCRRequest).options(selectinload(OCRRequest.files))
+        .filter(OCRRequest.user_email == email, OCRRequest.idempotency_key == key)
+    )
+
+async def _get_owned_request(request_id: str, email: str, db: AsyncSession) -> OCRRequest:
+    # Eager-load files: lazy loads are not allowed on an AsyncSession
+    db_request = await db.scalar(
+        select(OCRRequest).options(selectinload(OCRRequest.files)).filter(OCRRequest.id == request_id)
+    )
+    if not db_request or db_request.user_email != email:
+        raise HTTPException(status_code=404, detail="Request not found")
+    return db_request
+
+# Heavy endpoints return OrjsonResponse directly, skipping FastAPI's jsonable_encoder pass
+@router.post("/process", response_class=OrjsonResponse)
 async def process_document(
+    request: Request,
     files: list[UploadFile] = File(...),
     prompt: str = Form(...),
     model: str = Form("xf1-standard"),
+    include: Optional[str] = Query(None, description="Comma separated: pages, full_metadata, timings"),
+    timeout: Optional[float] = Query(None, gt=0, description="Seconds; pages not done by then are left for a resume"),
     user: dict = Depends(verify_google_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     email = user.get("email")
-    pdf_files = [f for f in files if f.filename.lower().endswith(".pdf")]
-    image_files = [f for f in files if not f.filename.lower().endswith(".pdf")]
-
-    model_labels = {
-        "xf1-mini": "XF1 Mini (High-Speed CPU)",
-        "xf3": "XF3 (Neural v3.0)",
-        "xf3-pro": "XF3 Pro (End-to-end Reasoning)",
-        "xf3-large": "XF3 Large (High-Res 3B)"
-    }
-    selected_model = model_labels.get(model, f"Model {model}")
+    selected_model = MODEL_LABELS.get(model, f"Model {model}")
+
+    # Retried uploads attach to the original request instead of being saved and OCRed again
+    with span("hash"):
+        idempotency_key = await asyncio.to_thread(
+            request_key, email, model, prompt, [f.file for f in files], request.headers.get(IDEMPOTENCY_HEADER)
+        )
+    duplicate = await _find_duplicate(email, idempotency_key, db)
+    if duplicate is not None:
+        response = await _attach_duplicate(request, duplicate, _parse_include(include), timeout, db)
+        if response is not None:
+            return response
+        # The original's uploads were purged: these ones start over as a new request
 
     request_id = str(uuid.uuid4())[:8]
+    annotate(request_id=request_id)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     user_slug = email.replace("@", "_").replace(".", "_")
     request_dir = os.path.join(UPLOADS_DIR, user_slug, f"{timestamp}_{request_id}")
     os.makedirs(request_dir, exist_ok=True)
 
     saved_files = []
-    all_filenames = []
     for f in files:
         safe_name = f.filename.replace(" ", "_")
         rel_folder = os.path.join(user_slug, f"{timestamp}_{request_id}")
         file_path = os.path.join(UPLOADS_DIR, rel_folder, safe_name)
         
-        with open(file_path, "wb") as buf:
+        with span("upload"), open(file_path, "wb") as buf:
             shutil.copyfileobj(f.file, buf)
 
         saved_files.append({
@@ -84,172 +419,108 @@ async def process_document(
             "saved_path": f"/uploads/{rel_folder}/{safe_name}".replace("\\", "/"),
             "type": "pdf" if safe_name.lower().endswith(".pdf") else "image"
         })
-        all_filenames.append(f.filename)
-
-    all_files_str = ", ".join(all_filenames)
-
-    total_requested_pages = 0
-    for file_info in saved_files:
-        if file_info["type"] == "pdf":
-            file_info["page_count"] = get_pdf_page_count(file_info["path"])
-        else:
-            file_info["page_count"] = 1
-        total_requested_pages += file_info["page_count"]
-
-    check_usage_limit(email, total_requested_pages, db)
-    ocr_pages = []
-    global_page_no = 1
-
-    for f in saved_files:
-        if f["type"] == "pdf":
-            try:
-                output_img_dir = os.path.join(UPLOADS_DIR, "images", user_slug, request_id)
-                os.makedirs(output_img_dir, exist_ok=True)
-
-                # Offload blocking OCR to thread
-                import asyncio
-                pdf_pages = await asyncio.to_thread(ocr_pdf, f["path"], output_img_dir, model)
-
-                for page in pdf_pages:
-                    ocr_pages.append({
-                        "page_no": global_page_no,
-                        "source_type": "pdf",
-                        "source_file": f["original_name"],
-                        "pdf_page_no": page.get("page_index", 0) + 1,
-                        "text": page.get("text", "")
-                    })
-                    global_page_no += 1
 
-            except Exception as e:
-                ocr_pages.append({
-                    "page_no": global_page_no,
-                    "source_type": "pdf",
-                    "source_file": f["original_name"],
-                    "pdf_page_no": None,
-                    "text": f"OCR error: {str(e)}"
-                })
-                global_page_no += 1
-
-    for f in saved_files:
-        if f["type"] == "image":
-            try:
-                # Offload blocking OCR to thread
-                import asyncio
-                text = await asyncio.to_thread(ocr_image, f["path"], model)
-                
-                ocr_pages.append({
-                    "page_no": global_page_no,
-                    "source_type": "image",
-                    "source_file": f["original_name"],
-                    "pdf_page_no": None,
-                    "text": text
-                })
-                global_page_no += 1
-
-            except Exception as e:
-                ocr_pages.append({
-                    "page_no": global_page_no,
-                    "source_type": "image",
-                    "source_file": f["original_name"],
-                    "pdf_page_no": None,
-                    "text": f"OCR error: {str(e)}"
-                })
-                global_page_no += 1
-
-    if not ocr_pages:
-        ocr_md = "No text extracted."
-    else:
-        sections = []
-        for p in ocr_pages:
-            if p["source_type"] == "pdf":
-                header = f"## Page {p['page_no']} (PDF: {p['source_file']} — Page {p['pdf_page_no']})"
+    try:
+        total_requested_pages = 0
+        for file_info in saved_files:
+            if file_info["type"] == "pdf":
+                with span("page_count"):
+                    file_info["page_count"] = get_pdf_page_count(file_info["path"])
             else:
-                header = f"## Page {p['page_no']} (Image: {p['source_file']})"
-
-            sections.append(f"{header}\n{p['text']}")
-
-        ocr_md = "\n\n".join(sections)
-
-    result_md = f"""# OCR Results
-Processed by **{selected_model}**  
-Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-## Summary
-- PDFs: {len(pdf_files)}
-- Images: {len(image_files)}
-- Total Pages: {len(ocr_pages)}
-
-## OCR Output
-{ocr_md}
-"""
-
-    with open(os.path.join(request_dir, "result.md"), "w", encoding="utf-8") as f:
-        f.write(result_md)
-
-    metadata = {
-        "id": request_id, 
-        "filename": all_files_str,
-        "timestamp": timestamp,
-        "model": selected_model,
-        "total_pages": len(ocr_pages),
-        "pages": ocr_pages,
-        "ocrResult": result_md,
-        "savedFiles": saved_files
-    }
-
-    with open(os.path.join(request_dir, "metadata.json"), "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-
-    db_request = OCRRequest(
-        id=request_id,
-        user_email=email,
-        model=selected_model,
-        prompt=prompt,
-        total_pages=len(ocr_pages),
-        result_md_path=os.path.join(request_dir, "result.md"),
-        metadata_json_path=os.path.join(request_dir, "metadata.json")
-    )
-    db.add(db_request)
-    db.flush()
-
-    for file_info in saved_files:
-        db_file = ProcessedFile(
-            request_id=request_id,
-            original_name=file_info["original_name"],
-            safe_name=file_info["safe_name"],
-            file_path=file_info["path"],
-            saved_path=file_info["saved_path"],
-            file_type=file_info["type"],
-            page_count=file_info["page_count"]
+                file_info["page_count"] = 1
+            total_requested_pages += file_info["page_count"]
+
+        await check_usage_limit(email, total_requested_pages, db)
+        ticket = await asyncio.to_thread(admission.admit, email, total_requested_pages, model)
+    except BaseException:
+        # Rejected (quota, admission) before anything refers to the uploads
+        shutil.rmtree(request_dir, ignore_errors=True)
+        raise
+
+    async with admission.hold(email, total_requested_pages, ticket=ticket, model=model):
+        _assign_page_numbers(saved_files)
+
+        # Create the request up front so pages can be checkpointed as they complete
+        db_request = OCRRequest(
+            id=request_id,
+            user_email=email,
+            model=selected_model,
+            prompt=prompt,
+            total_pages=total_requested_pages,
+            result_md_path=None, # rendered on demand from the page store (core.results)
+            metadata_json_path=os.path.join(request_dir, "metadata.json"),
+            status="processing",
+            heartbeat_at=datetime.utcnow(),
+            idempotency_key=idempotency_key
         )
-        db.add(db_file)
-        db.flush()
-        file_info["db_id"] = db_file.id
+        db.add(db_request)
+        try:
+            await db.flush()
+        except IntegrityError:
+            # An identical submission racing this one created its request first
+            await db.rollback()
+            shutil.rmtree(request_dir, ignore_errors=True)
+            duplicate = await _find_duplicate(email, idempotency_key, db)
+            if duplicate is None:
+                raise
+            response = await _attach_duplicate(request, duplicate, _parse_include(include), timeout, db)
+            if response is None:
+                raise HTTPException(status_code=409, detail="An identical request was replaced meanwhile; submit again")
+            return response
 
-    for page in ocr_pages:
-        target_file_id = None
         for file_info in saved_files:
-            if file_info["original_name"] == page["source_file"]:
-                target_file_id = file_info["db_id"]
-                break
-        
-        db_page = OCRPage(
-            request_id=request_id,
-            file_id=target_file_id,
-            page_no=page["page_no"],
-            source_type=page["source_type"],
-            source_file=page["source_file"],
-            pdf_page_no=page["pdf_page_no"],
-            text=page["text"]
-        )
-        db.add(db_page)
-    
-    db.commit()
+            db_file = ProcessedFile(
+                request_id=request_id,
+                original_name=file_info["original_name"],
+                safe_name=file_info["safe_name"],
+                file_path=file_info["path"],
+                saved_path=file_info["saved_path"],
+                file_type=file_info["type"],
+                page_count=file_info["page_count"]
+            )
+            db.add(db_file)
+            await db.flush()
+            file_info["db_id"] = db_file.id
+
+        with span("db_create"):
+            await db.commit()
+
+        return OrjsonResponse(await _run_and_finalize(
+            request, db_request, saved_files, model, user_slug, set(), timeout, _parse_include(include), db
+        ))
+
+@router.post("/process/{request_id}/resume", response_class=OrjsonResponse)
+async def resume_document(
+    request: Request,
+    request_id: str,
+    include: Optional[str] = Query(None, description="Comma separated: pages, full_metadata, timings"),
+    timeout: Optional[float] = Query(None, gt=0, description="Seconds; pages not done by then are left for a resume"),
+    user: dict = Depends(verify_google_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Re-runs only the pages of an interrupted request that have no checkpoint yet."""
+    email = user.get("email")
+    db_request = await _get_owned_request(request_id, email, db)
+    if db_request.status == "completed":
+        raise HTTPException(status_code=409, detail="Request already completed")
 
-    return {
-        "status": "success",
-        "total_pages": len(ocr_pages),
-        "pages": ocr_pages,
-        "result": result_md,
-        "metadata": metadata
-    }
+    return OrjsonResponse(await _resume(request, db_request, _parse_include(include), timeout, db))
+
+@router.get("/process/{request_id}", response_class=OrjsonResponse)
+async def get_request_status(
+    request_id: str,
+    user: dict = Depends(verify_google_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Progress and the pages completed so far, also for requests still running."""
+    db_request = await _get_owned_request(request_id, user.get("email"), db)
+    pages = await get_saved_pages_async(db, request_id)
+    expected = sum(max(1, f.page_count or 0) for f in db_request.files)
+
+    return OrjsonResponse({
+        "id": db_request.id,
+        "status": db_request.status or "completed",
+        "total_pages": expected,
+        "completed_pages": len(pages),
+        "pages": pages
+    })
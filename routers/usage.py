@@ -1,22 +1,16 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import date
-from db.database import get_db, OCRRequest
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.database import get_async_db
 from core.auth import verify_google_token
-from core.utils import DAILY_PAGE_LIMIT
+from core.utils import DAILY_PAGE_LIMIT, get_daily_usage
+from core.retention import storage_usage
 
 router = APIRouter()
 
 @router.get("/usage")
-def get_usage(user: dict = Depends(verify_google_token), db: Session = Depends(get_db)):
+async def get_usage(user: dict = Depends(verify_google_token), db: AsyncSession = Depends(get_async_db)):
     email = user.get("email")
-    today = date.today()
-    
-    used_pages = db.query(func.sum(OCRRequest.total_pages)).filter(
-        OCRRequest.user_email == email,
-        func.date(OCRRequest.timestamp) == today
-    ).scalar() or 0
+    used_pages = await get_daily_usage(email, db)
     
     usage_data = {
         "used": used_pages,
@@ -26,5 +20,7 @@ def get_usage(user: dict = Depends(verify_google_token), db: Session = Depends(g
     # Backward compatibility
     usage_data["pdf"] = usage_data.copy()
     usage_data["image"] = {"used": 0, "limit": DAILY_PAGE_LIMIT, "remaining": DAILY_PAGE_LIMIT}
+    # Bytes on disk per artifact class, as of the last retention sweep
+    usage_data["storage"] = storage_usage(email)
     
     return usage_data
@@ -0,0 +1,109 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from core import admission as admission_module
+from core.admission import AdmissionController, PROCESS_START
+from core.shared_state import get_store
+
+
+def _running_ids():
+    with get_store().transaction() as conn:
+        return {row[0] for row in conn.execute("SELECT id FROM admission_running")}
+
+
+def _check(controller):
+    """An admission: the check that prunes dead workers' rows."""
+    controller.release(controller.admit("me@example.com", 1))
+
+
+def _insert(ticket: str, run: str, pid: int):
+    with get_store().transaction() as conn:
+        conn.execute(
+            "INSERT INTO admission_running (id, run, pid, user, pages, started) VALUES (?, ?, ?, ?, ?, ?)",
+            (ticket, run, pid, "other@example.com", 1, time.time())
+        )
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(admission_module, "PAGES_PER_MINUTE", 0)
+    controller = AdmissionController()
+    controller.stats()   # creates the tables
+    return controller
+
+
+def test_admissions_of_live_workers_survive_a_new_controller(controller):
+    peer = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        time.sleep(0.1)
+        _insert("peer", admission_module._process_start(peer.pid), peer.pid)
+        # Another worker (of another "run" as far as RUN_ID goes) starts and checks admissions
+        _check(AdmissionController())
+        assert "peer" in _running_ids()
+        assert controller.stats()["running"] == 1
+    finally:
+        peer.kill()
+        peer.wait()
+    assert controller.stats()["running"] == 0
+    _check(controller)
+    assert "peer" not in _running_ids()
+
+
+def test_reused_pids_do_not_keep_admissions(controller):
+    if not PROCESS_START:
+        pytest.skip("process start times need /proc")
+    # Same pid as a live process, but recorded for a process started at another time
+    _insert("reused", "0", os.getpid())
+    assert controller.stats()["running"] == 0
+    _check(controller)
+    assert "reused" not in _running_ids()
+
+
+def test_stats_do_not_wait_for_writers(controller):
+    _insert("dead", "0", 2 ** 22 + 1)   # above any pid_max
+    locked, done = threading.Event(), threading.Event()
+
+    def writer():
+        # Another worker in the middle of an admission
+        with get_store().transaction():
+            locked.set()
+            done.wait(15)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        locked.wait()
+        start = time.monotonic()
+        assert controller.stats()["running"] == 0
+        assert time.monotonic() - start < 1
+    finally:
+        done.set()
+        thread.join()
+    # Read-only: pruning is left to the next admission
+    assert "dead" in _running_ids()
+    _check(controller)
+    assert "dead" not in _running_ids()
+
+
+def test_release_frees_the_slot(controller):
+    ticket = controller.admit("me@example.com", 3)
+    assert ticket in _running_ids()
+    controller.release(ticket)
+    assert ticket not in _running_ids()
+
+
+def test_running_requests_are_counted_per_model(controller):
+    tickets = [controller.admit("a@example.com", 1, "xf3"), controller.admit("b@example.com", 1, "xf3"),
+               controller.admit("c@example.com", 1, "cpu")]
+    by_model = controller.stats()["by_model"]
+    assert by_model["xf3"] == 2 and by_model["cpu"] == 1
+    for ticket in tickets:
+        controller.release(ticket)
+    assert "xf3" not in controller.stats()["by_model"]
@@ -0,0 +1,83 @@
+import asyncio
+import statistics
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+httpx = pytest.importorskip("httpx")
+fastapi = pytest.importorskip("fastapi")
+health = pytest.importorskip("routers.health")
+
+from db.database import AsyncSessionLocal, OCRPage, OCRRequest, init_db
+from core.page_store import compress_text
+
+WRITERS = 4
+COMMITS = 5
+PAGES_PER_COMMIT = 200
+PAGE_TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 300   # ~17 KB per page
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    init_db()
+
+
+async def _write_results(text_z: bytes, codec: str):
+    """What /process does at the end of a large request: many page rows, one commit each batch."""
+    request_id = uuid.uuid4().hex[:8]
+    async with AsyncSessionLocal() as db:
+        db.add(OCRRequest(id=request_id, user_email="load@example.com", status="processing"))
+        await db.commit()
+        for batch in range(COMMITS):
+            db.add_all([
+                OCRPage(request_id=request_id, page_no=batch * PAGES_PER_COMMIT + i + 1, source_type="pdf",
+                        source_file="big.pdf", pdf_page_no=i + 1, text_z=text_z, codec=codec)
+                for i in range(PAGES_PER_COMMIT)
+            ])
+            await db.commit()
+
+
+async def _probe(client, stop: asyncio.Event) -> list:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get("/health")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+        await asyncio.sleep(0.005)
+    return latencies
+
+
+def test_health_stays_fast_while_results_are_committed():
+    app = fastapi.FastAPI()
+    app.include_router(health.router)
+    text_z, codec = compress_text(PAGE_TEXT)
+
+    async def _run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            await client.get("/health")   # first call takes a synchronous sample
+
+            idle = asyncio.Event()
+            idle_probe = asyncio.create_task(_probe(client, idle))
+            await asyncio.sleep(0.3)
+            idle.set()
+            baseline = await idle_probe
+
+            busy = asyncio.Event()
+            busy_probe = asyncio.create_task(_probe(client, busy))
+            start = time.perf_counter()
+            await asyncio.gather(*(_write_results(text_z, codec) for _ in range(WRITERS)))
+            write_s = time.perf_counter() - start
+            busy.set()
+            return baseline, await busy_probe, write_s
+
+    baseline, loaded, write_s = asyncio.run(_run())
+
+    # The probe kept running through the writes instead of queueing behind them
+    assert len(loaded) >= 5, f"only {len(loaded)} /health calls during {write_s:.2f}s of commits"
+    typical = statistics.median(baseline)
+    assert statistics.median(loaded) < max(5 * typical, 0.05)
+    assert max(loaded) < max(0.25, write_s / 4), f"/health stalled {max(loaded):.3f}s during {write_s:.2f}s of commits"
@@ -0,0 +1,137 @@
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from core.cancellation import RequestCancelled
+from model.backends import MAX_CONSECUTIVE_FAILURES, BackendPool
+from tools.mock_vllm import make_server
+
+MODEL = "PaddlePaddle/PaddleOCR-VL"
+
+
+@pytest.fixture
+def mock_servers():
+    servers = []
+
+    def _start(count=1, **kwargs):
+        for _ in range(count):
+            server = make_server(0, MODEL, latency=0.01, tokens=20, **kwargs)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            servers.append(server)
+        return servers[-count:]
+
+    yield _start
+    for server in servers:
+        server.shutdown()
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def _dead_url() -> str:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def test_routes_to_the_least_outstanding_backend():
+    pool = BackendPool(MODEL, ["http://a/v1", "http://b/v1", "http://c/v1"])
+    with pool.acquire() as first, pool.acquire() as second, pool.acquire() as third:
+        assert len({first.url, second.url, third.url}) == 3
+        with pool.acquire() as fourth:
+            assert fourth.outstanding == 2
+    with pool.acquire() as backend:
+        assert backend.outstanding == 1
+    assert all(b.outstanding == 0 for b in pool.backends)
+
+
+def test_ejects_after_consecutive_failures_only():
+    pool = BackendPool(MODEL, ["http://a/v1", "http://b/v1"])
+    bad = pool.backends[0]
+    others = pool.backends[1:]
+
+    def _fail(error):
+        with pytest.raises(type(error)):
+            with pool.acquire(exclude=others):
+                raise error
+
+    for _ in range(MAX_CONSECUTIVE_FAILURES - 1):
+        _fail(ConnectionError("down"))
+    # Cancelled calls are ours, not the backend's
+    _fail(RequestCancelled("client disconnected"))
+    assert bad.healthy
+    _fail(ConnectionError("down"))
+    assert not bad.healthy and bad.ejections == 1
+
+    # Ejected backends get no traffic while another is healthy
+    for _ in range(3):
+        with pool.acquire() as backend:
+            assert backend is pool.backends[1]
+
+
+def test_health_check_readmits_and_ejects(mock_servers):
+    server, = mock_servers()
+    pool = BackendPool(MODEL, [_url(server), _dead_url()], health_interval=3600)
+    live, dead = pool.backends
+    live.healthy = False
+
+    pool.check_all()
+    assert live.healthy and live.consecutive_failures == 0
+    assert not dead.healthy and dead.ejections == 1
+
+
+def test_retries_once_on_another_backend(mock_servers):
+    pytest.importorskip("openai")
+    ocr_gpu = pytest.importorskip("model.ocr_gpu")
+    from openai import APIConnectionError
+    from model.profiles import ModelProfile
+
+    server, = mock_servers()
+    engine = object.__new__(ocr_gpu.OCRGPU)
+    engine.model_name = MODEL
+    engine.temperature = 0.0
+    engine.profile = ModelProfile(early_stop=False)
+    messages = [{"role": "user", "content": "page"}]
+
+    # The dead backend comes first, so it is picked first on a tie
+    engine.pool = BackendPool(MODEL, [_dead_url(), _url(server)])
+    text, used, _ = engine._infer(messages, 64)
+    assert text and used == 20
+    assert server.config.requests == 1
+    assert engine.pool.backends[0].failures == 1
+
+    # One retry only: with every backend down the error reaches the caller
+    engine.pool = BackendPool(MODEL, [_dead_url(), _dead_url(), _dead_url()])
+    with pytest.raises(APIConnectionError):
+        engine._infer(messages, 64)
+    assert sum(b.failures for b in engine.pool.backends) == 2
+
+
+def test_deadline_shedding_cancels_the_request(mock_servers):
+    pytest.importorskip("openai")
+    ocr_gpu = pytest.importorskip("model.ocr_gpu")
+    from core.cancellation import CancelToken, cancel_scope, check_cancelled
+    from model.profiles import ModelProfile
+
+    server, = mock_servers()
+    engine = object.__new__(ocr_gpu.OCRGPU)
+    engine.model_name = MODEL
+    engine.temperature = 0.0
+    engine.profile = ModelProfile(early_stop=False)
+    engine.pool = BackendPool(MODEL, [_url(server)])
+    engine.pool.backends[0].latencies.extend([5.0] * 3)
+
+    token = CancelToken(timeout=1.0)
+    with cancel_scope(token):
+        with pytest.raises(RequestCancelled, match="deadline"):
+            engine._infer([{"role": "user", "content": "page"}], 64)
+        # The whole request is cancelled (resumable), not just this page
+        assert token.cancelled and token.reason.startswith("deadline")
+        with pytest.raises(RequestCancelled):
+            check_cancelled()
+    assert server.config.requests == 0
@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tools.batch_ocr import ShardWriter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rows(out_dir) -> list:
+    rows = []
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith("part-") and name.endswith(".jsonl"):
+            with open(os.path.join(out_dir, name), encoding="utf-8") as f:
+                rows.extend(json.loads(line) for line in f)
+    return rows
+
+
+def _row(doc_id, error=None):
+    return {"doc_id": doc_id, "path": doc_id, "page_no": 1, "pdf_page_no": None, "text": "x", "model": "xf3", "error": error}
+
+
+def test_finished_shards_are_the_record_of_done_documents(tmp_path):
+    writer = ShardWriter(str(tmp_path), shard_size=2)
+    writer.add("a", [_row("a")])
+    writer.add("b", [_row("b", error="boom")])
+    # A shard write interrupted by a crash
+    (tmp_path / "part-00007.jsonl.tmp").write_text("partial")
+
+    reopened = ShardWriter(str(tmp_path))
+    assert reopened.done == {"a", "b"} and reopened.errored == {"b"}
+    assert not (tmp_path / "part-00007.jsonl.tmp").exists()
+
+    reopened.drop({"b"})
+    reopened.add("b", [_row("b")])
+    reopened.close()
+    assert sorted((r["doc_id"], r["error"]) for r in _rows(tmp_path)) == [("a", None), ("b", None)]
+    assert ShardWriter(str(tmp_path)).errored == set()
+
+
+def test_batch_run_against_the_mock_server(tmp_path):
+    pytest.importorskip("openai")
+    pytest.importorskip("fitz")
+    Image = pytest.importorskip("PIL.Image")
+    import fitz
+
+    src, out = tmp_path / "src", tmp_path / "out"
+    src.mkdir()
+    for i in range(3):
+        Image.new("RGB", (400, 200), "white").save(src / f"img{i}.png")
+    doc = fitz.open()
+    for p in range(2):
+        doc.new_page().insert_text((72, 72), f"page {p}")
+    doc.save(str(src / "doc.pdf"))
+    (src / "broken.pdf").write_bytes(b"not a pdf")
+
+    def run(*extra):
+        return subprocess.run(
+            [sys.executable, os.path.join(ROOT, "tools", "batch_ocr.py"), str(src), "--out", str(out),
+             "--mock", "--report-every", "100", *extra],
+            capture_output=True, text=True, check=True, cwd=ROOT, env={**os.environ, "WARMUP_ENABLED": "0"},
+        ).stdout
+
+    run()
+    rows = _rows(out)
+    by_doc = {}
+    for row in rows:
+        by_doc.setdefault(row["doc_id"], []).append(row)
+    assert sorted(by_doc) == ["broken.pdf", "doc.pdf", "img0.png", "img1.png", "img2.png"]
+    assert len(by_doc["doc.pdf"]) == 2 and all(r["text"] and r["error"] is None for r in by_doc["doc.pdf"])
+    assert by_doc["broken.pdf"][0]["error"]
+
+    # Nothing is redone or duplicated by a second run
+    assert "0 to process" in run()
+    assert len(_rows(out)) == len(rows)
+
+    # The failed document is retried and keeps a single set of rows
+    assert "Retrying 1 documents" in run("--retry-errors")
+    retried = _rows(out)
+    assert len(retried) == len(rows)
+    assert [r["doc_id"] for r in retried].count("broken.pdf") == 1
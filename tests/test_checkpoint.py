@@ -0,0 +1,71 @@
+import asyncio
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+
+from db.database import AsyncSessionLocal, OCRRequest, SessionLocal, init_db
+from core.checkpoint import PageCheckpointer, claim_request, get_saved_page_nos
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    init_db()
+
+
+def _request(status: str) -> str:
+    request_id = uuid.uuid4().hex[:8]
+    with SessionLocal() as db:
+        db.add(OCRRequest(id=request_id, user_email="test@example.com", status=status))
+        db.commit()
+    return request_id
+
+
+def _page(page_no: int) -> dict:
+    return {"page_no": page_no, "source_type": "pdf", "source_file": "a.pdf", "pdf_page_no": page_no, "text": "x"}
+
+
+def test_a_page_is_checkpointed_once():
+    request_id = _request("processing")
+    with PageCheckpointer(request_id) as first, PageCheckpointer(request_id) as second:
+        first.save(_page(1))
+        second.save(_page(1))
+        second.save(_page(2))
+    assert (first.saved, second.saved) == (1, 1)
+
+    async def _pages():
+        async with AsyncSessionLocal() as db:
+            return await get_saved_page_nos(db, request_id)
+    assert asyncio.run(_pages()) == {1, 2}
+
+
+def test_only_one_concurrent_claim_wins():
+    request_id = _request("partial")
+
+    async def _claim():
+        async with AsyncSessionLocal() as db:
+            return await claim_request(db, request_id)
+
+    async def _race():
+        return await asyncio.gather(*(_claim() for _ in range(5)))
+    assert sorted(asyncio.run(_race())) == [False] * 4 + [True]
+
+
+def test_cached_results_follow_finalizes_of_other_workers():
+    from datetime import datetime
+    from core.results import load_result
+
+    request_id = _request("partial")
+    with PageCheckpointer(request_id) as checkpointer:
+        checkpointer.save({**_page(1), "text": "first page"})
+    assert "first page" in load_result(request_id)["markdown"]
+
+    # Another worker resumes the request: one more page, still "partial", and this worker's cache isn't told
+    with PageCheckpointer(request_id) as checkpointer:
+        checkpointer.save({**_page(2), "text": "second page"})
+    with SessionLocal() as db:
+        db.get(OCRRequest, request_id).finalized_at = datetime.utcnow()
+        db.commit()
+    assert "second page" in load_result(request_id)["markdown"]
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("aiosqlite")
+pytest.importorskip("fastapi")
+
+from sqlalchemy import update
+
+from core.checkpoint import STALE_SECONDS
+from db.database import AsyncSessionLocal, OCRRequest, ProcessedFile, SessionLocal, init_db
+import routers.process as process
+
+
+class _Client:
+    async def is_disconnected(self):
+        return False
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    init_db()
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(process, "POLL_INTERVAL", 0.05)
+
+
+def _request(tmp_path, status: str, heartbeat_age: float = None) -> str:
+    request_id = uuid.uuid4().hex[:8]
+    heartbeat = None if heartbeat_age is None else datetime.utcnow() - timedelta(seconds=heartbeat_age)
+    with SessionLocal() as db:
+        db.add(OCRRequest(
+            id=request_id, user_email=f"{request_id}@example.com", model="Model xf3", status=status,
+            heartbeat_at=heartbeat, metadata_json_path=os.path.join(tmp_path, f"{request_id}.json"),
+        ))
+        db.add(ProcessedFile(request_id=request_id, original_name="a.png", safe_name="a.png",
+                             file_path=str(tmp_path / "a.png"), file_type="image", page_count=1))
+        db.commit()
+    return request_id
+
+
+def _fake_run(runs: list, seconds: float = 0.0):
+    """Stands in for OCR: records the run and completes the request."""
+    async def _run_and_finalize(request, db_request, *args):
+        runs.append(db_request.id)
+        await asyncio.sleep(seconds)
+        db = args[-1]
+        await db.execute(update(OCRRequest).where(OCRRequest.id == db_request.id).values(status="completed"))
+        await db.commit()
+        return {"status": "success", "request_id": db_request.id}
+    return _run_and_finalize
+
+
+async def _submit_duplicate(request_id: str):
+    async with AsyncSessionLocal() as db:
+        original = await process._get_owned_request(request_id, f"{request_id}@example.com", db)
+        return await process._attach_duplicate(_Client(), original, set(), None, db)
+
+
+def _status(request_id: str) -> str:
+    with SessionLocal() as db:
+        return db.get(OCRRequest, request_id).status
+
+
+def test_duplicate_resumes_a_request_whose_worker_died(tmp_path, monkeypatch):
+    runs = []
+    monkeypatch.setattr(process, "_run_and_finalize", _fake_run(runs))
+    request_id = _request(tmp_path, "processing", heartbeat_age=STALE_SECONDS * 2)
+
+    response = asyncio.run(_submit_duplicate(request_id))
+    assert response.status_code == 200
+    assert runs == [request_id]
+    assert _status(request_id) == "completed"
+
+
+def test_duplicate_waits_for_a_live_run(tmp_path, monkeypatch):
+    runs = []
+    monkeypatch.setattr(process, "_run_and_finalize", _fake_run(runs))
+    monkeypatch.setattr(process, "WAIT_SECONDS", 0.2)
+    request_id = _request(tmp_path, "processing", heartbeat_age=0)
+
+    response = asyncio.run(_submit_duplicate(request_id))
+    assert response.status_code == 202
+    assert runs == []
+
+
+def test_concurrent_duplicates_resume_once(tmp_path, monkeypatch):
+    runs = []
+    monkeypatch.setattr(process, "_run_and_finalize", _fake_run(runs, seconds=0.3))
+    request_id = _request(tmp_path, "partial")
+
+    async def _both():
+        return await asyncio.gather(_submit_duplicate(request_id), _submit_duplicate(request_id))
+
+    responses = asyncio.run(_both())
+    assert [r.status_code for r in responses] == [200, 200]
+    assert runs == [request_id]
+
+
+def test_failed_run_releases_the_request(tmp_path, monkeypatch):
+    async def _broken_ocr(*args):
+        raise RuntimeError("worker exploded")
+    monkeypatch.setattr(process, "_run_ocr", _broken_ocr)
+    request_id = _request(tmp_path, "processing", heartbeat_age=0)
+
+    async def _run():
+        async with AsyncSessionLocal() as db:
+            db_request = await db.get(OCRRequest, request_id)
+            await process._run_and_finalize(_Client(), db_request, [], "xf3", "u", set(), None, set(), db)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_run())
+    assert _status(request_id) == "partial"
+
+
+def test_duplicate_of_a_purged_request_starts_over(tmp_path, monkeypatch):
+    runs = []
+    monkeypatch.setattr(process, "_run_and_finalize", _fake_run(runs))
+    request_id = _request(tmp_path, "partial")
+    with SessionLocal() as db:
+        db.get(OCRRequest, request_id).idempotency_key = f"key-{request_id}"
+        for f in db.get(OCRRequest, request_id).files:
+            f.purged_at = datetime.utcnow()
+        db.commit()
+
+    assert asyncio.run(_submit_duplicate(request_id)) is None
+    assert runs == []
+    with SessionLocal() as db:
+        # The key is free for the new request
+        assert db.get(OCRRequest, request_id).idempotency_key is None
+
+
+def test_retention_sweeps_requests_whose_run_died(tmp_path):
+    from core.retention import RetentionSweeper, user_slug
+
+    live = _request(tmp_path, "processing", heartbeat_age=0)
+    dead = _request(tmp_path, "processing", heartbeat_age=STALE_SECONDS * 2)
+    uploads = tmp_path / "uploads"
+    old = time.time() - 7 * 86400
+    for request_id in (live, dead):
+        images = uploads / "images" / user_slug(f"{request_id}@example.com") / request_id
+        images.mkdir(parents=True)
+        (images / "page_1.jpg").write_bytes(b"x" * 100)
+        os.utime(images, (old, old))
+
+    stats = RetentionSweeper(uploads_dir=str(uploads)).sweep()
+    assert stats["page_images"] == 1
+    assert (uploads / "images" / user_slug(f"{live}@example.com") / live).exists()
+    assert not (uploads / "images" / user_slug(f"{dead}@example.com") / dead).exists()
+
+
+def test_request_stopped_early_stays_charged_for_all_its_pages(tmp_path):
+    from core.utils import get_daily_usage
+
+    request_id = _request(tmp_path, "processing", heartbeat_age=0)
+    with SessionLocal() as db:
+        f = db.get(OCRRequest, request_id).files[0]
+        f.file_type, f.page_count = "pdf", 5
+        db.commit()
+
+    async def _finalize():
+        async with AsyncSessionLocal() as db:
+            db_request = await process._get_owned_request(request_id, f"{request_id}@example.com", db)
+            saved_files = process._saved_files_from_db(db_request)
+            await process._finalize_request(db_request, saved_files, [], db, set(), cancel_reason="client disconnected")
+            return await get_daily_usage(f"{request_id}@example.com", db)
+
+    # Cancelled before any page was saved: resuming it must not OCR pages the quota never saw
+    assert asyncio.run(_finalize()) == 5
+    assert _status(request_id) == "cancelled"
@@ -0,0 +1,60 @@
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+from PIL import ImageDraw
+
+from model.profiles import BUILTIN_PROFILES, load_profiles
+from preprocess import layout_crop
+from preprocess.layout_crop import InkDetector, LayoutCropper, crop_to_regions, vision_tokens
+
+
+def _page():
+    """A white A4-ish page with a header and a paragraph far below it."""
+    img = Image.new("RGB", (1000, 1400), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((100, 100, 600, 130), fill="black")
+    for i in range(4):
+        draw.rectangle((100, 900 + i * 40, 850, 920 + i * 40), fill="black")
+    return img
+
+
+class _BrokenDetector:
+    def detect(self, img):
+        raise RuntimeError("detector crashed")
+
+
+def test_ink_detector_finds_the_text_blocks():
+    boxes = InkDetector().detect(_page())
+    assert len(boxes) == 5
+    x0, y0, x1, y1 = boxes[0]
+    # Detection runs on a copy downscaled to DETECT_DIM: allow a pixel or two of rounding
+    assert abs(x0 - 100) <= 2 and abs(y0 - 100) <= 2 and abs(x1 - 601) <= 2 and abs(y1 - 131) <= 2
+    assert all(abs(b[0] - 100) <= 2 and abs(b[2] - 851) <= 2 for b in boxes[1:])
+
+
+def test_cropping_stacks_the_bands_and_saves_tokens():
+    page = _page()
+    cropped = LayoutCropper(InkDetector()).crop(page)
+    # Margins cropped and the gap between header and paragraph removed
+    assert cropped.width < page.width and cropped.height < 400
+    assert vision_tokens(*cropped.size) < vision_tokens(*page.size) / 3
+
+
+def test_blank_page_is_left_alone():
+    page = Image.new("RGB", (800, 1000), "white")
+    assert crop_to_regions(page, InkDetector().detect(page)) is page
+
+
+def test_detector_failure_falls_back_to_the_full_page():
+    page = _page()
+    failures = layout_crop.CROP_STATS["failures"]
+    assert LayoutCropper(_BrokenDetector()).crop(page) is page
+    assert layout_crop.CROP_STATS["failures"] == failures + 1
+
+
+def test_cropping_is_off_by_default(tmp_path):
+    assert all(not profile.layout_crop for profile in BUILTIN_PROFILES.values())
+    # Overriding other fields doesn't turn it on
+    path = tmp_path / "profiles.yaml"
+    path.write_text("default:\n  render_workers: 2\nxf3:\n  dpi: 220\n")
+    assert all(not profile.layout_crop for profile in load_profiles(str(path)).values())
@@ -0,0 +1,67 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("psutil")
+
+from core.memory_budget import MemoryBudget
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+
+def test_reservations_never_exceed_capacity():
+    budget = MemoryBudget(capacity=64 * MB)
+    observed = []
+    rng = random.Random(0)
+    sizes = [rng.randint(1, 40) * MB for _ in range(200)] + [200 * MB]   # one page larger than the budget
+
+    def render(nbytes):
+        with budget.reserve(nbytes) as reserved:
+            observed.append(budget.in_use)
+            assert reserved <= budget.capacity
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=render, args=(n,)) for n in sizes]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = budget.get_stats()
+    assert max(observed) <= 64 * MB
+    assert stats["peak_bytes"] <= stats["capacity_bytes"]
+    assert stats["acquired"] == len(sizes) and stats["in_use_bytes"] == 0
+    assert stats["waits"] > 0
+
+
+def test_concurrent_pdf_renders_keep_rss_bounded(tmp_path):
+    pytest.importorskip("fitz")
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    from bench_render_memory import A3, build_pdfs
+    from core.memory_budget import estimate_render_bytes
+
+    pdfs, pages, dpi, budget_mb = 6, 3, 150, 32
+    build_pdfs(str(tmp_path), pdfs, pages)
+    out = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "bench_render_memory.py"),
+         "--dpi", str(dpi), "--workers", "4", "--child", str(tmp_path)],
+        env={**os.environ, "RENDER_MEMORY_BUDGET_MB": str(budget_mb)},
+        capture_output=True, text=True, check=True, cwd=ROOT,
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+
+    # All pages of all PDFs at once is what an unbounded render could hold
+    demand_mb = pdfs * pages * estimate_render_bytes(*A3, dpi) / MB
+    growth_mb = result["peak_mb"] - result["baseline_mb"]
+    assert result["reserved_peak_mb"] <= budget_mb
+    assert result["waits"] > 0
+    # Pixmaps, their PIL copies and the encoders' buffers: a small multiple of the budget, far below the demand
+    assert growth_mb < 4 * budget_mb + 64, result
+    assert growth_mb < demand_mb / 2, (growth_mb, demand_mb)
@@ -0,0 +1,34 @@
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("pytesseract")
+
+import model.ocr_cpu as ocr_cpu
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    # The pool is what's tested; the tesseract binary itself isn't needed
+    monkeypatch.setattr(shutil, "which", lambda cmd: "/usr/bin/tesseract")
+    monkeypatch.setattr(ocr_cpu, "CPU_OCR_WORKERS", 2)
+    engine = ocr_cpu.OCRCPU("xf1-mini")
+    yield engine
+    ocr_cpu.shutdown_cpu_pool()
+
+
+def test_close_stops_the_worker_processes(engine):
+    pool = engine.executor
+    pids = {pool.submit(os.getpid).result(timeout=60) for _ in range(4)}
+    processes = list(pool._processes.values())
+    assert pids and os.getpid() not in pids
+
+    engine.close()
+    for process in processes:
+        process.join(timeout=30)
+    assert not any(process.is_alive() for process in processes)
+
+    # The next batch starts a new pool
+    assert engine.executor is not pool
+    assert engine.executor.submit(os.getpid).result(timeout=60) not in pids
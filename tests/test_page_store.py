@@ -0,0 +1,32 @@
+import threading
+
+import pytest
+
+from core.page_store import compress_text, decompress_text
+
+zstandard = pytest.importorskip("zstandard")
+
+
+def test_pages_compress_from_many_threads():
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(200):
+                text = f"page {n}-{i} " * (i + 1)
+                blob, codec = compress_text(text, "zstd")
+                assert codec == "zstd" and decompress_text(blob, codec) == text
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+
+def test_gzip_pages_still_read():
+    blob, codec = compress_text("plain text", "gzip")
+    assert codec == "gzip" and decompress_text(blob, codec) == "plain text"
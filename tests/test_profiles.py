@@ -0,0 +1,18 @@
+import pytest
+
+from model.profiles import BUILTIN_PROFILES, load_profiles
+
+
+@pytest.mark.parametrize("content", ["", "# nothing configured yet\n", "- xf3\n- xf3-pro\n", "just text\n"])
+def test_empty_or_malformed_files_fall_back_to_the_builtins(tmp_path, content):
+    path = tmp_path / "profiles.yaml"
+    path.write_text(content)
+    assert load_profiles(str(path)) == BUILTIN_PROFILES
+
+
+def test_malformed_entries_are_ignored(tmp_path):
+    path = tmp_path / "profiles.yaml"
+    path.write_text("default: [1, 2]\nxf3: 5\nxf3-pro:\n  dpi: 240\n")
+    profiles = load_profiles(str(path))
+    assert profiles["xf3"] == BUILTIN_PROFILES["xf3"]
+    assert profiles["xf3-pro"].dpi == 240
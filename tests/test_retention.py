@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import core.retention as retention
+from core.retention import RetentionSweeper
+from db.database import init_db
+
+
+@pytest.fixture(scope="module", autouse=True)
+def database():
+    init_db()
+
+
+def test_sweeps_only_walk_changed_directories(tmp_path, monkeypatch):
+    walked = []
+    dir_size = retention._dir_size
+    monkeypatch.setattr(retention, "_dir_size", lambda path: walked.append(path) or dir_size(path))
+
+    uploads = tmp_path / "uploads"
+    for n in range(3):
+        # Recent orphans: sized for storage usage, not deleted
+        images = uploads / "images" / "someone" / f"orphan{n}"
+        images.mkdir(parents=True)
+        (images / "page_1.jpg").write_bytes(b"x" * 100)
+    sweeper = RetentionSweeper(uploads_dir=str(uploads))
+
+    sweeper.sweep()
+    assert len(walked) == 3
+
+    walked.clear()
+    sweeper.sweep()
+    assert walked == []
+
+    changed = uploads / "images" / "someone" / "orphan1"
+    (changed / "page_2.jpg").write_bytes(b"x" * 50)
+    os.utime(changed, (os.stat(changed).st_atime, os.stat(changed).st_mtime + 1))
+    sweeper.sweep()
+    assert walked == [str(changed)]
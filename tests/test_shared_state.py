@@ -0,0 +1,30 @@
+import pytest
+
+from core import shared_state
+
+
+@pytest.mark.parametrize("parent, workers", [
+    (["/venv/bin/python", "/venv/bin/uvicorn", "main:app", "--workers", "4"], 4),
+    (["python", "-m", "uvicorn", "main:app", "--workers=3"], 3),
+    (["python", "-m", "uvicorn", "main:app", "--reload"], 1),
+    (["/venv/bin/gunicorn", "-w4", "-k", "uvicorn.workers.UvicornWorker", "main:app"], 4),
+    (["/bin/bash"], 1),
+    ([], 1),
+])
+def test_worker_count_from_the_server_command_line(monkeypatch, parent, workers):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(shared_state, "_parent_args", lambda: parent)
+    assert shared_state._detect_workers() == workers
+
+
+def test_web_concurrency_wins(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "2")
+    monkeypatch.setattr(shared_state, "_parent_args", lambda: ["uvicorn", "main:app", "--workers", "8"])
+    assert shared_state._detect_workers() == 2
+
+
+def test_unknown_worker_count_fails_loudly(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    monkeypatch.setattr(shared_state, "_parent_args", lambda: ["gunicorn: master [main:app]"])
+    with pytest.raises(RuntimeError, match="WEB_CONCURRENCY"):
+        shared_state._detect_workers()
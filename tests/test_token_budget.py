@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+from model.token_budget import TokenBudgeter, estimate_ink_density
+
+
+def test_truncation_raises_the_ratio():
+    budgeter = TokenBudgeter(cap=8192, floor=512)
+    ink = 0.02
+    budget = budgeter.estimate(ink)
+    for _ in range(5):
+        assert budgeter.record(ink, budget, budget)
+        grown = budgeter.estimate(ink)
+        assert grown >= budget
+        budget = grown
+    assert budget > 512
+
+
+def test_near_blank_pages_still_update_the_ratio():
+    budgeter = TokenBudgeter(cap=8192, floor=512)
+    before = budgeter.tokens_per_ink
+    assert not budgeter.record(0.001, 10, 512)
+    assert budgeter.tokens_per_ink != before
+
+
+def test_small_dense_text_reads_as_ink():
+    # 1px strokes covering ~5% of an A4 page at 300 dpi, as in small print
+    rng = random.Random(0)
+    img = Image.new("L", (2480, 3508), 255)
+    draw = ImageDraw.Draw(img)
+    for _ in range(400_000):
+        draw.point((rng.randrange(2480), rng.randrange(3508)), fill=0)
+    assert estimate_ink_density(img) > 0.02
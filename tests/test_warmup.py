@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+import core.admission as admission_module
+import misc.ocr_model as ocr_model
+import model.start_vllm as start_vllm
+import model.warmup as warmup
+
+
+class _Processor:
+    def run_batch(self, paths, prompt):
+        return ["ok"]
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Processor loads (model ids) made by ModelWarmup.ensure, each taking 0.3s."""
+    loads = []
+
+    def _get_processor(model):
+        loads.append(model)
+        time.sleep(0.3)
+        return _Processor()
+
+    monkeypatch.setattr(ocr_model, "get_processor", _get_processor)
+    monkeypatch.setattr(warmup.ModelWarmup, "_synthetic_page", lambda self: "page.png")
+    return loads
+
+
+@pytest.fixture
+def status_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(warmup.status_manager, "set_loading", lambda *args: calls.append(args))
+    return calls
+
+
+def test_concurrent_callers_wait_for_the_load(monkeypatch, loads):
+    monkeypatch.setattr(warmup, "_is_local", lambda model: False)
+    warm = warmup.ModelWarmup()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(warm.ensure("remote", "request"))) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [True, True, True]
+    assert loads == ["remote"]
+
+
+def test_remote_warm_ups_leave_the_model_status_alone(monkeypatch, loads, status_calls):
+    monkeypatch.setattr(warmup, "_is_local", lambda model: model == "local")
+    monkeypatch.setattr(warmup.ModelWarmup, "_served", staticmethod(lambda: None))
+    monkeypatch.setattr(start_vllm, "start", lambda name: None)
+    warm = warmup.ModelWarmup()
+
+    assert warm.ensure("remote")
+    assert status_calls == []
+    assert warm.ensure("local")
+    assert status_calls[-1][:2] == (False, "local")
+
+
+def test_request_does_not_switch_the_local_model_under_its_requests(monkeypatch, loads):
+    monkeypatch.setattr(warmup, "_is_local", lambda model: model != "cpu")
+    monkeypatch.setattr(warmup.ModelWarmup, "_served", staticmethod(lambda: warmup._served_name("xf3-pro")))
+    switches = []
+    monkeypatch.setattr(start_vllm, "start", switches.append)
+    # The request itself (xf3) and CPU-engine traffic don't hold the served model
+    by_model = {"xf3": 1, "cpu": 4, "xf3-pro": 2}
+    monkeypatch.setattr(admission_module, "get_admission_stats", lambda: {"by_model": by_model})
+    warm = warmup.ModelWarmup()
+
+    with pytest.raises(HTTPException) as exc:
+        warm.ensure("xf3", "request")
+    assert exc.value.status_code == 503 and exc.value.headers["Retry-After"]
+    assert "2 other request(s)" in exc.value.detail
+    assert switches == [] and loads == []
+
+    del by_model["xf3-pro"]
+    assert warm.ensure("xf3", "request")
+    assert switches == [warmup._served_name("xf3")]
+
+
+def test_policy_switch_waits_only_for_the_served_model(monkeypatch):
+    monkeypatch.setattr(warmup, "_is_local", lambda model: model != "cpu")
+    served = warmup._served_name("xf3-pro")
+    by_model = {"cpu": 4}
+    monkeypatch.setattr(admission_module, "get_admission_stats", lambda: {"by_model": by_model})
+    warm = warmup.ModelWarmup()
+
+    assert warm._local_idle(served, "xf3-pro", {})
+    by_model["xf3-pro"] = 1
+    assert not warm._local_idle(served, "xf3-pro", {})
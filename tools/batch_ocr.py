@@ -0,0 +1,368 @@
+"""
+Offline batch OCR for backfills: a directory or a JSONL manifest in, page
+results as JSONL or Parquet shards out, resumable after an interruption.
+
+Runs the same pipeline as /process (misc.ocr_model: render, then the model's
+OCR engine) without HTTP, auth or quotas. Several documents are in flight at
+once, so rendering the next documents overlaps inference on the current
+ones; images are sent to the engine in batches of the profile's batch_size.
+
+    python tools/batch_ocr.py scans/ --out backfill/ --model xf3 --backend http://10.0.0.11:8001/v1
+    python tools/batch_ocr.py manifest.jsonl --out backfill/ --format parquet
+    python tools/batch_ocr.py scans/ --out /tmp/run --mock        # in-process mock server, no GPU
+
+Manifest lines: {"path": "...", "id": "...", "model": "..."} (only path is
+required; relative paths are resolved against the manifest's directory).
+
+Output directory:
+    part-00000.jsonl ...   one row per page: doc_id, path, page_no, pdf_page_no, text, model, error
+Running the same command again skips the documents that have rows in a
+finished shard. Documents that failed (rows with an error) count as done;
+--retry-errors removes their rows and processes them again.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Dict, Iterable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PDF_EXTS = {".pdf"}
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff", ".bmp"}
+SHARD_RE = re.compile(r"^part-(\d{5,})\.(jsonl|parquet)$")
+
+
+@dataclass(frozen=True)
+class Document:
+    doc_id: str
+    path: str
+    model: str
+
+    @property
+    def type(self) -> str:
+        return "pdf" if os.path.splitext(self.path)[1].lower() in PDF_EXTS else "image"
+
+
+# ==========================
+# INPUT
+# ==========================
+
+def load_documents(source: str, default_model: str) -> List[Document]:
+    """Documents of a directory (recursive, sorted) or of a JSONL manifest."""
+    if os.path.isdir(source):
+        docs = []
+        for root, _, files in os.walk(source):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in PDF_EXTS | IMAGE_EXTS:
+                    path = os.path.join(root, name)
+                    doc_id = os.path.relpath(path, source).replace(os.sep, "/")
+                    docs.append(Document(doc_id, path, default_model))
+        return sorted(docs, key=lambda d: d.doc_id)
+
+    base = os.path.dirname(os.path.abspath(source))
+    docs, seen = [], set()
+    with open(source, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "path" not in entry:
+                raise ValueError(f"{source}:{line_no}: manifest entry without 'path'")
+            path = os.path.join(base, entry["path"])
+            doc_id = str(entry.get("id") or entry["path"])
+            if doc_id in seen:
+                raise ValueError(f"{source}:{line_no}: duplicate document id '{doc_id}'")
+            seen.add(doc_id)
+            docs.append(Document(doc_id, path, entry.get("model") or default_model))
+    return docs
+
+
+# ==========================
+# OUTPUT
+# ==========================
+
+class ShardWriter:
+    """
+    Buffers page rows and writes them as numbered shards of about
+    `shard_size` rows. All rows of a document go into the same shard, which
+    is written to a temporary file and renamed, so after a crash every
+    document is either fully in a shard or redone.
+
+    The shards are the record of what is done: on open, the documents with
+    rows in a finished shard are `done`, and those with an error row also
+    `errored`. Interrupted writes (.tmp files) are discarded.
+    """
+
+    def __init__(self, out_dir: str, fmt: str = "jsonl", shard_size: int = 2000):
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.shard_size = shard_size
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError("--format parquet needs the pyarrow package (pip install pyarrow)")
+        os.makedirs(out_dir, exist_ok=True)
+
+        shards = []
+        for name in sorted(os.listdir(out_dir)):
+            if name.startswith("part-") and name.endswith(".tmp"):
+                os.remove(os.path.join(out_dir, name))
+            elif SHARD_RE.match(name):
+                shards.append(name)
+        # Numbers continue after the highest existing shard of either format
+        self.next_shard = max((int(SHARD_RE.match(name).group(1)) + 1 for name in shards), default=0)
+        self.shards = [name for name in shards if name.endswith(f".{fmt}")]
+        self.done, self.errored = set(), set()
+        for name in self.shards:
+            for row in self._read(os.path.join(out_dir, name), columns=["doc_id", "error"]):
+                self.done.add(row["doc_id"])
+                if row["error"] is not None:
+                    self.errored.add(row["doc_id"])
+        self._rows, self._docs = [], []
+        self._lock = threading.Lock()
+
+    def _read(self, path: str, columns: List[str] = None) -> List[dict]:
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            return pq.read_table(path, columns=columns).to_pylist()
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write(self, path: str, rows: List[dict]):
+        tmp = f"{path}.tmp"
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            pq.write_table(pa.Table.from_pylist(rows), tmp, compression="zstd")
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def drop(self, doc_ids: set):
+        """Removes the rows of `doc_ids` from the finished shards, so those documents are processed again."""
+        doc_ids = set(doc_ids) & self.done
+        for name in list(self.shards):
+            path = os.path.join(self.out_dir, name)
+            rows = self._read(path)
+            kept = [row for row in rows if row["doc_id"] not in doc_ids]
+            if len(kept) == len(rows):
+                continue
+            if kept:
+                self._write(path, kept)
+            else:
+                os.remove(path)
+                self.shards.remove(name)
+        self.done -= doc_ids
+        self.errored -= doc_ids
+
+    def add(self, doc_id: str, rows: List[dict]):
+        with self._lock:
+            self._rows.extend(rows)
+            self._docs.append(doc_id)
+            if len(self._rows) >= self.shard_size:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._docs:
+            return
+        name = f"part-{self.next_shard:05d}.{self.fmt}"
+        self._write(os.path.join(self.out_dir, name), self._rows)
+        self.shards.append(name)
+        self.done.update(self._docs)
+        self.errored.update(row["doc_id"] for row in self._rows if row["error"] is not None)
+        self.next_shard += 1
+        self._rows, self._docs = [], []
+
+
+# ==========================
+# PROCESSING
+# ==========================
+
+def _row(doc: Document, page_no, pdf_page_no, text: str = "", error: str = None) -> dict:
+    return {
+        "doc_id": doc.doc_id,
+        "path": doc.path,
+        "page_no": page_no,
+        "pdf_page_no": pdf_page_no,
+        "text": text,
+        "model": doc.model,
+        "error": error,
+    }
+
+
+def ocr_pdf_document(doc: Document, work_dir: str) -> List[dict]:
+    from misc.ocr_model import ocr_pdf
+
+    img_dir = tempfile.mkdtemp(dir=work_dir)
+    try:
+        pages = ocr_pdf(doc.path, img_dir, doc.model)
+        return [_row(doc, p["page_index"] + 1, p["page_index"] + 1, p.get("text", "")) for p in pages] \
+            or [_row(doc, None, None, error="no pages rendered")]
+    except Exception as e:
+        return [_row(doc, None, None, error=str(e))]
+    finally:
+        # Rendered page images are only needed until their page is OCRed
+        shutil.rmtree(img_dir, ignore_errors=True)
+
+
+def ocr_image_batch(docs: List[Document]) -> Dict[str, List[dict]]:
+    from misc.ocr_model import get_processor
+
+    try:
+        results = get_processor(docs[0].model).run_batch([d.path for d in docs])
+        return {d.doc_id: [_row(d, 1, None, r.get("text", ""))] for d, r in zip(docs, results)}
+    except Exception as e:
+        return {d.doc_id: [_row(d, 1, None, error=str(e))] for d in docs}
+
+
+def plan_tasks(docs: Iterable[Document]) -> list:
+    """One task per PDF; images grouped per model into batches of the profile's batch_size."""
+    from model.profiles import get_profile
+
+    tasks, batches = [], {}
+    for doc in docs:
+        if doc.type == "pdf":
+            tasks.append(("pdf", [doc]))
+            continue
+        batch = batches.setdefault(doc.model, [])
+        batch.append(doc)
+        if len(batch) >= max(1, get_profile(doc.model).batch_size):
+            tasks.append(("image", batch))
+            batches[doc.model] = []
+    tasks.extend(("image", batch) for batch in batches.values() if batch)
+    return tasks
+
+
+class Progress:
+    def __init__(self, total_docs: int, interval: float):
+        self.total_docs = total_docs
+        self.interval = interval
+        self.docs = self.pages = self.errors = 0
+        self.start = self.last = time.perf_counter()
+
+    def update(self, rows_by_doc: Dict[str, List[dict]]):
+        self.docs += len(rows_by_doc)
+        for rows in rows_by_doc.values():
+            self.pages += sum(1 for r in rows if r["error"] is None)
+            self.errors += sum(1 for r in rows if r["error"] is not None)
+        now = time.perf_counter()
+        if now - self.last >= self.interval or self.docs == self.total_docs:
+            self.last = now
+            self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        rate = self.pages / elapsed if elapsed else 0.0
+        docs_rate = self.docs / elapsed if elapsed else 0.0
+        eta = (self.total_docs - self.docs) / docs_rate if docs_rate else float("inf")
+        print(f"[{elapsed:7.1f}s] docs {self.docs}/{self.total_docs}  pages {self.pages}  "
+              f"{rate:.2f} pages/s  errors {self.errors}  eta {eta:.0f}s", flush=True)
+
+
+def start_mock(models: Iterable[str]):
+    """Serves every model from an in-process mock vLLM server and points the profiles at it."""
+    from model.ocr_gpu import MODEL_MAP, DEFAULT_MODEL
+    from model.profiles import get_profile, override_profile
+    from tools.mock_vllm import make_server
+
+    servers = []
+    for model in sorted(set(models)):
+        if get_profile(model).engine != "gpu":
+            continue
+        server = make_server(0, MODEL_MAP.get(model, DEFAULT_MODEL), latency=0.02)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        override_profile(model, backends=[f"http://127.0.0.1:{server.server_address[1]}/v1"])
+        servers.append(server)
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="Directory of PDFs/images, or a JSONL manifest")
+    parser.add_argument("--out", required=True, help="Output directory (shards)")
+    parser.add_argument("--model", default="xf3", help="Model id for documents without one")
+    parser.add_argument("--format", default="jsonl", choices=["jsonl", "parquet"])
+    parser.add_argument("--shard-size", type=int, default=2000, help="Rows per shard")
+    parser.add_argument("--parallel", type=int, default=4, help="Documents / image batches in flight")
+    parser.add_argument("--backend", action="append", default=[],
+                        help="Inference base URL for --model (repeatable; default: the profile's backends)")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="Process documents that failed in an earlier run again (their error rows are removed)")
+    parser.add_argument("--mock", action="store_true", help="Use an in-process mock inference server")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    from model.profiles import override_profile
+
+    docs = load_documents(args.source, args.model)
+    writer = ShardWriter(args.out, args.format, args.shard_size)
+    if args.retry_errors:
+        retry = writer.errored & {d.doc_id for d in docs}
+        if retry:
+            print(f"Retrying {len(retry)} documents that failed before", flush=True)
+            writer.drop(retry)
+    todo = [d for d in docs if d.doc_id not in writer.done]
+    print(f"{len(docs)} documents, {len(docs) - len(todo)} already done, {len(todo)} to process", flush=True)
+    if not todo:
+        return
+
+    if args.mock:
+        servers = start_mock(d.model for d in todo)
+    else:
+        servers = []
+        if args.backend:
+            override_profile(args.model, backends=args.backend)
+
+    work_dir = tempfile.mkdtemp(prefix="batch_ocr_", dir=args.out)
+    progress = Progress(len(todo), args.report_every)
+    executor = ThreadPoolExecutor(max_workers=max(1, args.parallel))
+    try:
+        futures = {}
+        for kind, batch in plan_tasks(todo):
+            if kind == "pdf":
+                future = executor.submit(lambda d=batch[0]: {d.doc_id: ocr_pdf_document(d, work_dir)})
+            else:
+                future = executor.submit(ocr_image_batch, batch)
+            futures[future] = batch
+
+        for future in as_completed(futures):
+            rows_by_doc = future.result()
+            for doc_id, rows in rows_by_doc.items():
+                writer.add(doc_id, rows)
+            progress.update(rows_by_doc)
+    except KeyboardInterrupt:
+        # Finished documents are flushed below; the ones in flight are redone on the next run
+        print("Interrupted, writing finished documents...", flush=True)
+        executor.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os._exit(130)
+
+    executor.shutdown()
+    writer.close()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    for server in servers:
+        server.shutdown()
+    progress.report()
+    print(f"{len(writer.shards)} shard(s) in {args.out}, {len(writer.errored)} document(s) with errors")
+
+
+if __name__ == "__main__":
+    main()
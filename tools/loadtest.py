@@ -0,0 +1,356 @@
+"""
+Load test of the full API: replays a weighted mix of /process (PDFs and
+images of several sizes), /history, /usage and /health calls at increasing
+concurrency and reports throughput, latency percentiles and error rates
+per step, up to the saturation point.
+
+By default the app is started in a subprocess (uvicorn main:app) whose
+model backends point at in-process mock vLLM servers (tools/mock_vllm.py).
+Requests carry no Authorization header, so they all run as the test user
+of core.auth.verify_google_token. The daily page limit and per-user
+admission limits are raised accordingly, otherwise they would be what is
+measured. The app runs on a temporary SQLite database and uploads
+directory, removed afterwards (--database-url to use another database);
+.env and the repo's uploads/ are left alone.
+
+    python tools/loadtest.py --steps 1 2 4 8 16 32 --step-seconds 30
+    python tools/loadtest.py --mix pdf_small=4,pdf_large=1,image=4,history=6,usage=6,health=2
+    python tools/loadtest.py --url http://127.0.0.1:8000   # an already running server
+
+Each virtual user sends one request at a time (closed loop). A step
+saturates when its throughput grows by less than --min-gain over the
+previous step while p95 latency keeps rising, or when its error rate
+exceeds --max-error-rate.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# name -> (method, path, upload: (kind, pages per file, files) or None)
+SCENARIOS = {
+    "pdf_small": ("POST", "/process", ("pdf", 1, 1)),
+    "pdf_medium": ("POST", "/process", ("pdf", 6, 1)),
+    "pdf_large": ("POST", "/process", ("pdf", 24, 1)),
+    "image": ("POST", "/process", ("image", 1, 1)),
+    "images": ("POST", "/process", ("image", 1, 4)),
+    # One page, as the UI asks: the cost of a call does not grow with the rows the run adds
+    "history": ("GET", "/history?limit=20", None),
+    "usage": ("GET", "/usage", None),
+    "health": ("GET", "/health", None),
+}
+# Roughly a browser session: polling calls outnumber uploads, most uploads are short
+DEFAULT_MIX = "pdf_small=4,pdf_medium=2,pdf_large=1,image=3,images=1,history=6,usage=6,health=3"
+# Statuses that mean "server busy" (admission control) rather than broken
+REJECTED = {429, 503}
+
+
+# ==========================
+# FIXTURES
+# ==========================
+
+def build_fixtures() -> Dict[str, List[bytes]]:
+    """Synthetic PDFs (per page count) and PNG pages, as bytes, keyed by scenario."""
+    import fitz
+
+    def _page(doc, n):
+        page = doc.new_page(width=595, height=842)  # A4
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), f"Load test page {n}\n" + "Lorem ipsum dolor sit amet. " * 120,
+                            fontsize=10)
+        return page
+
+    fixtures = {}
+    for name, (_, _, upload) in SCENARIOS.items():
+        if upload is None:
+            continue
+        kind, pages, files = upload
+        if kind == "pdf":
+            doc = fitz.open()
+            for n in range(pages):
+                _page(doc, n)
+            fixtures[name] = [doc.tobytes()] * files
+        else:
+            doc = fitz.open()
+            png = _page(doc, 0).get_pixmap(dpi=150).tobytes("png")
+            fixtures[name] = [png] * files
+        doc.close()
+    return fixtures
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}' (known: {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ==========================
+# SERVER UNDER TEST
+# ==========================
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_mock(model: str, latency: float, per_token: float):
+    from model.ocr_gpu import MODEL_MAP, DEFAULT_MODEL
+    from tools.mock_vllm import make_server
+
+    server = make_server(0, MODEL_MAP.get(model, DEFAULT_MODEL), latency=latency, per_token=per_token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def spawn_app(model: str, backend: str, workers: int, work_dir: str,
+              database_url: Optional[str] = None) -> Tuple[subprocess.Popen, str]:
+    """uvicorn main:app on a free port, with `model` served by `backend`, test-user limits lifted
+    and its database (unless `database_url`) and uploads under `work_dir`."""
+    profiles_path = os.path.join(work_dir, "profiles.yaml")
+    with open(profiles_path, "w") as f:
+        json.dump({model: {"backends": [backend]}}, f)  # JSON is valid YAML
+
+    port = _free_port()
+    env = {
+        **os.environ,
+        "OCR_PROFILES_PATH": profiles_path,
+        "OCR_STATE_DIR": os.path.join(work_dir, "state"),
+        "OCR_UPLOADS_DIR": os.path.join(work_dir, "uploads"),
+        "DATABASE_URL": database_url or f"sqlite:///{os.path.join(work_dir, 'loadtest.db')}",
+        "DOTENV_OVERRIDE": "0",
+        "WEB_CONCURRENCY": str(workers),
+        "DAILY_PAGE_LIMIT": "1000000000",
+        "ADMISSION_USER_CONCURRENCY": "100000",
+        "ADMISSION_PAGES_PER_MINUTE": "100000000",
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(client, url: str, proc: Optional[subprocess.Popen], timeout: float = 120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise SystemExit(f"App exited with code {proc.returncode} during start-up")
+        try:
+            if (await client.get(f"{url}/health", timeout=5)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit(f"{url} not ready after {timeout:.0f}s")
+
+
+# ==========================
+# LOAD
+# ==========================
+
+@dataclass
+class Sample:
+    scenario: str
+    start: float
+    latency: float
+    status: int       # 0: connection error / timeout
+    pages: int
+
+
+async def call(client, url: str, scenario: str, fixtures: dict, model: str) -> Sample:
+    method, path, upload = SCENARIOS[scenario]
+    start = time.perf_counter()
+    pages = 0
+    try:
+        if upload is None:
+            response = await client.request(method, f"{url}{path}")
+        else:
+            kind, per_file, count = upload
+            ext, mime = ("pdf", "application/pdf") if kind == "pdf" else ("png", "image/png")
+            files = [("files", (f"load_{i}.{ext}", data, mime)) for i, data in enumerate(fixtures[scenario])]
+            # A unique prompt per call: identical uploads would be deduplicated (core.idempotency)
+            data = {"prompt": f"Convert the document to markdown. [{uuid.uuid4().hex[:8]}]", "model": model}
+            response = await client.post(f"{url}{path}", files=files, data=data)
+            pages = per_file * count
+        status = response.status_code
+    except Exception:
+        status = 0
+    return Sample(scenario, start, time.perf_counter() - start, status, pages)
+
+
+async def run_step(client, url: str, concurrency: int, seconds: float, mix: dict, fixtures: dict,
+                   model: str, rng: random.Random) -> Tuple[List[Sample], float]:
+    """`concurrency` virtual users loop for `seconds`; calls still in flight at the end are awaited and kept."""
+    names, weights = list(mix), list(mix.values())
+    samples = []
+    stop_at = time.perf_counter() + seconds
+
+    async def user():
+        while time.perf_counter() < stop_at:
+            samples.append(await call(client, url, rng.choices(names, weights)[0], fixtures, model))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def summarize(concurrency: int, samples: List[Sample], duration: float) -> dict:
+    def _stats(group: List[Sample]) -> dict:
+        ok = [s for s in group if 200 <= s.status < 300]
+        latencies = [s.latency * 1000 for s in ok]
+        return {
+            "requests": len(group),
+            "ok": len(ok),
+            "rejected": sum(1 for s in group if s.status in REJECTED),
+            "errors": sum(1 for s in group if not (200 <= s.status < 300) and s.status not in REJECTED),
+            **{f"p{q}_ms": round(v, 1) if (v := percentile(latencies, q)) is not None else None for q in (50, 90, 95, 99)},
+        }
+
+    by_scenario = defaultdict(list)
+    for s in samples:
+        by_scenario[s.scenario].append(s)
+    total = _stats(samples)
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(duration, 2),
+        "rps": round(total["ok"] / duration, 2) if duration else 0.0,
+        "pages_per_s": round(sum(s.pages for s in samples if 200 <= s.status < 300) / duration, 2) if duration else 0.0,
+        "error_rate": round((total["errors"] + total["rejected"]) / total["requests"], 4) if total["requests"] else 0.0,
+        **total,
+        "scenarios": {name: _stats(group) for name, group in sorted(by_scenario.items())},
+    }
+
+
+def saturated(previous: Optional[dict], current: dict, min_gain: float, max_error_rate: float) -> Optional[str]:
+    if current["error_rate"] > max_error_rate:
+        return f"error rate {current['error_rate']:.1%} > {max_error_rate:.1%}"
+    if previous is None or not previous["rps"]:
+        return None
+    gain = current["rps"] / previous["rps"] - 1
+    slower = (current["p95_ms"] or 0) > (previous["p95_ms"] or 0)
+    if gain < min_gain and slower:
+        return f"throughput {gain:+.0%} while p95 latency rose"
+    return None
+
+
+def print_step(step: dict):
+    ms = lambda v: f"{v:8.0f}" if v is not None else "     n/a"
+    print(f"c={step['concurrency']:<4} {step['rps']:7.2f} req/s {step['pages_per_s']:7.2f} pages/s  "
+          f"p50{ms(step['p50_ms'])} p90{ms(step['p90_ms'])} p99{ms(step['p99_ms'])} ms  "
+          f"n={step['requests']:<5} rejected={step['rejected']:<4} errors={step['errors']}", flush=True)
+    for name, s in step["scenarios"].items():
+        print(f"    {name:<11} n={s['requests']:<5} p50{ms(s['p50_ms'])} p95{ms(s['p95_ms'])} ms  "
+              f"rejected={s['rejected']} errors={s['errors']}", flush=True)
+
+
+async def run(args) -> dict:
+    import httpx
+
+    mix = parse_mix(args.mix)
+    work_dir = tempfile.mkdtemp(prefix="loadtest_")
+    fixtures = build_fixtures()
+    proc, mock = None, None
+    url = args.url
+    if not url:
+        mock = start_mock(args.model, args.mock_latency, args.mock_per_token)
+        proc, url = spawn_app(args.model, f"http://127.0.0.1:{mock.server_address[1]}/v1", args.workers, work_dir,
+                                args.database_url)
+
+    limits = httpx.Limits(max_connections=max(args.steps) + 10, max_keepalive_connections=max(args.steps) + 10)
+    results = {"url": url, "mix": mix, "model": args.model, "steps": [], "saturation": None}
+    try:
+        async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+            await wait_ready(client, url, proc)
+            rng = random.Random(args.seed)
+            print(f"Target {url}, mix {mix}", flush=True)
+            if args.warmup:
+                await run_step(client, url, 1, args.warmup, mix, fixtures, args.model, rng)
+
+            previous = None
+            for concurrency in args.steps:
+                samples, duration = await run_step(client, url, concurrency, args.step_seconds, mix, fixtures, args.model, rng)
+                step = summarize(concurrency, samples, duration)
+                results["steps"].append(step)
+                print_step(step)
+
+                reason = saturated(previous, step, args.min_gain, args.max_error_rate)
+                if reason:
+                    best = max(results["steps"], key=lambda s: s["rps"])
+                    results["saturation"] = {"concurrency": concurrency, "reason": reason,
+                                             "max_rps": best["rps"], "at_concurrency": best["concurrency"]}
+                    print(f"Saturated at concurrency {concurrency} ({reason}); "
+                          f"best {best['rps']} req/s at concurrency {best['concurrency']}", flush=True)
+                    if not args.keep_going:
+                        break
+                previous = step
+            if results["saturation"] is None:
+                print("No saturation within the tested steps; extend --steps", flush=True)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if mock is not None:
+            mock.shutdown()
+            results["mock_requests"] = mock.config.requests
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Test a running server instead of spawning one (its backends are used as is)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario=weight,... (scenarios: {', '.join(SCENARIOS)})")
+    parser.add_argument("--steps", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64], help="Concurrency steps")
+    parser.add_argument("--step-seconds", type=float, default=30.0)
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds at concurrency 1 before the first step")
+    parser.add_argument("--model", default="xf3")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the spawned app")
+    parser.add_argument("--database-url", help="Database of the spawned app (default: a temporary SQLite file)")
+    parser.add_argument("--mock-latency", type=float, default=0.2, help="Mock inference seconds per page")
+    parser.add_argument("--mock-per-token", type=float, default=0.0, help="Mock extra seconds per generated token")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-request timeout (counted as an error)")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="Throughput growth below which a step saturates")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--keep-going", action="store_true", help="Run every step even past saturation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Stub OpenAI-compatible inference server for local testing without a GPU.
+
+Serves the two endpoints the backend uses (`GET /v1/models` and
+`POST /v1/chat/completions`, streaming and non-streaming). Run several on
+different ports to exercise the backend pool:
+
+    python tools/mock_vllm.py --port 9001 --model PaddlePaddle/PaddleOCR-VL
+    python tools/mock_vllm.py --port 9002 --model PaddlePaddle/PaddleOCR-VL --latency 0.5
+
+`--per-image-token` adds prefill time proportional to the vision tokens of
+the request's images (estimated from their size), to compare image sizes.
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def build_text(tokens: int) -> str:
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+    lines, line = [], []
+    for i in range(tokens):
+        line.append(words[i % len(words)])
+        if len(line) == 12:
+            lines.append(" ".join(line))
+            line = []
+    if line:
+        lines.append(" ".join(line))
+    return "# Mock OCR\n\n" + "\n".join(lines)
+
+
+VISION_PATCH = 28  # same estimate as preprocess.layout_crop.vision_tokens
+
+
+def image_size(data: bytes):
+    """(width, height) of a PNG or JPEG from its header, or None."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return struct.unpack(">II", data[16:24])
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker, length = data[i + 1], struct.unpack(">H", data[i + 2:i + 4])[0]
+            if 0xC0 <= marker <= 0xC3:
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + length
+    return None
+
+
+def image_tokens(req: dict) -> int:
+    tokens = 0
+    for message in req.get("messages", []):
+        content = message.get("content")
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            url = (part.get("image_url") or {}).get("url", "")
+            if not url.startswith("data:"):
+                continue
+            encoded = url.split(",", 1)[1]
+            # The header is enough for the size; decode the whole image only if it's further in
+            size = image_size(base64.b64decode(encoded[:8192])) or image_size(base64.b64decode(encoded))
+            if size:
+                tokens += math.ceil(size[0] / VISION_PATCH) * math.ceil(size[1] / VISION_PATCH)
+    return tokens
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set by make_server
+
+    def log_message(self, fmt, *args):
+        if self.config.verbose:
+            super().log_message(fmt, *args)
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("/v1/models", "/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": self.config.model, "object": "model"}]})
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b"{}"
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": "not found"})
+            return
+
+        with self.config.lock:
+            self.config.requests += 1
+
+        if random.random() < self.config.fail_rate:
+            self._send_json(500, {"error": {"message": "mock failure"}})
+            return
+
+        req = json.loads(raw or b"{}")
+        max_tokens = int(req.get("max_tokens") or self.config.tokens)
+        n_tokens = min(self.config.tokens, max_tokens)
+        text = build_text(n_tokens)
+        prompt_tokens = image_tokens(req) or 1000
+        time.sleep(
+            self.config.latency + self.config.per_token * n_tokens
+            + self.config.per_image_token * prompt_tokens
+        )
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": n_tokens, "total_tokens": prompt_tokens + n_tokens}
+
+        if not req.get("stream"):
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": self.config.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def _event(payload):
+            data = f"data: {payload}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": self.config.model}
+        for piece in text.split(" "):
+            _event(json.dumps({**base, "choices": [{"index": 0, "delta": {"content": piece + " "}, "finish_reason": None}]}))
+        _event(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+        if (req.get("stream_options") or {}).get("include_usage"):
+            _event(json.dumps({**base, "choices": [], "usage": usage}))
+        _event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def make_server(port: int, model: str, latency: float = 0.05, per_token: float = 0.0,
+                tokens: int = 400, fail_rate: float = 0.0, host: str = "127.0.0.1", verbose: bool = False,
+                per_image_token: float = 0.0):
+    """Builds (but doesn't start) a mock server; `server.config.requests` counts served calls."""
+    config = argparse.Namespace(
+        model=model, latency=latency, per_token=per_token, tokens=tokens,
+        fail_rate=fail_rate, verbose=verbose, per_image_token=per_image_token,
+        requests=0, lock=threading.Lock(),
+    )
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.config = config
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible OCR inference server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--model", default="PaddlePaddle/PaddleOCR-VL")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed seconds per request")
+    parser.add_argument("--per-token", type=float, default=0.0, help="Extra seconds per generated token")
+    parser.add_argument("--tokens", type=int, default=400, help="Tokens generated per page")
+    parser.add_argument("--per-image-token", type=float, default=0.0,
+                        help="Extra seconds per vision token of the request's images (prefill)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.model, args.latency, args.per_token, args.tokens,
+                         args.fail_rate, args.host, args.verbose, args.per_image_token)
+    print(f"Mock vLLM serving {args.model} on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
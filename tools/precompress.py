@@ -0,0 +1,93 @@
+"""
+Writes brotli / gzip variants (`<file>.br`, `<file>.gz`) of the exported
+frontend's text assets, served as is by core.static.CachedStaticFiles.
+
+Run after every frontend export; unchanged files are skipped and variants
+whose source is gone are removed.
+
+    python tools/precompress.py              # docs/
+    python tools/precompress.py path/to/out --min-size 512
+"""
+import argparse
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMPRESSIBLE = {".html", ".js", ".mjs", ".css", ".json", ".txt", ".svg", ".xml", ".map", ".ico", ".webmanifest"}
+SUFFIXES = (".br", ".gz")
+# Keep a variant only if it saves at least this share of the bytes
+MIN_SAVING = 0.1
+
+
+def _compress(data: bytes, suffix: str) -> bytes:
+    if suffix == ".br":
+        return brotli.compress(data, quality=11)
+    # mtime=0: identical input gives identical output (stable ETags across exports)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(directory: str, min_size: int = 256) -> dict:
+    suffixes = [s for s in SUFFIXES if s != ".br" or brotli is not None]
+    stats = {"written": 0, "skipped": 0, "removed": 0, "bytes_in": 0, "bytes_out": {s: 0 for s in suffixes}}
+
+    for root, _, files in os.walk(directory):
+        names = set(files)
+        for name in files:
+            path = os.path.join(root, name)
+            base, ext = os.path.splitext(name)
+
+            if ext in SUFFIXES:
+                if base not in names:
+                    os.remove(path)
+                    stats["removed"] += 1
+                continue
+            if ext.lower() not in COMPRESSIBLE or os.path.getsize(path) < min_size:
+                continue
+
+            source_mtime = os.path.getmtime(path)
+            data = None
+            for suffix in suffixes:
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+                    stats["skipped"] += 1
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    stats["bytes_in"] += len(data)
+                compressed = _compress(data, suffix)
+                if len(compressed) > (1 - MIN_SAVING) * len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                tmp = target + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp, target)
+                stats["written"] += 1
+                stats["bytes_out"][suffix] += len(compressed)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", nargs="?", default=os.path.join(ROOT, "docs"))
+    parser.add_argument("--min-size", type=int, default=256, help="Skip files smaller than this (bytes)")
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli is not installed: writing .gz variants only (pip install brotli)")
+    stats = precompress(args.directory, args.min_size)
+    out = ", ".join(f"{s}: {n / 1024:.0f} KB" for s, n in stats["bytes_out"].items())
+    print(f"{stats['written']} variants written ({stats['bytes_in'] / 1024:.0f} KB in; {out}), "
+          f"{stats['skipped']} up to date, {stats['removed']} stale removed")
+
+
+if __name__ == "__main__":
+    main()